@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+"""Mide la memoria del catálogo en el servidor con 100k y 1M pistas.
+
+Compara la representación anterior (un objeto TrackInfo por pista, una tupla
+(duración, tamaño) y un Counter de playlists por pista en el índice, y
+playlists como listas de ids) con TrackCatalog + PlaylistIndex. Las playlists
+tienen PLAYLIST_LEN pistas cada una y, entre todas, referencian cada pista una
+vez.
+
+    ./bench_catalog.py [n_pistas ...]
+"""
+
+import sys
+import tracemalloc
+from collections import Counter
+
+from catalog import TrackCatalog
+from playlist_index import PlaylistIndex
+
+SIZES = (100_000, 1_000_000)
+PLAYLIST_LEN = 100
+
+
+class TrackInfo:
+    """Equivalente a la clase generada por Ice (atributos en __dict__)."""
+    def __init__(self, id, title, filename):
+        self.id = id
+        self.title = title
+        self.filename = filename
+
+
+def track_ids(n):
+    return [f"{i:07d} - Artista - Canción {i}.mp3" for i in range(n)]
+
+
+def legacy(ids):
+    tracks = {tid: TrackInfo(tid, tid[:-4], tid) for tid in ids}
+    totals = {tid: (180_000, 4_000_000) for tid in ids}
+    playlists = {f"pl{i}": ids[i:i + PLAYLIST_LEN]
+                 for i in range(0, len(ids), PLAYLIST_LEN)}
+    by_track = {}
+    for pid, members in playlists.items():
+        for tid in members:
+            by_track.setdefault(tid, Counter())[pid] += 1
+    return tracks, totals, playlists, by_track
+
+
+def compact(ids):
+    catalog = TrackCatalog()
+    index = PlaylistIndex(catalog)
+    for tid in ids:
+        index.set_track(tid, 180_000, 4_000_000, tid[:-4])
+    for i in range(0, len(ids), PLAYLIST_LEN):
+        index.put_playlist(f"pl{i}", {"name": "", "description": "", "owner": "",
+                                       "created_at": 0}, ids[i:i + PLAYLIST_LEN])
+    return catalog, index
+
+
+def measure(build, ids):
+    # Se copian los ids para que cada estructura pague sus propias cadenas
+    fresh = [tid.encode().decode() for tid in ids]
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build(fresh)
+    del fresh
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del result
+    return used
+
+
+def main(sizes):
+    for n in sizes:
+        ids = track_ids(n)
+        old, new = measure(legacy, ids), measure(compact, ids)
+        print(f"{n:>9} pistas: anterior {old / 2**20:8.1f} MiB ({old // n} B/pista), "
+              f"compacto {new / 2**20:8.1f} MiB ({new // n} B/pista), "
+              f"ahorro {(1 - new / old) * 100:.0f} %")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or SIZES)
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+
+"""Mide el coste de arranque de cargar Spotifice precompilado frente a
+Ice.loadSlice en tiempo de ejecución (cada muestra es un proceso nuevo)."""
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+RUNS = 10
+SNIPPET = "from slice_loader import load_spotifice; load_spotifice()"
+
+
+def sample(runtime_slice):
+    env = dict(os.environ)
+    if runtime_slice:
+        env["SPOTIFICE_RUNTIME_SLICE"] = "1"
+    else:
+        env.pop("SPOTIFICE_RUNTIME_SLICE", None)
+
+    times = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", SNIPPET], env=env, check=True)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    baseline = sample(runtime_slice=True)
+    precompiled = sample(runtime_slice=False)
+    print(f"Ice.loadSlice:  {baseline:8.1f} ms (mediana de {RUNS} procesos)")
+    print(f"precompilado:   {precompiled:8.1f} ms")
+    print(f"mejora:         {baseline - precompiled:8.1f} ms "
+          f"({(1 - precompiled / baseline) * 100:.0f} %)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+"""Compara el coste de CPU por chunk de get_audio_chunk entre el esqueleto
+generado (SecureStreamManagerI) y el Blobject de stream_fastpath.py.
+
+Cliente y servidor comparten proceso y se comunican por TCP local, así que el
+tiempo de CPU medido incluye ambos extremos; la diferencia entre las dos
+variantes es el coste de marshalling y copias en el servidor.
+
+    ./bench_stream.py [tamaño_chunk ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import Ice
+
+from media_server import SecureStreamManagerI, Spotifice
+from stream_fastpath import FastChunkI
+
+CHUNK_SIZES = (4096, 16384, 65536, 262144)
+FILE_SIZE = 16 * 2**20
+CHUNKS = 2000
+
+
+class UnlimitedServer:
+    """Lo mínimo que usa la sesión del MediaServerI, sin límites de caudal."""
+    def throttle(self, sid, username, nbytes, read):
+        return read()
+
+
+def cpu_per_chunk(proxy, servant, chunk_size):
+    servant._fh.seek(0)
+    proxy.get_audio_chunk(chunk_size)  # Calentamiento (conexión)
+    start = time.process_time()
+    for _ in range(CHUNKS):
+        if len(proxy.get_audio_chunk(chunk_size)) < chunk_size:
+            servant._fh.seek(0)
+    return (time.process_time() - start) / CHUNKS * 1e6
+
+
+def main(chunk_sizes):
+    with tempfile.NamedTemporaryFile() as media, Ice.initialize(sys.argv[:1]) as ic:
+        media.write(os.urandom(FILE_SIZE))
+        media.flush()
+
+        adapter = ic.createObjectAdapterWithEndpoints("Bench", "tcp -h 127.0.0.1")
+        servant = SecureStreamManagerI(UnlimitedServer(), "bench", "bench")
+        servant._fh = open(media.name, "rb")
+        typed = Spotifice.SecureStreamManagerPrx.uncheckedCast(
+            adapter.add(servant, Ice.stringToIdentity("typed")))
+        fast = Spotifice.SecureStreamManagerPrx.uncheckedCast(
+            adapter.add(FastChunkI(servant), Ice.stringToIdentity("fast")))
+        adapter.activate()
+
+        for size in chunk_sizes:
+            old = cpu_per_chunk(typed, servant, size)
+            new = cpu_per_chunk(fast, servant, size)
+            print(f"{size:>8} B/chunk: esqueleto {old:8.1f} µs, Blobject {new:8.1f} µs "
+                  f"({(new / old - 1) * 100:+.0f} % CPU por chunk)")
+        servant.close_stream()
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or CHUNK_SIZES)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+"""Mide el tamaño en el cable del catálogo completo con 10k, 100k y 1M pistas.
+
+Compara get_all_tracks + get_all_playlists con get_compact_catalog, cada uno
+sin comprimir y con bzip2 al nivel por defecto de Ice (Ice.Compression.Level
+= 1). Los tamaños son los de las respuestas codificadas, obtenidas con
+ice_invoke contra un MediaServerI con pistas sintéticas de nombres largos,
+como los de la banda sonora de Portal 2.
+
+    ./bench_wire.py [n_pistas ...]
+"""
+
+import bz2
+import sys
+import tempfile
+from pathlib import Path
+
+import Ice
+
+from media_server import MediaServerI
+
+SIZES = (10_000, 100_000, 1_000_000)
+PLAYLIST_LEN = 100
+COMPRESSION_LEVEL = 1
+# Modo de cada operación en el Slice: Ice rechaza las llamadas con otro modo
+MODES = {"get_all_tracks": Ice.OperationMode.Normal,
+         "get_all_playlists": Ice.OperationMode.Idempotent,
+         "get_compact_catalog": Ice.OperationMode.Idempotent}
+
+
+def populate(server, n):
+    index = server.playlist_index
+    ids = [f"Portal2-{i // 100:02d}-{i % 100:02d}-Want_You_Gone_Remix_{i}.mp3"
+           for i in range(n)]
+    for tid in ids:
+        index.set_track(tid, 180_000, 4_000_000)
+    for i in range(0, n, PLAYLIST_LEN):
+        meta = {"name": f"Lista {i}", "description": "Generada",
+                "owner": "bench", "created_at": 0}
+        index.put_playlist(f"pl{i}", meta, ids[i:i + PLAYLIST_LEN])
+
+
+def mib(nbytes):
+    return f"{nbytes / 2**20:7.1f} MiB"
+
+
+def reply_size(proxy, operation):
+    ok, reply = proxy.ice_invoke(operation, MODES[operation], b"")
+    assert ok, operation
+    return len(reply), len(bz2.compress(reply, COMPRESSION_LEVEL))
+
+
+def main(sizes):
+    with tempfile.TemporaryDirectory() as tmp, Ice.initialize(sys.argv[:1]) as ic:
+        adapter = ic.createObjectAdapterWithEndpoints("Bench", "tcp -h 127.0.0.1")
+        adapter.activate()
+        for n in sizes:
+            server = MediaServerI(Path(tmp) / "media", Path(tmp) / f"playlists{n}",
+                                  Path(tmp) / "users.json")
+            populate(server, n)
+            proxy = adapter.add(server, Ice.stringToIdentity(f"server{n}"))
+
+            tracks, tracks_z = reply_size(proxy, "get_all_tracks")
+            playlists, playlists_z = reply_size(proxy, "get_all_playlists")
+            old, old_z = tracks + playlists, tracks_z + playlists_z
+            new, new_z = reply_size(proxy, "get_compact_catalog")
+            print(f"{n:>9} pistas: completo {mib(old)} ({mib(old_z)} bzip2), "
+                  f"compacto {mib(new)} ({mib(new_z)} bzip2), "
+                  f"{(1 - new / old) * 100:.0f} % / "
+                  f"{(1 - new_z / old) * 100:.0f} % menos")
+            adapter.remove(proxy.ice_getIdentity())
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or SIZES)
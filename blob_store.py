@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+
+"""Almacén de audio direccionado por contenido.
+
+Cada fichero de audio se identifica por el SHA-256 de su contenido (el blob) y
+varias pistas pueden apuntar al mismo blob. En sistemas de ficheros con
+copy-on-write (btrfs, XFS) los blobs se guardan en `<raíz>/<2 primeros
+hex>/<hash>` como reflinks, y los duplicados de la biblioteca pasan a compartir
+bloques con ellos: cada contenido ocupa disco una sola vez. Nunca son enlaces
+duros: editar un fichero de la biblioteca no altera el blob ni las demás
+pistas con su contenido. Sin copy-on-write (ext4...) una copia duplicaría la
+biblioteca, así que los ficheros sólo se indexan y el contenido de un blob se
+lee de cualquier fichero que lo tenga y no haya cambiado desde que se hasheó.
+
+Los hashes se calculan en paralelo y se recuerdan por (ruta, tamaño, mtime) en
+`<raíz>/index.json`, de modo que un reinicio sólo rehace los ficheros nuevos o
+modificados. En la misma pasada se trocea cada blob en segmentos alineados a
+frame y se guarda su tabla de CRC-32, que acompaña al audio en los streams
+verificados. Los blobs que ya no usa ningún fichero se borran al reindexar.
+"""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from media_pack import segment
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin reflinks, siempre se copia
+    fcntl = None
+
+logger = logging.getLogger("BlobStore")
+
+FICLONE = 0x40049409  # ioctl de Linux: copia por referencia (copy-on-write)
+
+
+def analyse_file(path, chunk_size=1024 * 1024):
+    """SHA-256 y tabla de segmentos [(offset, longitud, crc32)] de un fichero.
+
+    El fichero se mapea en memoria y se recorre por trozos, sin copiarlo entero
+    al proceso. hashlib y zlib liberan el GIL con bloques grandes, así que varios
+    hilos analizan ficheros en paralelo.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if not size:  # mmap no admite ficheros vacíos
+            return digest.hexdigest(), []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for pos in range(0, size, chunk_size):
+                digest.update(data[pos:pos + chunk_size])
+            segments = [(off, n, crc) for off, n, _, crc in segment(data)]
+    return digest.hexdigest(), segments
+
+
+def reflink(src, dst):
+    """Crea `dst` compartiendo los bloques de `src` (copy-on-write). Devuelve
+    False, sin dejar `dst`, si el sistema de ficheros no lo admite."""
+    if fcntl is None:
+        return False
+    try:
+        with open(src, "rb") as s, open(dst, "wb") as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        return True
+    except OSError:
+        Path(dst).unlink(missing_ok=True)
+        return False
+
+
+def clone_file(src, dst):
+    """Copia independiente de `src`: reflink si es posible, si no una copia."""
+    if not reflink(src, dst):
+        shutil.copyfile(src, dst)
+
+
+class BlobStore:
+    def __init__(self, root, workers=None):
+        self.root = Path(root)
+        self.workers = workers or min(8, os.cpu_count() or 1)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._index_path = self.root / "index.json"
+        self._known = {}     # {ruta: [tamaño, mtime_ns, hash]}
+        self._files = {}     # {hash: {ruta}}: ficheros indexados con ese contenido
+        self._segments = {}  # {hash: [[offset, longitud, crc32], ...]}
+        self._cow = True     # Pasa a False con el primer reflink que falla
+        self._lock = threading.Lock()
+        if self._index_path.exists():
+            try:
+                saved = json.loads(self._index_path.read_text(encoding="utf-8"))
+                for name, (size, mtime, digest) in saved.get("files", {}).items():
+                    self._remember(name, size, mtime, digest)
+                self._segments = saved.get("segments", {})
+            except (ValueError, AttributeError, TypeError):
+                logger.warning("Índice de blobs corrupto, se recalculará")
+                self._known, self._files = {}, {}
+
+    def _remember(self, name, size, mtime, digest):
+        self._forget(name)
+        self._known[name] = [size, mtime, digest]
+        self._files.setdefault(digest, set()).add(name)
+
+    def _forget(self, name):
+        size, mtime, digest = self._known.pop(name, (None, None, None))
+        names = self._files.get(digest)
+        if names is not None:
+            names.discard(name)
+            if not names:
+                del self._files[digest]
+
+    def path(self, digest):
+        return self.root / digest[:2] / digest
+
+    def source(self, digest):
+        """Fichero con el contenido de un blob: el propio blob o un fichero
+        indexado que no ha cambiado desde que se hasheó. None si no hay ninguno."""
+        blob = self.path(digest)
+        if blob.exists():
+            return blob
+        with self._lock:
+            candidates = [(name, self._known[name][:2])
+                          for name in self._files.get(digest, ())]
+        for name, stamp in candidates:
+            try:
+                st = os.stat(name)
+            except OSError:
+                continue
+            if [st.st_size, st.st_mtime_ns] == stamp:
+                return Path(name)
+        return None
+
+    def __contains__(self, digest):
+        return self.source(digest) is not None
+
+    def segments(self, digest):
+        """Tabla de segmentos de un blob, o None si no se ha analizado."""
+        return self._segments.get(digest)
+
+    def hash_files(self, paths):
+        """{ruta: hash} de varios ficheros, analizando en paralelo los no conocidos."""
+        result, pending = {}, []
+        for p in map(Path, paths):
+            st = p.stat()
+            with self._lock:
+                known = self._known.get(str(p))
+                fresh = (known and known[:2] == [st.st_size, st.st_mtime_ns]
+                         and known[2] in self._segments)
+            if fresh:
+                result[p] = known[2]
+            else:
+                pending.append(p)
+
+        if pending:
+            with ThreadPoolExecutor(self.workers) as pool:
+                analysed = pool.map(analyse_file, pending)
+                for p, (digest, segments) in zip(pending, analysed):
+                    result[p] = digest
+                    with self._lock:  # add() recuerda el fichero al registrarlo
+                        self._segments[digest] = [list(seg) for seg in segments]
+            logger.info(f"Calculados {len(pending)} hashes con {self.workers} hilos")
+        return result
+
+    def add(self, path, digest):
+        """Registra un fichero con el contenido `digest`. Con reflinks, el blob
+        es una copia que no ocupa disco y, si ya existía, el fichero pasa a
+        compartir sus bloques; sin ellos el fichero sólo se indexa (un enlace
+        duro dejaría que editar un fichero cambiase los demás)."""
+        path, blob = Path(path), self.path(digest)
+        with self._lock:
+            analysed = digest in self._segments
+        segments = None if analysed else [list(s) for s in analyse_file(path)[1]]
+        with self._lock:
+            if segments is not None:
+                self._segments.setdefault(digest, segments)
+            st = path.stat()
+            known = self._known.get(str(path))
+            if not blob.exists() or os.path.samefile(path, blob):
+                # Blob nuevo, o enlace duro de una versión anterior: copia
+                # propia sólo si es un reflink; si no, basta con el fichero
+                tmp = blob.with_name(blob.name + ".tmp")
+                if self._cow:
+                    blob.parent.mkdir(exist_ok=True)
+                    self._cow = reflink(path, tmp)
+                if self._cow:
+                    os.replace(tmp, blob)
+                else:
+                    blob.unlink(missing_ok=True)
+            elif known != [st.st_size, st.st_mtime_ns, digest]:
+                tmp = path.with_name(path.name + ".dedup")
+                if reflink(blob, tmp):
+                    os.utime(tmp, ns=(st.st_atime_ns, st.st_mtime_ns))
+                    os.replace(tmp, path)
+                    logger.info(f"Duplicado comparte bloques con su blob: {path.name}")
+            st = path.stat()
+            self._remember(str(path), st.st_size, st.st_mtime_ns, digest)
+
+    def index(self, paths):
+        """Hashea (en paralelo) y registra varios ficheros. Devuelve {ruta: hash}."""
+        digests = self.hash_files(paths)
+        for p, digest in digests.items():
+            self.add(p, digest)
+        self.collect_garbage()
+        self.save()
+        return digests
+
+    def copy_to(self, digest, target):
+        """Crea `target` a partir de un blob existente, sin transferencia: un
+        reflink o, si no es posible, una copia local."""
+        source = self.source(digest)
+        if source is None:
+            raise FileNotFoundError(f"Blob desconocido: {digest}")
+        target = Path(target)
+        tmp = target.with_name(target.name + ".dedup")
+        with self._lock:
+            clone_file(source, tmp)
+            os.replace(tmp, target)
+            st = target.stat()
+            self._remember(str(target), st.st_size, st.st_mtime_ns, digest)
+
+    def collect_garbage(self):
+        """Olvida los ficheros borrados o modificados desde que se hashearon y
+        borra los blobs (y sus tablas de segmentos) que ya no usa ninguno."""
+        removed = 0
+        with self._lock:
+            for name, (size, mtime, _) in list(self._known.items()):
+                try:
+                    st = os.stat(name)
+                except OSError:
+                    self._forget(name)
+                    continue
+                if [st.st_size, st.st_mtime_ns] != [size, mtime]:
+                    self._forget(name)
+            live = {digest for _, _, digest in self._known.values()}
+            for digest in set(self._segments) - live:
+                del self._segments[digest]
+            for blob in self.root.glob("??/*"):
+                if blob.name not in live:
+                    blob.unlink(missing_ok=True)
+                    removed += 1
+        if removed:
+            logger.info(f"Borrados {removed} blobs sin uso")
+        return removed
+
+    def save(self):
+        with self._lock:
+            tmp = self._index_path.with_suffix(".tmp")
+            data = {"files": self._known, "segments": self._segments}
+            tmp.write_text(json.dumps(data), encoding="utf-8")
+            tmp.replace(self._index_path)
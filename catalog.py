@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+"""Catálogo de pistas en memoria con representación compacta.
+
+En lugar de un objeto por pista, las pistas ocupan una fila (slot) en columnas
+paralelas: ids (una sola cadena por id), títulos (sólo si difieren del nombre
+del fichero) y arrays de enteros para duración y tamaño. Un slot nunca se
+reutiliza para otro id, así que las playlists pueden guardar sus pistas como
+arrays de slots, incluidas pistas que aún no existen o que se han dado de baja.
+Los objetos TrackInfo de Ice se crean sólo al responder (frontera de
+marshalling).
+"""
+
+from array import array
+from pathlib import PurePath
+
+
+class TrackCatalog:
+    def __init__(self):
+        self._ids = []               # {slot: track_id} (la misma cadena que en _slots)
+        self._slots = {}             # {track_id: slot}
+        self._titles = []            # {slot: título o None (= nombre sin extensión)}
+        self._durations = array("q")  # ms
+        self._sizes = array("q")      # bytes
+        self._present = bytearray()   # 1 si la pista está disponible
+        self._count = 0
+
+    def slot(self, track_id):
+        """Slot de un id, reservándolo (como no disponible) si es nuevo."""
+        slot = self._slots.get(track_id)
+        if slot is None:
+            slot = self._slots[track_id] = len(self._ids)
+            self._ids.append(track_id)
+            self._titles.append(None)
+            self._durations.append(0)
+            self._sizes.append(0)
+            self._present.append(0)
+        return slot
+
+    def find(self, track_id):
+        """Slot de un id ya conocido, o None."""
+        return self._slots.get(track_id)
+
+    def add(self, track_id, title, duration_ms, byte_size):
+        slot = self.slot(track_id)
+        self._titles[slot] = None if title == PurePath(track_id).stem else title
+        self._durations[slot] = int(duration_ms)
+        self._sizes[slot] = byte_size
+        if not self._present[slot]:
+            self._present[slot] = 1
+            self._count += 1
+        return slot
+
+    def remove(self, track_id):
+        slot = self._slots.get(track_id)
+        if slot is not None and self._present[slot]:
+            self._present[slot] = 0
+            self._count -= 1
+
+    # --- Consultas ---
+    def __contains__(self, track_id):
+        slot = self._slots.get(track_id)
+        return slot is not None and self._present[slot] == 1
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        """Ids de las pistas disponibles."""
+        return (tid for tid, present in zip(self._ids, self._present) if present)
+
+    def available(self, slot):
+        return self._present[slot] == 1
+
+    def track_id(self, slot):
+        return self._ids[slot]
+
+    def title(self, track_id):
+        title = self._titles[self._slots[track_id]]
+        return PurePath(track_id).stem if title is None else title
+
+    def duration_ms(self, slot):
+        return self._durations[slot]
+
+    def byte_size(self, slot):
+        return self._sizes[slot]
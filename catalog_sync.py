@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+
+"""Sincronización de catálogo entre réplicas de MediaServer.
+
+Cada réplica publica un manifiesto (hash y fecha de cada pista, sello de cada
+playlist) y un hilo en segundo plano lo compara periódicamente con el de las
+demás réplicas del grupo: sólo se transfieren las pistas que faltan o cuya
+copia remota es más reciente, y las playlists con un sello mayor que el local.
+Una pista cuyo contenido (blob) ya existe en esta réplica se instala con una
+copia local del blob, sin transferencia. El resto se descarga por trozos a un
+fichero `.part` que se reanuda si la transferencia se corta, y se verifica con
+su hash antes de darla de alta.
+
+El servicio sólo atiende a otras réplicas: cada petición lleva en el contexto
+un token derivado del secreto común (MediaServer.ReplicaSecret, o en su
+defecto MediaServer.SessionSecret). Sin él, el objeto no existe para el
+cliente, que así no esquiva la autenticación ni los límites de caudal.
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import os
+import re
+import threading
+
+import Ice
+
+from slice_loader import load_spotifice
+from transcoder import ORIGINAL
+from wire import uncompressed
+
+# Cargar la definición de la interfaz Slice
+Spotifice = load_spotifice()  # Precompilado con `make slice` o, si no, desde el .ice
+
+logger = logging.getLogger("CatalogSync")
+
+IDENTITY = "CatalogSync"
+STAGING_DIR = ".sync"  # Dentro del directorio de medios
+TOKEN_KEY = "replica-token"  # Clave del contexto Ice con la credencial de réplica
+DIGEST_RE = re.compile(r"[0-9a-f]{64}")  # sha256 en hexadecimal
+
+
+def replica_token(secret):
+    """Credencial de réplica: sólo quien conoce el secreto común la calcula."""
+    return hmac.new(secret, b"CatalogSync", hashlib.sha256).hexdigest()
+
+
+class CatalogSyncI(Spotifice.CatalogSync):
+    """Lado servidor: expone el manifiesto y el contenido de esta réplica."""
+    def __init__(self, server_impl, secret):
+        self._server = server_impl
+        self._token = replica_token(secret)
+
+    def _check_replica(self, current):
+        token = current.ctx.get(TOKEN_KEY, "") if current else ""
+        if not hmac.compare_digest(token, self._token):
+            raise Ice.ObjectNotExistException()
+
+    def get_manifest(self, current=None):
+        self._check_replica(current)
+        server = self._server
+        tracks = []
+        for track_id in list(server.tracks):
+            try:
+                st = server.track_path(track_id).stat()
+                digest = server.get_track_digest(track_id)
+            except (OSError, Spotifice.Error):
+                continue  # Pista que desaparece durante el recorrido
+            pack = server.packs.get(track_id)
+            size = pack.tracks[track_id]["size"] if pack else st.st_size
+            tracks.append(Spotifice.TrackDigest(id=track_id, digest=digest,
+                                                size=size, modified=st.st_mtime_ns))
+
+        playlists = [Spotifice.PlaylistStamp(id=pid, counter=counter, origin=origin,
+                                             deleted=pid not in server.playlist_index)
+                     for pid, (counter, origin) in list(server.playlist_stamps.items())]
+        return Spotifice.CatalogManifest(server_id=server.server_id,
+                                         version=server.catalog_version,
+                                         tracks=tracks, playlists=playlists)
+
+    def read_track(self, track_id, offset, size, current=None):
+        self._check_replica(current)
+        info = self._server.get_track_info(track_id)
+        try:
+            with self._server.open_media(info, ORIGINAL) as fh:
+                fh.seek(offset)
+                return fh.read(size)
+        except OSError as e:
+            raise Spotifice.IOError(item=track_id, reason=f"Error de E/S: {e}")
+
+    def get_playlist_changes(self, playlist_ids, current=None):
+        self._check_replica(current)
+        return [json.dumps(e) for e in self._server.playlist_changes(playlist_ids)]
+
+
+class CatalogSyncer:
+    """Lado cliente: trae de las otras réplicas lo que falta en ésta."""
+    CHUNK_SIZE = 256 * 1024
+
+    def __init__(self, server_impl, find_peers, interval, secret):
+        self._server = server_impl
+        self._find_peers = find_peers  # Función que devuelve proxies CatalogSync
+        self._interval = interval
+        self._context = {TOKEN_KEY: replica_token(secret)}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            try:
+                peers = self._find_peers()
+            except Ice.Exception as e:
+                logger.warning(f"No se pudieron localizar las réplicas: {e}")
+                continue
+            for peer in peers:
+                try:
+                    self.sync_with(peer)
+                except (Ice.Exception, OSError) as e:
+                    logger.warning(f"Sincronización con {peer} interrumpida: {e}")
+
+    def sync_with(self, peer):
+        peer = peer.ice_context(self._context)
+        # Manifiesto grande, de ids parecidos: compensa comprimirlo
+        manifest = peer.ice_compress(True).get_manifest()
+        if manifest.server_id == self._server.server_id:
+            return  # Somos nosotros
+        self._sync_playlists(peer, manifest)
+        self._sync_tracks(peer, manifest)
+
+    def _sync_playlists(self, peer, manifest):
+        local = self._server.playlist_stamps
+        newer = [p.id for p in manifest.playlists
+                 if p.id not in local or local[p.id] < [p.counter, p.origin]]
+        if not newer:
+            return
+        for change in peer.get_playlist_changes(newer):
+            self._server.apply_playlist_change(json.loads(change),
+                                               origin=manifest.server_id)
+        logger.info(f"{len(newer)} playlists sincronizadas desde {manifest.server_id}")
+
+    def _sync_tracks(self, peer, manifest):
+        for remote in manifest.tracks:
+            if self._stop.is_set():
+                return
+            if remote.id in self._server.tracks:
+                try:
+                    if self._server.get_track_digest(remote.id) == remote.digest:
+                        continue
+                    mtime = self._server.track_path(remote.id).stat().st_mtime_ns
+                    if mtime >= remote.modified:
+                        continue  # Nuestra copia es la más reciente
+                except (OSError, Spotifice.Error):
+                    pass
+            self._fetch(peer, remote)
+
+    def _fetch(self, peer, remote):
+        """Descarga reanudable de una pista; se verifica antes de instalarla."""
+        target = self._target(remote)
+        if target is None:
+            logger.warning(f"Id o hash no válido en el manifiesto: {remote.id!r}")
+            return
+        store = self._server.blob_store
+        if store and remote.digest in store:
+            # Contenido ya presente: sin transferencia
+            store.copy_to(remote.digest, target)
+            self._server.install_track(target, remote.digest)
+            logger.info(f"Pista sincronizada con un blob local: {remote.id}")
+            return
+
+        staging = self._server.media_dir / STAGING_DIR
+        staging.mkdir(parents=True, exist_ok=True)
+        # El hash forma parte del nombre: sólo se reanuda el mismo contenido
+        part = staging / f"{remote.id}.{remote.digest[:16]}.part"
+        offset = part.stat().st_size if part.exists() else 0
+        if offset:
+            logger.info(f"Reanudando {remote.id} en byte {offset}")
+
+        audio = uncompressed(peer)  # Audio ya comprimido
+        with open(part, "ab") as f:
+            while offset < remote.size:
+                chunk = audio.read_track(remote.id, offset, self.CHUNK_SIZE)
+                if not chunk:
+                    break
+                f.write(chunk)
+                offset += len(chunk)
+
+        digest = hashlib.sha256()
+        with open(part, "rb") as f:
+            while block := f.read(1 << 20):
+                digest.update(block)
+        if digest.hexdigest() != remote.digest:
+            logger.warning(f"Hash incorrecto al sincronizar {remote.id}, se descarta")
+            part.unlink()
+            return
+
+        os.utime(part, ns=(remote.modified, remote.modified))  # Evita el ping-pong
+        os.replace(part, target)
+        self._server.install_track(target, remote.digest)
+        logger.info(f"Pista sincronizada desde otra réplica: {remote.id}")
+
+    def _target(self, remote):
+        """Fichero de destino dentro del directorio de medios, o None si el id
+        (o el hash, que forma parte del nombre en staging) sale de él."""
+        if not DIGEST_RE.fullmatch(remote.digest):
+            return None
+        track_id = remote.id
+        if not track_id or track_id.startswith(".") or "/" in track_id \
+                or "\\" in track_id:
+            return None
+        media_dir = self._server.media_dir.resolve()
+        target = (media_dir / track_id).resolve()
+        return target if target.parent == media_dir else None
+
+
+def find_replicas(ic, well_known="MediaServer"):
+    """Proxies CatalogSync de todas las réplicas del grupo (vía IceGrid)."""
+    import IceGrid
+    locator = IceGrid.LocatorPrx.uncheckedCast(ic.getDefaultLocator())
+    if not locator:
+        return []
+    replicas = locator.getLocalQuery().findAllReplicas(ic.stringToProxy(well_known))
+    identity = ic.stringToIdentity(IDENTITY)
+    return [Spotifice.CatalogSyncPrx.uncheckedCast(p.ice_identity(identity))
+            for p in replicas]
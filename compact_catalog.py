@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+"""Formato compacto del catálogo completo (get_compact_catalog).
+
+get_all_tracks y get_all_playlists repiten cada cadena en cada aparición: el
+nombre de fichero va en `id` y en `filename`, el título es casi el mismo
+nombre y las playlists repiten otra vez los ids. Aquí cada cadena distinta va
+una sola vez en una tabla y pistas y playlists guardan índices a ella. El
+título y el nombre de fichero que se deducen del id (como guarda TrackCatalog)
+se envían como DERIVED en lugar de como cadena.
+"""
+
+from collections import namedtuple
+from pathlib import PurePath
+
+DERIVED = -1  # title: id sin extensión; filename: el propio id
+
+# Mismos campos que los structs Slice TrackRef y PlaylistRef
+TrackRef = namedtuple("TrackRef", "id title filename")
+PlaylistRef = namedtuple("PlaylistRef", "id name description owner created_at track_ids")
+
+
+class StringTable:
+    def __init__(self):
+        self.strings = []
+        self._refs = {}
+
+    def ref(self, s):
+        ref = self._refs.get(s)
+        if ref is None:
+            ref = self._refs[s] = len(self.strings)
+            self.strings.append(s)
+        return ref
+
+
+def encode(tracks, playlists):
+    """`tracks`: (id, título, fichero); `playlists`: (id, meta, track_ids).
+
+    Devuelve (tabla de cadenas, [TrackRef], [PlaylistRef]).
+    """
+    table = StringTable()
+    track_refs = []
+    for track_id, title, filename in tracks:
+        track_refs.append(TrackRef(
+            table.ref(track_id),
+            DERIVED if title == PurePath(track_id).stem else table.ref(title),
+            DERIVED if filename == track_id else table.ref(filename)))
+
+    playlist_refs = [
+        PlaylistRef(table.ref(pid), table.ref(meta["name"]),
+                    table.ref(meta["description"]), table.ref(meta["owner"]),
+                    meta["created_at"], [table.ref(tid) for tid in track_ids])
+        for pid, meta, track_ids in playlists]
+    return table.strings, track_refs, playlist_refs
+
+
+def decode(strings, track_refs, playlist_refs):
+    """Inversa de encode (acepta también los structs Slice).
+
+    Devuelve ([(id, título, fichero)], [dict de playlist con track_ids]).
+    """
+    tracks = []
+    for ref in track_refs:
+        track_id = strings[ref.id]
+        title = PurePath(track_id).stem if ref.title == DERIVED else strings[ref.title]
+        filename = track_id if ref.filename == DERIVED else strings[ref.filename]
+        tracks.append((track_id, title, filename))
+
+    playlists = [{"id": strings[ref.id], "name": strings[ref.name],
+                  "description": strings[ref.description], "owner": strings[ref.owner],
+                  "created_at": ref.created_at,
+                  "track_ids": [strings[i] for i in ref.track_ids]}
+                 for ref in playlist_refs]
+    return tracks, playlists
@@ -11,8 +11,12 @@ mkdir -p icegrid/db/registry icegrid/db/node1 icegrid/db/node2
 echo "[INFO] 📦 Generando paquete de distribución en 'distrib/'..."
 mkdir -p distrib
 
+# Precompilamos el Slice (slice2py) para no parsear el .ice en cada arranque
+make slice || echo "[WARN] slice2py no disponible: se cargará el .ice en tiempo de ejecución"
+
 # Copiamos código y datos
 cp *.py *.ice *.json distrib/
+cp -r Spotifice spotifice_v3_ice.sha256 distrib/ 2>/dev/null || true
 cp -r media playlists distrib/ 2>/dev/null || true
 
 # --- EL FIX DEFINITIVO PARA WINDOWS/WSL ---
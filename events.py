@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+"""Canales de eventos publish/subscribe para renders y servidores.
+
+Con `IceStorm.TopicManager.Proxy` configurado se usa IceStorm; si no, un
+servicio de topics en el propio proceso con la misma interfaz, suficiente para
+un despliegue con un solo publicador y para las pruebas.
+"""
+
+import logging
+import threading
+
+import Ice
+
+logger = logging.getLogger("Events")
+
+RENDER_TOPIC = "RenderEvents"
+CATALOG_TOPIC = "CatalogEvents"
+
+
+class _FanOut:
+    """Publicador local: cada llamada se reenvía (oneway) a los suscriptores."""
+    def __init__(self, topics, topic, prx_class):
+        self._topics = topics
+        self._topic = topic
+        self._cast = prx_class.uncheckedCast  # Los suscriptores llegan sin tipo
+
+    def __getattr__(self, operation):
+        def publish(*args):
+            for key, proxy in self._topics.subscribers(self._topic):
+                try:
+                    getattr(self._cast(proxy), operation)(*args)
+                except Ice.Exception as e:
+                    logger.warning(f"Eliminando suscriptor inalcanzable {key}: {e}")
+                    self._topics.drop(self._topic, key)
+        return publish
+
+
+class LocalTopics:
+    """Servicio de topics en memoria del proceso.
+
+    Misma interfaz que IceStormTopics: una sola instancia compartida por
+    servidores, renders y oyentes de un proceso (p. ej. una prueba) reparte
+    los eventos entre ellos sin desplegar IceStorm.
+    """
+    def __init__(self):
+        self._topics = {}  # {topic: {identidad: proxy oneway}}
+        self._lock = threading.Lock()
+
+    def subscribers(self, topic):
+        """[(identidad, proxy)] de un topic en este momento."""
+        with self._lock:
+            return list(self._topics.get(topic, {}).items())
+
+    def drop(self, topic, key):
+        with self._lock:
+            self._topics.get(topic, {}).pop(key, None)
+
+    def publisher(self, topic, prx_class):
+        return _FanOut(self, topic, prx_class)
+
+    def subscribe(self, topic, proxy):
+        key = Ice.identityToString(proxy.ice_getIdentity())
+        with self._lock:
+            self._topics.setdefault(topic, {})[key] = proxy.ice_oneway()
+
+    def unsubscribe(self, topic, proxy):
+        self.drop(topic, Ice.identityToString(proxy.ice_getIdentity()))
+
+
+class IceStormTopics:
+    """Topics gestionados por un servicio IceStorm."""
+    def __init__(self, topic_manager):
+        import IceStorm
+        self._IceStorm = IceStorm
+        self._manager = IceStorm.TopicManagerPrx.checkedCast(topic_manager)
+        if not self._manager:
+            raise RuntimeError("Proxy de IceStorm.TopicManager inválido")
+
+    def _topic(self, name):
+        try:
+            return self._manager.retrieve(name)
+        except self._IceStorm.NoSuchTopic:
+            try:
+                return self._manager.create(name)
+            except self._IceStorm.TopicExists:
+                return self._manager.retrieve(name)
+
+    def publisher(self, topic, prx_class):
+        return prx_class.uncheckedCast(self._topic(topic).getPublisher().ice_oneway())
+
+    def subscribe(self, topic, proxy):
+        try:
+            self._topic(topic).subscribeAndGetPublisher({}, proxy.ice_oneway())
+        except self._IceStorm.AlreadySubscribed:
+            pass
+
+    def unsubscribe(self, topic, proxy):
+        self._topic(topic).unsubscribe(proxy.ice_oneway())
+
+
+def create_topics(ic):
+    """IceStorm si está configurado y accesible; si no, topics locales."""
+    if ic.getProperties().getProperty("IceStorm.TopicManager.Proxy"):
+        try:
+            topics = IceStormTopics(ic.propertyToProxy("IceStorm.TopicManager.Proxy"))
+            logger.info("Publicando eventos en IceStorm.")
+            return topics
+        except (Ice.Exception, RuntimeError) as e:
+            logger.warning(f"IceStorm no disponible ({e}), usando topics locales.")
+    return LocalTopics()
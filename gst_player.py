@@ -6,28 +6,45 @@ import threading
 from enum import Enum, auto
 from time import monotonic
 
-import gi
-
-gi.require_version('Gst', '1.0')
-from gi.repository import Gst  # type: ignore # noqa: E402
+import gi  # Cheap probe: without PyGObject, importers fall back to a mock player
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("GstPlayer")
 
-Gst.init(None)
+# GStreamer itself is imported and initialised lazily by the player thread, so
+# that importing this module (and starting the Ice adapter) stays cheap.
+Gst = None
+state_map = {None: 'STOP'}
+
+
+def init_gstreamer():
+    global Gst
+    if Gst is None:
+        gi.require_version('Gst', '1.0')
+        from gi.repository import Gst as _Gst  # type: ignore
+
+        _Gst.init(None)
+        state_map.update({
+            _Gst.State.NULL: 'STOP',
+            _Gst.State.READY: 'STOP',
+            _Gst.State.PAUSED: 'PAUSED',
+            _Gst.State.PLAYING: 'PLAYING',
+        })
+        Gst = _Gst
+    return Gst
+
 
-state_map = {
-    Gst.State.NULL: 'STOP',
-    Gst.State.READY: 'STOP',
-    Gst.State.PAUSED: 'PAUSED',
-    Gst.State.PLAYING: 'PLAYING',
-    None: 'STOP'
-}
+def init_gstnet():
+    """GstNet (network clocks), only needed by synchronised groups."""
+    gi.require_version('GstNet', '1.0')
+    from gi.repository import GstNet  # type: ignore
+    return GstNet
 
 class Cmd(Enum):
     CONFIGURED = auto()
     STOP = auto()
     EXHAUSTED = auto()
+    FAILED = auto()
     SHUTDOWN = auto()
 
 
@@ -35,6 +52,8 @@ class GstPlayer(threading.Thread):
     CHUNK_SIZE = 4096
     PIPELINE = 'appsrc name=src ! decodebin ! audioconvert ! audioresample ! autoaudiosink'
     TIMEOUT_SECS = 2
+    WARMUP_TIMEOUT_SECS = 15
+    CLOCK_SYNC_TIMEOUT_SECS = 5
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -42,20 +61,36 @@ class GstPlayer(threading.Thread):
         self.play_confirmed_e = threading.Event()
         self.stop_confirmed_e = threading.Event()
         self.stop_confirmed_e.set()
+        self.ready_e = threading.Event()
 
-        self.pipeline: Gst.Pipeline = None
+        self.pipeline = None
+        self.base_time = None      # Clock time (ns) at which the next track starts
+        self.clock = None          # Leader's network clock, when following a group
+        self.clock_provider = None
         self.get_chunk_hook = None
         self.track_exhausted_hook = lambda: None
+        self.stream_failed_hook = lambda error: None
 
         self.show_stats = False
 
     def run(self):
+        self.warm_up()
         while True:
             command = self.command_queue.get()
             logger.debug(f"Processing command: {command}")
             match command:
                 case Cmd.CONFIGURED:
-                    self.activate_stream()
+                    try:
+                        self.activate_stream()
+                    except Exception as e:
+                        # Without GStreamer play() fails, the thread stays up
+                        logger.error(f"Cannot start playback: {e}")
+                        self.pipeline = None
+                        self.stop_confirmed_e.set()
+                case (Cmd.FAILED, error):
+                    if self.deactivate_stream():
+                        threading.Thread(target=self.stream_failed_hook,
+                                         args=(error,)).start()
                 case Cmd.STOP | Cmd.EXHAUSTED | Cmd.SHUTDOWN:
                     was_active = self.deactivate_stream()
                     if command == Cmd.SHUTDOWN:
@@ -65,6 +100,26 @@ class GstPlayer(threading.Thread):
                 case _:
                     logger.warning(f"Unexpected command: {command}")
 
+    def start(self):
+        """Start the player thread; later calls are no-ops."""
+        if self.ident is None:
+            super().start()
+
+    def warm_up(self):
+        """Initialise GStreamer and build a throwaway pipeline so plugins are
+        loaded before the first play() needs them."""
+        start = monotonic()
+        try:
+            init_gstreamer()
+            pipeline = Gst.parse_launch(self.PIPELINE)
+            pipeline.set_state(Gst.State.READY)
+            pipeline.set_state(Gst.State.NULL)
+            logger.info(f"GStreamer ready in {monotonic() - start:.2f}s")
+        except Exception as e:
+            logger.error(f"GStreamer warm-up failed: {e}")
+        finally:
+            self.ready_e.set()
+
     def setup_pipeline(self):
         retval = Gst.parse_launch(self.PIPELINE)
         self.appsrc = retval.get_by_name('src')
@@ -74,13 +129,65 @@ class GstPlayer(threading.Thread):
         return retval
 
     def activate_stream(self):
+        if Gst is None:
+            raise RuntimeError("GStreamer is not available")
         self.last_time = None
         self.stop_confirmed_e.clear()
         self.pipeline = self.setup_pipeline()
+        if self.base_time is not None:
+            self.schedule_start(self.base_time)
         self.pipeline.set_state(Gst.State.PLAYING)
         self.play_confirmed_e.set()
         logger.info("Playing...")
 
+    def schedule_start(self, base_time):
+        """Preroll, then pin the running time to the shared clock: the sink
+        renders the first sample when the clock reaches `base_time`, and keeps
+        slaving to that clock (drift correction) for the rest of the track."""
+        self.pipeline.set_state(Gst.State.PAUSED)
+        result, _, _ = self.pipeline.get_state(self.TIMEOUT_SECS * Gst.SECOND)
+        if result == Gst.StateChangeReturn.FAILURE:
+            logger.error("Preroll failed")
+        clock = self.clock or Gst.SystemClock.obtain()
+        self.pipeline.use_clock(clock)
+        self.pipeline.set_start_time(Gst.CLOCK_TIME_NONE)  # Keep our base_time
+        self.pipeline.set_base_time(base_time)
+        delay = (base_time - clock.get_time()) / Gst.SECOND
+        logger.info(f"Prerolled; starting in {delay:.3f}s")
+
+    def serve_clock(self):
+        """Publish the system clock over UDP (GstNet) so that the followers of
+        a sync group can slave to it. Returns the port, or 0 if unavailable."""
+        if self.clock_provider is None:
+            if not self.ready_e.wait(self.WARMUP_TIMEOUT_SECS) or Gst is None:
+                return 0
+            try:
+                self.clock_provider = init_gstnet().NetTimeProvider.new(
+                    Gst.SystemClock.obtain(), None, 0)
+            except Exception as e:
+                logger.warning(f"Network clock unavailable: {e}")
+                return 0
+        return self.clock_provider.get_property("port")
+
+    def follow_clock(self, host, port):
+        """Use the leader's network clock from the next track on. Without a
+        host, go back to the system clock. Returns False if it cannot sync."""
+        if not host:
+            self.clock = None
+            return True
+        if not self.ready_e.wait(self.WARMUP_TIMEOUT_SECS) or Gst is None:
+            return False
+        try:
+            clock = init_gstnet().NetClientClock.new("group", host, port, 0)
+            if not clock.wait_for_sync(self.CLOCK_SYNC_TIMEOUT_SECS * Gst.SECOND):
+                logger.warning(f"Network clock {host}:{port} did not sync")
+                return False
+        except Exception as e:
+            logger.warning(f"Network clock unavailable: {e}")
+            return False
+        self.clock = clock
+        return True
+
     def deactivate_stream(self):
         if not self.pipeline:
             return False
@@ -97,7 +204,15 @@ class GstPlayer(threading.Thread):
         assert self.get_chunk_hook
 
         chunk_size = length if length > 0 else self.CHUNK_SIZE
-        if not (chunk := self.get_chunk_hook(chunk_size)):
+        try:
+            chunk = self.get_chunk_hook(chunk_size)
+        except Exception as e:
+            # An error is not the end of the track: stop without advancing
+            src.emit('end-of-stream')
+            logger.error(f"Stream failed: {e}")
+            self.command_queue.put((Cmd.FAILED, e))
+            return
+        if not chunk:
             src.emit('end-of-stream')
             logger.info("Stream exhaused.")
             self.command_queue.put(Cmd.EXHAUSTED)
@@ -118,9 +233,14 @@ class GstPlayer(threading.Thread):
                 print(f"\rbitrate: {bitrate:.2f} kB/s    ", end='', flush=True)
         self.last_time = monotonic()
 
-    def configure(self, get_chunk_hook, track_exhausted_hook=None):
+    def configure(self, get_chunk_hook, track_exhausted_hook=None,
+                  stream_failed_hook=None, base_time=None):
+        """Prepare the next track. With `base_time` (ns of the player clock)
+        playback starts at that instant instead of as soon as possible."""
         self.get_chunk_hook = get_chunk_hook
+        self.base_time = base_time
         self.track_exhausted_hook = track_exhausted_hook or (lambda: None)
+        self.stream_failed_hook = stream_failed_hook or (lambda error: None)
         self.stop_confirmed_e.clear()
         self.command_queue.put(Cmd.CONFIGURED)
 
@@ -154,11 +274,16 @@ class GstPlayer(threading.Thread):
         return self.play_confirmed_e.is_set()
 
     def confirm_play_starts(self):
+        if not self.ready_e.wait(self.WARMUP_TIMEOUT_SECS):
+            logger.warning("GStreamer warm-up still running")
+            return False
         retval = self.play_confirmed_e.wait(self.TIMEOUT_SECS)
         logger.debug(f"play confirmed: {retval}")
         return retval
 
     def shutdown(self):
+        if not self.is_alive():
+            return
         self.command_queue.put(Cmd.SHUTDOWN)
         self.join(self.TIMEOUT_SECS)
         if self.is_alive():
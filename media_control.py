@@ -5,8 +5,11 @@ from time import sleep
 
 import Ice
 
-Ice.loadSlice('-I{} spotifice_v2.ice'.format(Ice.getSliceDir()))
-import Spotifice  # type: ignore # noqa: E402
+import compact_catalog
+from slice_loader import load_spotifice
+from wire import CompressionPolicy
+
+Spotifice = load_spotifice()
 
 
 def get_proxy(ic, property, cls):
@@ -26,12 +29,22 @@ def get_proxy(ic, property, cls):
     return object
 
 
+def fetch_tracks(server, policy):
+    """Pistas del catálogo; con el formato compacto si el servidor lo ofrece."""
+    try:
+        catalog = policy.call(server, "get_compact_catalog")
+    except Ice.OperationNotExistException:
+        return policy.call(server, "get_all_tracks")
+    tracks, _ = compact_catalog.decode(catalog.strings, catalog.tracks, catalog.playlists)
+    return [Spotifice.TrackInfo(*t) for t in tracks]
+
+
 def main(ic):
     server = get_proxy(ic, 'MediaServer.Proxy', Spotifice.MediaServerPrx)
     render = get_proxy(ic, 'MediaRender.Proxy', Spotifice.MediaRenderPrx)
 
     print("Fetching all tracks...")
-    tracks = server.get_all_tracks()
+    tracks = fetch_tracks(server, CompressionPolicy())
     for t in tracks:
         print(f"- {t.title}")
 
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+
+"""Formato de empaquetado pre-troceado para la biblioteca de medios.
+
+Un pack contiene varias pistas MP3 troceadas en segmentos alineados a frame y
+de tamaño acotado, precedidas de un índice (offsets, timestamps y CRC32 por
+segmento). El fichero se mapea en memoria: servir un trozo es una búsqueda en
+el índice más un slice, y todas las pistas comparten un único descriptor.
+
+    ./media_pack.py build <media-dir> <fichero.spkpack> [segment-size]
+    ./media_pack.py info <fichero.spkpack>
+
+Disposición del fichero:
+    MAGIC (8 bytes) | longitud del índice (uint32 LE) | índice JSON | datos
+Los datos de cada pista empiezan alineados a ALIGNMENT bytes. Las pistas con el
+mismo contenido (mismo SHA-256, guardado en el índice) comparten los datos.
+"""
+
+import bisect
+import hashlib
+import json
+import mmap
+import shutil
+import struct
+import sys
+import zlib
+from pathlib import Path
+
+MAGIC = b"SPKPACK1"
+ALIGNMENT = 4096
+SEGMENT_SIZE = 64 * 1024
+REFETCH_ATTEMPTS = 3
+
+
+class ChecksumError(Exception):
+    """Un segmento sigue llegando corrupto tras varios reintentos."""
+
+# --- Análisis de frames MP3 ---
+
+_BITRATES = {  # (MPEG1?, capa) -> kbps por índice
+    (True, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (True, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (True, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (False, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (False, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (False, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000),
+                 0: (11025, 12000, 8000)}
+
+
+def _parse_header(h):
+    """Devuelve (longitud, muestras, sample_rate) de una cabecera de frame, o None."""
+    if h[0] != 0xFF or (h[1] & 0xE0) != 0xE0:
+        return None
+    version = (h[1] >> 3) & 3
+    layer = 4 - ((h[1] >> 1) & 3)
+    br_index, sr_index, padding = h[2] >> 4, (h[2] >> 2) & 3, (h[2] >> 1) & 1
+    if version == 1 or layer == 4 or br_index in (0, 15) or sr_index == 3:
+        return None
+
+    mpeg1 = version == 3
+    bitrate = _BITRATES[(mpeg1, layer)][br_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][sr_index]
+    if layer == 1:
+        return (12 * bitrate // sample_rate + padding) * 4, 384, sample_rate
+    if layer == 3 and not mpeg1:
+        return 72 * bitrate // sample_rate + padding, 576, sample_rate
+    return 144 * bitrate // sample_rate + padding, 1152, sample_rate
+
+
+def _id3v2_size(data):
+    if len(data) < 10 or data[:3] != b"ID3":
+        return 0
+    size = 0
+    for b in data[6:10]:
+        size = (size << 7) | (b & 0x7F)
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def iter_frames(data):
+    """Genera (offset, longitud, muestras, sample_rate) de cada frame MP3."""
+    pos, end = _id3v2_size(data), len(data)
+    while pos + 4 <= end:
+        frame = _parse_header(data[pos:pos + 4])
+        if frame and pos + frame[0] <= end:
+            yield (pos,) + frame
+            pos += frame[0]
+        else:
+            pos += 1  # Resincronizar
+
+
+def duration_ms(data):
+    """Duración de un MP3 en milisegundos según sus frames."""
+    return sum(s * 1000 / sr for _, _, s, sr in iter_frames(data))
+
+
+def probe_duration_ms(path, head_size=64 * 1024):
+    """Duración aproximada leyendo sólo el principio del fichero.
+
+    Usa el número de frames de la cabecera Xing/Info si existe (exacto también
+    en VBR); si no, estima a partir del bitrate del primer frame (CBR).
+    """
+    path = Path(path)
+    total = path.stat().st_size
+    with open(path, "rb") as f:
+        head = f.read(head_size)
+
+    first = next(iter_frames(head), None)
+    if not first:
+        return 0
+    offset, length, samples, rate = first
+    frame = head[offset:offset + length]
+    for tag in (b"Xing", b"Info"):
+        pos = frame.find(tag)
+        if pos >= 0 and len(frame) >= pos + 12:
+            flags = struct.unpack_from(">I", frame, pos + 4)[0]
+            if flags & 1:
+                frames = struct.unpack_from(">I", frame, pos + 8)[0]
+                return int(frames * samples * 1000 / rate)
+
+    bitrate = length * rate / samples * 8  # bits/s del primer frame
+    return int((total - offset) * 8 * 1000 / bitrate)
+
+
+def segment(data, segment_size=SEGMENT_SIZE):
+    """Trocea un MP3 en segmentos alineados a frame.
+
+    Devuelve [(offset, longitud, timestamp_ms, crc32), ...] cubriendo el fichero
+    entero: las cabeceras ID3 van en el primer segmento y la basura final en el
+    último.
+    """
+    cuts, times = [0], [0.0]
+    start, elapsed = 0, 0.0
+    for offset, length, samples, rate in iter_frames(data):
+        if offset > start and offset + length - start > segment_size:
+            cuts.append(offset)
+            times.append(elapsed)
+            start = offset
+        elapsed += samples * 1000 / rate
+
+    cuts.append(len(data))
+    return [(a, b - a, int(t), zlib.crc32(data[a:b]))
+            for a, b, t in zip(cuts, cuts[1:], times) if b > a]
+
+
+def covering(segments, offset, max_size):
+    """Segmentos completos a servir desde el que contiene `offset`.
+
+    `segments` es [(offset, longitud, crc32), ...]. Devuelve al menos un segmento
+    (aunque supere `max_size`) y, después, tantos como quepan en `max_size`;
+    ninguno si `offset` está al final de la pista (o más allá).
+    """
+    if not segments or offset >= segments[-1][0] + segments[-1][1]:
+        return []
+    starts = [s[0] for s in segments]
+    i = max(0, bisect.bisect_right(starts, offset) - 1)
+    chosen, total = [], 0
+    for seg in segments[i:]:
+        if chosen and total + seg[1] > max_size:
+            break
+        chosen.append(seg)
+        total += seg[1]
+    return chosen
+
+
+def bad_segments(data, base, segments):
+    """Segmentos de `data` (que empieza en el offset `base`) con CRC incorrecto."""
+    view = memoryview(data)
+    return [seg for seg in segments
+            if zlib.crc32(view[seg[0] - base:seg[0] - base + seg[1]]) != seg[2]]
+
+
+def read_verified(session, offset, max_size, attempts=REFETCH_ATTEMPTS):
+    """Lee con `session.read_checked` desde `offset` verificando los CRC.
+
+    Sólo se vuelven a pedir los segmentos corruptos. Devuelve (bytes desde
+    `offset`, número de segmentos re-leídos); b"" indica fin de pista. Sin
+    tabla de segmentos (renditions) los datos se devuelven sin verificar.
+    """
+    chunk = session.read_checked(offset, max_size)
+    base, data = chunk.offset, bytes(chunk.data)
+    segments = [(s.offset, s.size, s.crc) for s in chunk.segments]
+    pieces = {seg: data[seg[0] - base:seg[0] - base + seg[1]] for seg in segments}
+
+    refetched = 0
+    bad = bad_segments(data, base, segments)
+    for _ in range(attempts):
+        if not bad:
+            break
+        for seg in bad:
+            again = session.read_checked(seg[0], seg[1])
+            start = seg[0] - again.offset
+            pieces[seg] = bytes(again.data[start:start + seg[1]])
+            refetched += 1
+        bad = [seg for seg in bad if zlib.crc32(pieces[seg]) != seg[2]]
+    if bad:
+        raise ChecksumError(f"Segmento corrupto en el byte {bad[0][0]}")
+
+    if segments:
+        data = b"".join(pieces[seg] for seg in segments)
+    return data[offset - base:], refetched
+
+
+# --- Escritura ---
+
+def build_pack(files, out_path, segment_size=SEGMENT_SIZE):
+    """Crea un pack con los ficheros indicados (el id de pista es su nombre).
+
+    Los ficheros duplicados se guardan una vez: sus entradas apuntan al mismo blob.
+    Dos pasadas: el índice sólo guarda digests y tamaños, y después cada fichero
+    se copia al pack por trozos (en memoria, como mucho una pista a la vez).
+    """
+    entries, blobs = {}, {}  # blobs: {sha256: (fichero, tamaño)}
+    for f in files:
+        data = Path(f).read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+        if digest not in blobs:
+            blobs[digest] = (Path(f), len(data))
+            entry = {"size": len(data), "duration_ms": int(duration_ms(data)),
+                     "segments": segment(data, segment_size), "sha256": digest}
+        else:
+            entry = next(e for e in entries.values() if e["sha256"] == digest)
+        entries[Path(f).name] = dict(entry)
+
+    # El índice contiene los offsets absolutos, que dependen de su propio tamaño:
+    # se calcula con offsets provisionales y se recalcula hasta que se estabiliza.
+    data_start = 0
+    while True:
+        pos, offsets = data_start, {}
+        for digest, (_, size) in blobs.items():
+            offsets[digest] = pos
+            pos += _align(size)
+        for entry in entries.values():
+            entry["offset"] = offsets[entry["sha256"]]
+        index = json.dumps({"version": 1, "segment_size": segment_size,
+                            "tracks": entries}).encode("utf-8")
+        needed = _align(len(MAGIC) + 4 + len(index))
+        if needed == data_start:
+            break
+        data_start = needed
+
+    with open(out_path, "wb") as out:
+        out.write(MAGIC + struct.pack("<I", len(index)) + index)
+        out.write(b"\0" * (data_start - out.tell()))
+        for digest, (path, size) in blobs.items():
+            with open(path, "rb") as src:
+                shutil.copyfileobj(src, out)
+            if out.tell() != offsets[digest] + size:
+                raise ValueError(f"{path.name} cambió mientras se empaquetaba")
+            out.write(b"\0" * (_align(size) - size))
+    return entries
+
+
+def _align(n):
+    return (n + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+# --- Lectura ---
+
+class PackStream:
+    """Vista de sólo lectura sobre una pista del pack (interfaz tipo fichero)."""
+    def __init__(self, view, segments):
+        self._view = view
+        self._segments = segments
+        self._starts = [s[0] for s in segments]
+        self._pos = 0
+
+    def read(self, size=-1):
+        end = len(self._view) if size < 0 else min(self._pos + size, len(self._view))
+        data = bytes(self._view[self._pos:end])
+        self._pos = end
+        return data
+
+    def seek(self, offset):
+        self._pos = max(0, min(offset, len(self._view)))
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def segment_index(self, offset):
+        """Índice del segmento que contiene un offset."""
+        return max(0, bisect.bisect_right(self._starts, offset) - 1)
+
+    def seek_time(self, ms):
+        """Se posiciona en el segmento que contiene el instante `ms`."""
+        times = [s[2] for s in self._segments]
+        seg = self._segments[max(0, bisect.bisect_right(times, ms) - 1)]
+        return self.seek(seg[0])
+
+    def close(self):
+        self._view.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MediaPack:
+    """Pack mapeado en memoria; un descriptor para todas sus pistas."""
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{self.path.name} no es un pack válido")
+
+        (length,) = struct.unpack_from("<I", self._mmap, len(MAGIC))
+        start = len(MAGIC) + 4
+        header = json.loads(self._mmap[start:start + length])
+        self.segment_size = header["segment_size"]
+        self.tracks = header["tracks"]
+
+    def __contains__(self, track_id):
+        return track_id in self.tracks
+
+    def open(self, track_id) -> PackStream:
+        entry = self.tracks[track_id]
+        view = memoryview(self._mmap)[entry["offset"]:entry["offset"] + entry["size"]]
+        return PackStream(view, entry["segments"])
+
+    def verify(self, track_id):
+        """Comprueba los CRC32 de todos los segmentos de una pista."""
+        entry = self.tracks[track_id]
+        base = entry["offset"]
+        return all(zlib.crc32(self._mmap[base + off:base + off + n]) == crc
+                   for off, n, _, crc in entry["segments"])
+
+    def close(self):
+        self._mmap.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 4 and sys.argv[1] == "build":
+        media_dir = Path(sys.argv[2])
+        seg_size = int(sys.argv[4]) if len(sys.argv) > 4 else SEGMENT_SIZE
+        files = sorted(f for f in media_dir.iterdir()
+                       if f.is_file() and f.suffix.lower() == ".mp3")
+        entries = build_pack(files, sys.argv[3], seg_size)
+        print(f"Packed {len(entries)} tracks into {sys.argv[3]}")
+    elif len(sys.argv) == 3 and sys.argv[1] == "info":
+        pack = MediaPack(sys.argv[2])
+        for track_id, entry in pack.tracks.items():
+            print(f"{track_id}: {entry['size']} bytes, {entry['duration_ms']} ms, "
+                  f"{len(entry['segments'])} segments")
+    else:
+        sys.exit("Usage: media_pack.py build <media-dir> <pack> [segment-size]\n"
+                 "       media_pack.py info <pack>")
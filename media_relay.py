@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+
+import logging
+import sys
+import threading
+from collections import OrderedDict
+
+import Ice
+
+from events import CATALOG_TOPIC, create_topics
+from media_pack import covering, read_verified
+from render_cache import AudioCache, cache_key
+from slice_loader import load_spotifice
+from transcoder import ORIGINAL
+from wire import CompressionPolicy, uncompressed
+
+# Cargar la definición de la interfaz Slice
+Spotifice = load_spotifice()  # Precompilado con `make slice` o, si no, desde el .ice
+
+logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(name)s: %(message)s')
+logger = logging.getLogger("MediaRelay")
+
+
+class TrackFetch:
+    """Descarga única de una pista desde el servidor central.
+
+    Un hilo trae la pista a la caché de disco y todas las sesiones del sitio que
+    la piden leen del mismo fichero a medida que crece, así que el enlace con el
+    servidor central transporta cada pista una vez por sitio.
+    """
+    CHUNK_SIZE = 64 * 1024
+    OPEN_TIMEOUT = 30  # s hasta que el servidor central abre la pista
+
+    def __init__(self, relay, track_id, quality, key, digest):
+        self.relay = relay
+        self.track_id = track_id
+        self.quality = quality
+        self.key = key
+        self.size = 0
+        self.complete = False
+        self.error = None
+        self._writer = relay.cache.writer(key, digest)
+        self.path = self._writer.path
+        self._cond = threading.Condition()
+        self._opened = threading.Event()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        secure = None
+        try:
+            secure = self.relay.upstream_session()
+            secure.open_stream(self.track_id, self.quality)
+            self._opened.set()
+            # Lecturas verificadas: un segmento corrupto se vuelve a pedir sin reiniciar
+            while True:
+                chunk, refetched = read_verified(secure, self.size, self.CHUNK_SIZE)
+                if refetched:
+                    logger.warning(
+                        f"{refetched} segmentos corruptos re-leídos de {self.track_id}")
+                if not chunk:
+                    break
+                self._writer.write(chunk)
+                self._writer.flush()
+                with self._cond:
+                    self.size += len(chunk)
+                    self._cond.notify_all()
+            self._writer.commit()
+            logger.info(f"Pista cacheada en el relay: {self.track_id}")
+        except Exception as e:
+            logger.error(f"Error trayendo {self.track_id} del servidor central: {e}")
+            self.error = e
+            self._writer.abort()
+        finally:
+            with self._cond:
+                self.complete = True
+                self._cond.notify_all()
+            self._opened.set()
+            self.relay.fetch_finished(self)
+            if secure:
+                try:
+                    secure.close()
+                except Ice.Exception:
+                    pass
+
+    def wait_opened(self):
+        """Espera a que el servidor central abra la pista; propaga RenditionPending."""
+        if not self._opened.wait(self.OPEN_TIMEOUT):
+            raise Spotifice.StreamError(item=self.track_id,
+                                        reason="El servidor central no abrió la pista")
+        if isinstance(self.error, Spotifice.RenditionPending):
+            raise self.error
+
+    def wait_for(self, end, timeout=None):
+        """Espera hasta tener `end` bytes, hasta que termine la descarga o
+        hasta `timeout` segundos; devuelve los bytes disponibles."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.size >= end or self.complete, timeout)
+            return self.size
+
+
+class FetchReader:
+    """Lectura de una pista en descarga, con interfaz tipo fichero."""
+    READ_TIMEOUT = 10  # s sin datos nuevos del servidor central
+
+    def __init__(self, fetch):
+        self._fetch = fetch
+        self._fh = open(fetch.path, "rb")  # Sigue siendo válido tras el rename final
+        self._pos = 0
+
+    def read(self, size):
+        fetch = self._fetch
+        available = fetch.wait_for(self._pos + size, self.READ_TIMEOUT)
+        if available <= self._pos and fetch.error:
+            raise Spotifice.StreamError(
+                item=fetch.track_id,
+                reason=f"Error en el servidor central: {fetch.error}")
+        if available <= self._pos and not fetch.complete:
+            raise Spotifice.StreamError(
+                item=fetch.track_id, reason="El servidor central no envía datos")
+        self._fh.seek(self._pos)
+        data = self._fh.read(min(size, available - self._pos))
+        self._pos += len(data)
+        return data
+
+    def seek(self, offset):
+        self._pos = offset
+
+    def close(self):
+        self._fh.close()
+
+
+class RelaySessionI(Spotifice.SecureStreamManager):
+    """Sesión local del relay: el audio sale de la caché del sitio."""
+    def __init__(self, relay, user_info):
+        self._relay = relay
+        self._user_info = user_info  # Del servidor central, al autenticarse
+        self._username = user_info.username
+        self._fh = None
+        self._segments = []  # CRC del servidor central: detectan errores del disco local
+
+    def get_user_info(self, current=None):
+        return self._user_info
+
+    def open_stream(self, track_id, quality=Ice.Unset, current=None):
+        self.close_stream(current)
+        self._fh = self._relay.open_track(track_id, quality)
+        original = quality is Ice.Unset or quality in ("", ORIGINAL)
+        self._segments = [(s.offset, s.size, s.crc) for s in
+                          self._relay.get_track_segments(track_id)] if original else []
+
+    def open_stream_at(self, track_id, offset, quality=Ice.Unset, current=None):
+        self.open_stream(track_id, quality, current)
+        self._fh.seek(offset)
+
+    def get_audio_chunk(self, chunk_size, current=None):
+        if not self._fh:
+            raise Spotifice.StreamError(reason="No hay stream abierto")
+        return self._fh.read(chunk_size)
+
+    def read_checked(self, offset, max_size, current=None):
+        if not self._fh:
+            raise Spotifice.StreamError(reason="No hay stream abierto")
+        segments = covering(self._segments, offset, max_size)
+        start = segments[0][0] if segments else offset
+        self._fh.seek(start)
+        data = self._fh.read(sum(s[1] for s in segments) if segments else max_size)
+        return Spotifice.CheckedChunk(offset=start, data=data,
+                                      segments=[Spotifice.Segment(*s) for s in segments])
+
+    def close_stream(self, current=None):
+        if self._fh:
+            self._fh.close()
+            self._fh = None
+
+    def close(self, current=None):
+        self.close_stream(current)
+        if current:
+            current.adapter.remove(current.id)
+        logger.info(f"Sesión finalizada para usuario: {self._username}")
+
+
+class CatalogListenerI(Spotifice.CatalogEvents):
+    def __init__(self, relay):
+        self._relay = relay
+
+    def catalog_changed(self, server_id, version, current=None):
+        logger.info(f"Catálogo modificado en {server_id} (v{version}): vaciando caché")
+        self._relay.invalidate_catalog()
+
+    def playlist_changed(self, server_id, change, current=None):
+        pass  # Llega también catalog_changed
+
+
+class MediaRelayI(Spotifice.MediaServer):
+    """Relay de sitio: implementa MediaServer reenviando autenticación y
+    catálogo al servidor central y sirviendo el audio desde una caché local."""
+    CATALOG_ENTRIES = 4096  # Respuestas de catálogo en caché (LRU)
+
+    def __init__(self, upstream, cache, credentials):
+        self.upstream = upstream
+        self.cache = cache
+        self.proxy = None           # Proxy propio (lo fija main)
+        self._credentials = credentials
+        self._catalog = OrderedDict()  # {(operación, args): resultado}, LRU
+        self._catalog_epoch = 0     # Cambia con cada catalog_changed
+        self._compression = CompressionPolicy()  # Compresión sólo en respuestas grandes
+        self._fetches = {}          # {clave de caché: TrackFetch}
+        self._lock = threading.Lock()
+
+    # --- Catálogo (con caché hasta el siguiente catalog_changed) ---
+    def _cached(self, op, *args):
+        key = (op,) + args
+        with self._lock:
+            if key in self._catalog:
+                self._catalog.move_to_end(key)
+                return self._catalog[key]
+            epoch = self._catalog_epoch
+        result = self._compression.call(self.upstream, op, *args)
+        with self._lock:
+            if epoch == self._catalog_epoch:  # Si no, puede ser anterior al cambio
+                self._catalog[key] = result
+                while len(self._catalog) > self.CATALOG_ENTRIES:
+                    self._catalog.popitem(last=False)
+        return result
+
+    def invalidate_catalog(self):
+        with self._lock:
+            self._catalog.clear()
+            self._catalog_epoch += 1
+
+    def get_all_tracks(self, current=None):
+        return self._cached("get_all_tracks")
+
+    def get_track_info(self, track_id, current=None):
+        return self._cached("get_track_info", track_id)
+
+    def get_track_digest(self, track_id, current=None):
+        return self._cached("get_track_digest", track_id)
+
+    def get_track_segments(self, track_id, current=None):
+        return self._cached("get_track_segments", track_id)
+
+    def get_compact_catalog(self, current=None):
+        return self._cached("get_compact_catalog")
+
+    def get_all_playlists(self, current=None):
+        return self._cached("get_all_playlists")
+
+    def get_playlist(self, playlist_id, current=None):
+        return self._cached("get_playlist", playlist_id)
+
+    def get_playlists_with_track(self, track_id, current=None):
+        return self._cached("get_playlists_with_track", track_id)
+
+    def get_playlist_summary(self, playlist_id, current=None):
+        return self._cached("get_playlist_summary", playlist_id)
+
+    # --- Edición de playlists (se reenvía; el evento de catálogo vacía la caché) ---
+    def create_playlist(self, playlist, current=None):
+        self.upstream.create_playlist(playlist)
+
+    def update_playlist(self, playlist, current=None):
+        self.upstream.update_playlist(playlist)
+
+    def append_tracks(self, playlist_id, track_ids, current=None):
+        self.upstream.append_tracks(playlist_id, track_ids)
+
+    def delete_playlist(self, playlist_id, current=None):
+        self.upstream.delete_playlist(playlist_id)
+
+    # --- Autenticación ---
+    def authenticate(self, media_render, username, password, current=None):
+        # Las credenciales las valida el servidor central; su sesión sólo sirve
+        # para eso y para los datos del usuario: el audio sale de la del relay
+        upstream = self.upstream.authenticate(media_render, username, password)
+        try:
+            info = upstream.get_user_info()
+        except Ice.OperationNotExistException:
+            info = Spotifice.UserInfo(username=username)
+        finally:
+            try:
+                upstream.close()
+            except Ice.Exception as e:
+                logger.debug(f"No se pudo cerrar la sesión central de {username}: {e}")
+        proxy = current.adapter.addWithUUID(RelaySessionI(self, info))
+        logger.info(f"Sesión de relay creada para: {username}")
+        return Spotifice.SecureStreamManagerPrx.uncheckedCast(proxy)
+
+    def upstream_session(self):
+        """Sesión propia del relay en el servidor central, para las descargas."""
+        if not self._credentials:
+            raise Spotifice.StreamError(
+                reason="Relay sin credenciales (MediaRelay.Username)")
+        username, password = self._credentials
+        render = Spotifice.MediaRenderPrx.uncheckedCast(self.proxy)
+        return uncompressed(self.upstream.authenticate(render, username, password))
+
+    # --- Audio ---
+    def open_track(self, track_id, quality):
+        digest = self.get_track_digest(track_id)
+        # Clave por contenido: pistas duplicadas comparten caché y descarga
+        key = cache_key(digest, quality)
+        path = self.cache.get(key, digest)
+        if path:
+            return open(path, "rb")
+
+        with self._lock:
+            fetch = self._fetches.get(key)
+            if not fetch:
+                logger.info(f"Trayendo del servidor central: {track_id}")
+                fetch = TrackFetch(self, track_id, quality, key, digest)
+                self._fetches[key] = fetch
+        # Sin rendition lista, el cliente recibe RenditionPending y pide el original
+        fetch.wait_opened()
+        return FetchReader(fetch)
+
+    def fetch_finished(self, fetch):
+        with self._lock:
+            self._fetches.pop(fetch.key, None)
+
+
+def main(ic):
+    props = ic.getProperties()
+    upstream = Spotifice.MediaServerPrx.uncheckedCast(
+        ic.propertyToProxy("MediaRelay.Upstream"))
+    if not upstream:
+        raise RuntimeError("Falta la propiedad MediaRelay.Upstream")
+
+    cache = AudioCache(
+        props.getPropertyWithDefault("MediaRelay.CacheDir", "relay-cache"),
+        props.getPropertyAsIntWithDefault("MediaRelay.CacheSize", 4096) * 1024 * 1024)
+    username = props.getProperty("MediaRelay.Username")
+    credentials = None
+    if username:
+        credentials = (username, props.getProperty("MediaRelay.Password"))
+
+    # Las lecturas esperan al servidor central: varios hilos de dispatch
+    if not props.getProperty("MediaRelayAdapter.ThreadPool.Size"):
+        props.setProperty("MediaRelayAdapter.ThreadPool.Size", "8")
+
+    adapter = ic.createObjectAdapter("MediaRelayAdapter")
+    servant = MediaRelayI(upstream, cache, credentials)
+    identity = props.getPropertyWithDefault("Identity", "MediaRelay")
+    servant.proxy = adapter.add(servant, ic.stringToIdentity(identity))
+
+    listener = adapter.addWithUUID(CatalogListenerI(servant))
+    try:
+        create_topics(ic).subscribe(CATALOG_TOPIC, listener)
+    except Ice.Exception as e:
+        logger.warning(f"Sin eventos de catálogo ({e}): la caché de catálogo no caduca")
+
+    adapter.activate()
+    logger.info(f"MediaRelay activo: {servant.proxy}")
+    ic.waitForShutdown()
+
+
+if __name__ == "__main__":
+    with Ice.initialize(sys.argv) as communicator:
+        main(communicator)
@@ -2,77 +2,468 @@
 
 import logging
 import sys
+import threading
+import time
 from contextlib import contextmanager
+from functools import partial
+
 import Ice
 from Ice import identityToString as id2str
 
-# Intentamos importar el player real, si falla usamos uno simulado (Mock)
+from events import RENDER_TOPIC, LocalTopics, create_topics
+from media_pack import read_verified
+from render_cache import AudioCache, LocalStream, cache_key
+from render_proxies import ManagedProxy, ProxyManager
+from slice_loader import load_spotifice
+from wire import uncompressed
+
+logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(name)s: %(message)s')
+logger = logging.getLogger("MediaRender")
+
+# Intentamos importar el player real (GStreamer vía PyGObject); si falla
+# usamos uno simulado (Mock)
 try:
     from gst_player import GstPlayer
     USING_MOCK = False
 except ImportError:
-    logger.warning("gst_player.py no encontrado. Usando MockPlayer simulado.")
+    logger.warning("GStreamer (gi) no disponible. Usando MockPlayer simulado.")
     USING_MOCK = True
     class GstPlayer:
         def __init__(self): self.playing = False
         def is_playing(self): return self.playing
         def stop(self): self.playing = False; return True
-        def configure(self, cb): pass
+        def configure(self, cb, exhausted_cb=None, failed_cb=None, base_time=None): pass
+        def serve_clock(self): return 0
+        def follow_clock(self, host, port): return False
         def confirm_play_starts(self): self.playing = True; return True
         def start(self): pass
+        def is_alive(self): return False
         def shutdown(self): pass
 
 # Cargar Slice
-Ice.loadSlice('-I{} spotifice_v2.ice'.format(Ice.getSliceDir()))
-import Spotifice
+Spotifice = load_spotifice()  # Precompilado con `make slice` o, si no, desde el .ice
+
+
+class ResumableStream:
+    """Stream de audio con buffer de lectura anticipada y reanudación por offset.
+
+    Un hilo de fondo mantiene el buffer lleno. Si la réplica que sirve la sesión
+    cae, el hilo se re-autentica contra otro miembro del grupo de réplicas y
+    reabre la pista en el último byte recibido, mientras el player sigue
+    consumiendo del buffer. Las lecturas son posicionales y llegan con el CRC de
+    cada segmento: sólo se vuelven a pedir los segmentos corruptos.
+    """
+    FETCH_SIZE = 16 * 1024
+    HIGH_WATER = 256 * 1024   # ~16 s de audio a 128 kbps
+    HEALTH_PERIOD = 1.0       # Segundos entre eventos buffer_health
+    FAILOVER_ATTEMPTS = 5
+    FAILOVER_BACKOFF = 0.5
+
+    def __init__(self, render, track_id, sinks=(), digest=None):
+        self.render = render
+        self.proxies = render.proxies  # Servidor dueño de la pista (fijo en el stream)
+        self.session = ManagedProxy(self.proxies, "session")
+        self.track_id = track_id
+        self.quality = render.quality  # Servida: la pedida o, si no está lista, original
+        self.digest = digest       # Con digest, lo recibido se guarda en la caché
+        self.sinks = list(sinks)   # Copias de lo recibido (caché, grupo sincronizado)
+        self.offset = 0            # Bytes recibidos del servidor
+        self._buffer = bytearray()
+        self._eof = False
+        self._error = None
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._fill, daemon=True)
+        self._last_health = 0
+        self._checked = True       # Falso si el servidor no implementa read_checked
+
+    def open(self):
+        try:
+            self.session.open_stream(self.track_id, self.quality)
+        except (Spotifice.RenditionPending, Spotifice.IOError) as e:
+            if self.quality is Ice.Unset:
+                raise  # Falla el propio original
+            logger.info(f"{e.reason}: reproduciendo el original.")
+            self.quality = Ice.Unset
+            self.session.open_stream(self.track_id, self.quality)
+        if self.digest and self.render.cache:
+            key = cache_key(self.digest, self.quality)
+            self.sinks.append(self.render.cache.writer(key, self.digest))
+        self._thread.start()
+
+    def read(self, size):
+        """Devuelve hasta `size` bytes; b"" indica fin de pista. Si el stream
+        falló, lanza StreamError una vez entregado lo que ya había llegado."""
+        with self._cond:
+            self._cond.wait_for(
+                lambda: len(self._buffer) >= size or self._eof or self._closed)
+            if self._error and not self._buffer:
+                raise Spotifice.StreamError(item=self.track_id,
+                                            reason=f"Stream interrumpido: {self._error}")
+            data = bytes(self._buffer[:size])
+            del self._buffer[:size]
+            self._cond.notify_all()
+            return data
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            if not self._eof:
+                for sink in self.sinks:
+                    sink.abort()  # Pista incompleta: no se publica
+                self.sinks = []
+
+    def _fill(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: len(self._buffer) < self.HIGH_WATER or self._closed)
+                if self._closed:
+                    return
+            try:
+                chunk = self._fetch()
+            except Exception as e:
+                logger.error(f"Error en stream: {e}")
+                chunk, self._error = b"", e
+            with self._cond:
+                if not chunk:
+                    self._eof = True
+                    self._finish_sink()
+                    self._cond.notify_all()
+                    return
+                self._buffer += chunk
+                self.offset += len(chunk)
+                for sink in self.sinks:
+                    sink.write(chunk)
+                self._cond.notify_all()
+                buffered = len(self._buffer)
+            self._report_health(buffered)
+
+    def _report_health(self, buffered):
+        now = time.monotonic()
+        if now - self._last_health >= self.HEALTH_PERIOD:
+            self._last_health = now
+            try:
+                self.render.events.buffer_health(self.render.render_id, buffered,
+                                                 self.offset)
+            except Ice.Exception as e:
+                logger.debug(f"No se pudo publicar buffer_health: {e}")
+
+    def _finish_sink(self):
+        for sink in self.sinks:
+            if self._error or self._closed:
+                sink.abort()
+            else:
+                sink.commit()
+        self.sinks = []
+
+    def _fetch(self):
+        try:
+            return self._read()
+        except Spotifice.Error:
+            raise
+        except Ice.Exception as e:
+            logger.warning(f"Réplica perdida en byte {self.offset} ({e}). Reanudando...")
+            self._failover()
+            return self._read()
+
+    def _read(self):
+        secure = self.session
+        if self._checked:
+            try:
+                data, refetched = read_verified(secure, self.offset, self.FETCH_SIZE)
+                if refetched:
+                    logger.warning(f"{refetched} segmentos corruptos re-leídos "
+                                   f"en byte {self.offset}")
+                return data
+            except Ice.OperationNotExistException:
+                logger.info("Servidor sin read_checked: stream sin verificar.")
+                self._checked = False
+        return secure.get_audio_chunk(self.FETCH_SIZE)
+
+    def _failover(self):
+        render = self.render
+        # Sesión compartida: cualquier réplica del grupo puede continuarla
+        try:
+            secure = self.proxies.origin[1].ice_locatorCacheTimeout(0)
+            secure.open_stream_at(self.track_id, self.offset, self.quality)
+            self.proxies.bind(self.proxies.origin[0], secure)
+            logger.info("Stream reanudado en otra réplica con la misma sesión.")
+            return
+        except Ice.Exception as e:
+            logger.warning(f"La sesión no pudo reanudarse ({e}). Re-autenticando...")
+
+        if not render.credentials or not render.proxy:
+            raise Spotifice.StreamError(reason="Sin credenciales para reanudar el stream")
+
+        username, password = render.credentials
+        for attempt in range(1, self.FAILOVER_ATTEMPTS + 1):
+            if self._closed:
+                raise Spotifice.StreamError(reason="Stream cerrado durante el failover")
+            try:
+                # Sin caché de localizador: IceGrid resuelve otra réplica del grupo
+                server = self.proxies.origin[0].ice_locatorCacheTimeout(0)
+                secure = server.authenticate(render.proxy, username, password)
+                secure.open_stream_at(self.track_id, self.offset, self.quality)
+                self.proxies.bind(self.proxies.origin[0], secure)
+                logger.info(f"Stream reanudado en otra réplica (intento {attempt}).")
+                return
+            except Spotifice.AuthError:
+                raise
+            except Ice.Exception as e:
+                logger.warning(f"Failover intento {attempt} fallido: {e}")
+                time.sleep(self.FAILOVER_BACKOFF * attempt)
+
+        raise Spotifice.StreamError(reason="Ninguna réplica disponible para reanudar")
+
+
+class SharedTrack:
+    """Ventana en memoria de la pista del líder que leen los seguidores.
+
+    El servidor sólo transmite la pista una vez por grupo: los seguidores piden
+    los bytes al líder con read_shared, que se responde de forma asíncrona en
+    cuanto los datos llegan. Como todos reproducen a la vez, basta conservar
+    los últimos WINDOW bytes; una pista ya cacheada se lee del fichero.
+    """
+    WINDOW = 1024 * 1024  # Más que la lectura anticipada del líder (HIGH_WATER)
+
+    def __init__(self, track_id, path=None):
+        self.track_id = track_id
+        self._path = path          # Fichero completo (caché) en vez de ventana
+        self._data = bytearray()
+        self._base = 0             # Offset en la pista de _data[0]
+        self._complete = path is not None
+        self._pending = []  # [(offset, size, Ice.Future)]
+        self._lock = threading.Lock()
+
+    def write(self, data):
+        with self._lock:
+            self._data += data
+            self._serve()
+            excess = len(self._data) - self.WINDOW
+            if excess > 0:
+                del self._data[:excess]
+                self._base += excess
+
+    def commit(self):
+        with self._lock:
+            self._complete = True
+            self._serve()
+
+    abort = commit  # Los seguidores reciben fin de pista
+
+    def read(self, offset, size):
+        future = Ice.Future()
+        if self._path:
+            try:
+                with open(self._path, "rb") as f:
+                    f.seek(offset)
+                    future.set_result(f.read(size))
+            except OSError as e:  # Entrada desalojada de la caché
+                future.set_exception(
+                    Spotifice.StreamError(item=self.track_id, reason=str(e)))
+            return future
+        with self._lock:
+            self._pending.append((offset, size, future))
+            self._serve()
+        return future
+
+    def _serve(self):
+        waiting = []
+        end = self._base + len(self._data)
+        for offset, size, future in self._pending:
+            if offset < self._base:
+                future.set_exception(Spotifice.StreamError(
+                    item=self.track_id, reason=f"Byte {offset} ya fuera de la ventana"))
+            elif end >= offset + size or self._complete:
+                start = offset - self._base
+                future.set_result(bytes(self._data[start:start + size]))
+            else:
+                waiting.append((offset, size, future))
+        self._pending = waiting
+
+
+class RelayStream:
+    """Stream de un seguidor: lee la pista compartida del líder del grupo."""
+    def __init__(self, leader, track_id):
+        self.leader = uncompressed(leader)
+        self.track_id = track_id
+        self.offset = 0
+
+    def open(self): pass
+
+    def read(self, size):
+        try:
+            data = self.leader.read_shared(self.track_id, self.offset, size)
+        except Spotifice.Error:
+            raise
+        except Ice.Exception as e:
+            raise Spotifice.StreamError(item=self.track_id,
+                                        reason=f"Error leyendo del líder: {e}")
+        self.offset += len(data)
+        return data
+
+    def close(self): pass
 
-logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(name)s: %(message)s')
-logger = logging.getLogger("MediaRender")
 
 class MediaRenderI(Spotifice.MediaRender):
     """Implementación del cliente reproductor."""
     def __init__(self, player_backend):
         self.player = player_backend
-        self.server = None  # Proxy al MediaServer
-        self.secure = None  # Proxy al SecureStreamManager (sesión)
+        self.proxies = ProxyManager()  # Servidor de la pista actual (conexión, timeouts)
+        self.federation = {}           # {proxy del servidor en texto: ProxyManager}
+        self._owners = {}              # {(operación, id): clave en federation}
+        self.proxy_config = (None, None)  # (adaptador, propiedades) para los ProxyManager
         self.current_track = None
         self.playlist = None
         self.index = -1
         self.repeat = False
         self._paused = False
+        self.proxy = None        # Proxy propio, necesario para re-autenticarse
+        self.credentials = None  # (usuario, contraseña) para el failover
+        self._stream = None      # ResumableStream en curso
+        self._delivered = 0      # Bytes de la pista en curso entregados al player
+        self._empty_tracks = 0   # Pistas seguidas que terminaron sin audio
+        self.quality = Ice.Unset # Calidad pedida al servidor (Unset = original)
+        self.cache = None        # AudioCache opcional para escuchas repetidas
+        self.render_id = ""      # Identidad publicada en los eventos
+        self.topics = LocalTopics()
+        self.events = self.topics.publisher(RENDER_TOPIC, Spotifice.RenderEventsPrx)
+        self._lock = threading.RLock()  # Dispatch de Ice vs. hilo de fin de pista
+        self.leader = None       # MediaRenderPrx del líder si somos seguidor
+        self.followers = {}      # {identidad: MediaRenderPrx} si somos líder
+        self.clock_offset = 0    # Reloj del grupo - reloj local (µs)
+        self._net_clock = False  # El player sigue el reloj de red del líder
+        self._shared = None      # SharedTrack servida a los seguidores
+
+    @property
+    def server(self):
+        """Proxy al MediaServer (fijo a la conexión de la sesión), o None."""
+        return ManagedProxy(self.proxies, "server") if self.proxies.bound else None
+
+    @property
+    def secure(self):
+        """Proxy al SecureStreamManager (sesión), o None."""
+        return ManagedProxy(self.proxies, "session") if self.proxies.bound else None
 
     def ensure_server_bound(self):
-        if not self.server: raise Spotifice.BadReference(reason="No hay MediaServer vinculado")
+        if not self.federation:
+            raise Spotifice.BadReference(reason="No hay MediaServer vinculado")
 
     # --- Conectividad ---
     def bind_media_server(self, media_server, secure_stream_mgr, current=None):
-        if not media_server or not secure_stream_mgr:
-             raise Spotifice.BadReference("Proxies de servidor o sesión inválidos")
-        self.server = media_server
-        self.secure = secure_stream_mgr
+        """Vincula un único servidor (sustituye a los que hubiera). El nuevo se
+        conecta antes de soltar los anteriores y el cambio es atómico."""
+        manager = self._connect(media_server, secure_stream_mgr)
+        with self._lock:
+            old = list(self.federation.values())
+            self.federation = {media_server.ice_toString(): manager}
+            self._owners = {}
+            self.proxies = manager
+            self._release(old)
         logger.info(f"Vinculado a MediaServer: {id2str(media_server.ice_getIdentity())}")
 
+    def add_media_server(self, media_server, secure_stream_mgr, current=None):
+        manager = self._connect(media_server, secure_stream_mgr)
+        key = media_server.ice_toString()
+        with self._lock:
+            old = self.federation.get(key)
+            self.federation[key] = manager
+            if self.proxies is old or not self.proxies.bound:
+                self.proxies = manager
+            self._release([old] if old else [])
+        logger.info(f"Vinculado a MediaServer: {id2str(media_server.ice_getIdentity())} "
+                    f"({len(self.federation)} servidores)")
+
+    def remove_media_server(self, media_server, current=None):
+        key = media_server.ice_toString() if media_server else None
+        with self._lock:
+            manager = self.federation.pop(key, None)
+            if not manager:
+                return
+            self._owners = {item: k for item, k in self._owners.items() if k != key}
+            if self.proxies is manager:
+                self.proxies = next(iter(self.federation.values()), ProxyManager())
+            self._release([manager])
+        logger.info(
+            f"Desvinculado de MediaServer: {id2str(media_server.ice_getIdentity())}")
+
     def unbind_media_server(self, current=None):
-        self.server = None
-        self.secure = None
+        with self._lock:
+            old = list(self.federation.values())
+            self.federation = {}
+            self._owners = {}
+            self.proxies = ProxyManager()
+            self._release(old)
         logger.info("Desvinculado del MediaServer")
 
+    def _connect(self, media_server, secure_stream_mgr):
+        """ProxyManager nuevo ya vinculado (fuera del lock: conectar puede tardar)."""
+        if not media_server or not secure_stream_mgr:
+            raise Spotifice.BadReference("Proxies de servidor o sesión inválidos")
+        manager = ProxyManager(*self.proxy_config)
+        manager.bind(media_server, secure_stream_mgr)
+        return manager
+
+    def _release(self, managers):
+        """Desvincula `managers`, ya fuera de la federación. Si uno sirve el
+        stream en curso, éste se detiene antes: sin su sesión, la lectura
+        fallaría a mitad de pista."""
+        stream = self._stream
+        if isinstance(stream, ResumableStream) and \
+                any(stream.proxies is manager for manager in managers):
+            logger.info("Se desvincula el servidor del stream en curso: se detiene.")
+            self._stop()
+        for manager in managers:
+            manager.unbind()
+
+    def _find(self, operation, item_id, not_found):
+        """(ProxyManager, resultado) del primer servidor que tiene `item_id`.
+
+        El catálogo federado no se descarga: cada id se busca la primera vez
+        que se usa (empezando por el dueño conocido) y se recuerda su dueño.
+        """
+        known = self._owners.get((operation, item_id))
+        for key in sorted(self.federation, key=lambda k: k != known):
+            manager = self.federation[key]
+            try:
+                result = manager.invoke("server", operation, item_id)
+            except not_found:
+                continue
+            except Ice.Exception as e:
+                logger.warning(f"Servidor {key} no disponible para {operation}: {e}")
+                continue
+            self._owners[(operation, item_id)] = key
+            return manager, result
+        raise not_found(item_id, "No encontrado en ningún servidor vinculado")
+
+    def _load(self, track_id):
+        """Carga una pista y enruta sesión y stream al servidor que la tiene."""
+        self.proxies, self.current_track = self._find("get_track_info", track_id,
+                                                      Spotifice.TrackError)
+
+    def set_credentials(self, username, password, current=None):
+        self.credentials = (username, password)
+        logger.info(f"Credenciales de failover establecidas para: {username}")
+
     # --- Gestión de Contenido ---
     def load_track(self, track_id, current=None):
         self.ensure_server_bound()
         logger.info(f"Solicitando pista: {track_id}")
-        self.current_track = self.server.get_track_info(track_id)
+        self._load(track_id)
         logger.info(f"Pista cargada: '{self.current_track.title}'")
 
     def load_playlist(self, playlist_id, current=None):
         self.ensure_server_bound()
         logger.info(f"Solicitando playlist: {playlist_id}")
-        pl = self.server.get_playlist(playlist_id)
+        # La playlist puede estar en un servidor y sus pistas en otros
+        _, pl = self._find("get_playlist", playlist_id, Spotifice.PlaylistError)
         self.playlist = pl
         self.index = 0
         if pl.track_ids:
             # Cargar la primera pista automáticamente
-            self.current_track = self.server.get_track_info(pl.track_ids[0])
+            self._load(pl.track_ids[0])
         logger.info(f"Playlist '{pl.name}' cargada con {len(pl.track_ids)} pistas.")
 
     # --- Control de Reproducción ---
@@ -86,39 +477,108 @@ class MediaRenderI(Spotifice.MediaRender):
             if was_playing and self.current_track: self.play(current)
 
     def play(self, current=None):
-        if not self.secure: raise Spotifice.BadReference("No hay sesión segura establecida (Login primero)")
+        with self._lock:
+            self._empty_tracks = 0
+            if self.followers:
+                self._group_play()
+            else:
+                self._play()
+
+    def _play(self, start_us=None):
+        if not self.secure and not self.leader:
+            raise Spotifice.BadReference(
+                "No hay sesión segura establecida (Login primero)")
         if not self.current_track: raise Spotifice.TrackError("No hay pista cargada para reproducir")
         
         logger.info(f"Iniciando reproducción de: {self.current_track.title}")
-        # 1. Abrir stream en el servidor
-        self.secure.open_stream(self.current_track.id)
-        
-        # 2. Definir callback para que el player pida datos
-        def get_chunk_adapter(size):
-            try: return self.secure.get_audio_chunk(size)
-            except Exception as e:
-                 logger.error(f"Error en stream: {e}")
-                 return b"" # EOF o error
-        
-        # 3. Configurar y arrancar player
-        self.player.configure(get_chunk_adapter)
+        # 1. Abrir stream: del líder si seguimos a un grupo, local si la pista
+        #    está en caché, si no reanudable en el servidor
+        if self.leader:
+            self._stream = RelayStream(self.leader, self.current_track.id)
+        else:
+            self._stream = self.open_track_stream(self.current_track.id)
+        self._stream.open()
+
+        # 2. Configurar y arrancar player: pide datos al buffer del stream y
+        #    avisa al agotarse la pista para avanzar/repetir sin sondeo, o si
+        #    el stream falla (entonces sólo se detiene)
+        #    Los avisos llevan el stream: si llegan tras un stop() son obsoletos
+        #    Arranque sincronizado: el player precarga y fija su base_time al
+        #    instante acordado, traducido del reloj del grupo al suyo
+        stream = self._stream
+        self._delivered = 0
+        base_time = None
+        if start_us is not None:
+            base_time = (start_us - (0 if self._net_clock else self.clock_offset)) * 1000
+        self.player.configure(partial(self._read, stream),
+                              partial(self._on_track_exhausted, stream),
+                              partial(self._on_stream_failed, stream), base_time)
         if not self.player.confirm_play_starts(): raise Spotifice.PlayerError("El backend de audio falló al iniciar")
         self._paused = False
+        try:
+            self.events.track_changed(self.render_id, self.current_track)
+        except Ice.Exception as e:
+            logger.warning(f"No se pudo publicar el cambio de pista: {e}")
+        self.publish_status()
+
+    def _read(self, stream, size):
+        data = stream.read(size)
+        self._delivered += len(data)
+        return data
+
+    def open_track_stream(self, track_id):
+        sinks = []
+        self._shared = None
+        if self.followers:
+            self._shared = SharedTrack(track_id)
+            sinks.append(self._shared)
+
+        if not self.cache:
+            return ResumableStream(self, track_id, sinks)
+
+        # La validación es la única RPC si la pista ya está en caché
+        digest = self.server.get_track_digest(track_id)
+        # Clave por contenido: pistas duplicadas comparten entrada en la caché
+        path = self.cache.get(cache_key(digest, self.quality), digest)
+        if path:
+            logger.info(f"Reproduciendo desde caché local: {track_id}")
+            if self._shared:
+                self._shared = SharedTrack(track_id, path)
+            return LocalStream(path)
+        # La entrada se crea al abrir, con la calidad que sirva el servidor
+        return ResumableStream(self, track_id, sinks, digest)
 
     def stop(self, current=None):
+        with self._lock:
+            self._stop()
+
+    def _stop(self):
+        for follower in self.followers.values():
+            follower.stopAsync()
         if self.player.is_playing() or self._paused:
             self.player.stop()
-        if self.secure: 
-            try: self.secure.close_stream()
-            except: pass # Ignorar errores al cerrar
+        # La sesión del servidor que servía el stream (con varios, no tiene
+        # por qué ser la de la pista cargada ahora)
+        stream = self._stream
+        secure = stream.session if isinstance(stream, ResumableStream) else self.secure
+        if self._stream:
+            self._stream.close()
+            self._stream = None
+        if secure:
+            try:
+                secure.close_stream()
+            except Ice.Exception:
+                pass  # Ignorar errores al cerrar
         self._paused = False
         logger.info("Reproducción detenida.")
+        self.publish_status()
 
     def pause(self, current=None):
         if self.player.is_playing():
              self.player.stop()
              self._paused = True
              logger.info("Reproducción pausada.")
+             self.publish_status()
 
     def get_status(self, current=None):
         state = Spotifice.PlaybackState.STOPPED
@@ -133,7 +593,7 @@ class MediaRenderI(Spotifice.MediaRender):
         with self.keep_playing_state(current):
             self.index = (self.index + 1) % len(self.playlist.track_ids)
             tid = self.playlist.track_ids[self.index]
-            self.current_track = self.server.get_track_info(tid)
+            self._load(tid)
             logger.info(f"Saltando a siguiente pista: {self.current_track.title}")
 
     def previous(self, current=None):
@@ -142,12 +602,210 @@ class MediaRenderI(Spotifice.MediaRender):
             # Lógica simple de anterior (sin tener en cuenta segundos reproducidos)
             self.index = (self.index - 1 + len(self.playlist.track_ids)) % len(self.playlist.track_ids)
             tid = self.playlist.track_ids[self.index]
-            self.current_track = self.server.get_track_info(tid)
+            self._load(tid)
             logger.info(f"Volviendo a pista anterior: {self.current_track.title}")
 
     def set_repeat(self, value, current=None):
          self.repeat = value
          logger.info(f"Repetición {'activada' if value else 'desactivada'}.")
+         self.publish_status()
+
+    # --- Grupo sincronizado (multi-room) ---
+    GROUP_START_LEAD = 0.5   # Margen (s) para que todos los renders se preparen
+    CLOCK_SAMPLES = 8
+
+    def group_clock_us(self, current=None):
+        """Reloj del grupo: el monotónico del líder, corregido en los seguidores."""
+        return time.monotonic_ns() // 1000 + self.clock_offset
+
+    def _sync_clock(self):
+        """Estima el desfase con el líder (estilo NTP, muestra de menor RTT)."""
+        best_rtt, best_offset = None, 0
+        for _ in range(self.CLOCK_SAMPLES):
+            t0 = time.monotonic_ns() // 1000
+            leader_us = self.leader.group_clock_us()
+            t1 = time.monotonic_ns() // 1000
+            if best_rtt is None or t1 - t0 < best_rtt:
+                best_rtt, best_offset = t1 - t0, leader_us - (t0 + t1) // 2
+        self.clock_offset = best_offset
+        logger.info(f"Reloj sincronizado con el líder: desfase {best_offset} µs, "
+                    f"RTT {best_rtt} µs")
+
+    def group_clock_port(self, current=None):
+        """Puerto del reloj de red (GstNet) del líder, o 0 si el player no lo ofrece."""
+        return self.player.serve_clock()
+
+    def _follow_leader_clock(self, leader):
+        """Esclaviza el player al reloj de red del líder: corrige también la
+        deriva, que la estimación por RPC de _sync_clock no ve."""
+        try:
+            port = leader.group_clock_port()
+            info = leader.ice_getConnection().getInfo()
+            while info.underlying and not hasattr(info, "remoteAddress"):
+                info = info.underlying
+            host = getattr(info, "remoteAddress", "")
+        except Ice.Exception as e:
+            logger.warning(f"Sin reloj de red del líder: {e}")
+            return False
+        if not port or not host or not self.player.follow_clock(host, port):
+            logger.info("Reloj de red no disponible: se usa el desfase estimado.")
+            return False
+        logger.info(f"Player esclavizado al reloj de red del líder ({host}:{port}).")
+        return True
+
+    def join_sync_group(self, leader, current=None):
+        if not leader:
+            raise Spotifice.BadReference("Líder inválido (None)")
+        self.leave_sync_group(current)
+        if self.proxy and leader.ice_getIdentity() == self.proxy.ice_getIdentity():
+            return  # El líder del grupo no se sigue a sí mismo
+        self.leader = leader
+        self._sync_clock()
+        self._net_clock = self._follow_leader_clock(leader)
+        leader.add_follower(self.proxy)
+        logger.info(f"Siguiendo al líder: {id2str(leader.ice_getIdentity())}")
+
+    def leave_sync_group(self, current=None):
+        if self.leader:
+            try:
+                self.leader.remove_follower(self.proxy)
+            except Ice.Exception:
+                pass
+            logger.info("Grupo sincronizado abandonado.")
+        self.leader = None
+        self.clock_offset = 0
+        if self._net_clock:
+            self.player.follow_clock(None, 0)
+            self._net_clock = False
+        # Si éramos líder el grupo se disuelve: los seguidores quedan independientes
+        followers, self.followers = self.followers, {}
+        for follower in followers.values():
+            follower.leave_sync_groupAsync()
+        if followers:
+            logger.info(f"Grupo sincronizado disuelto ({len(followers)} seguidores).")
+
+    def add_follower(self, follower, current=None):
+        if not follower:
+            raise Spotifice.BadReference("Seguidor inválido (None)")
+        self.followers[id2str(follower.ice_getIdentity())] = follower
+        logger.info(f"Nuevo seguidor: {id2str(follower.ice_getIdentity())}")
+
+    def remove_follower(self, follower, current=None):
+        if follower:
+            self.followers.pop(id2str(follower.ice_getIdentity()), None)
+
+    def play_at(self, start_us, current=None):
+        with self._lock:
+            if self.leader:
+                self.current_track = self.leader.get_current_track()
+                self._sync_clock()
+            if self.player.is_playing() or self._paused:
+                self._stop()
+            self._play(start_us)
+
+    def read_shared(self, track_id, offset, size, current=None):
+        shared = self._shared
+        if not shared or shared.track_id != track_id:
+            raise Spotifice.StreamError(item=track_id,
+                                        reason="Pista no compartida por el líder")
+        return shared.read(offset, size)
+
+    def _group_play(self):
+        """Arranca la pista actual a la vez en el líder y en sus seguidores."""
+        start_us = self.group_clock_us() + int(self.GROUP_START_LEAD * 1e6)
+        self._stop_player_only()
+        for key, follower in self.followers.items():
+            # Sin esperar: los seguidores consultan al líder mientras se preparan
+            follower.play_atAsync(start_us).add_done_callback(
+                lambda f, key=key: f.exception() and logger.warning(
+                    f"El seguidor {key} no pudo arrancar: {f.exception()}"))
+        # El stream compartido se abre ya; los seguidores leen a partir de start_us
+        self._play(start_us)
+
+    def _stop_player_only(self):
+        if self.player.is_playing() or self._paused:
+            self.player.stop()
+        if self._stream:
+            self._stream.close()
+            self._stream = None
+
+    # --- Eventos ---
+    def set_topics(self, topics):
+        self.topics = topics
+        self.events = topics.publisher(RENDER_TOPIC, Spotifice.RenderEventsPrx)
+
+    def subscribe(self, listener, current=None):
+        if not listener:
+            raise Spotifice.BadReference("Listener inválido (None)")
+        self.topics.subscribe(RENDER_TOPIC, listener)
+        logger.info(f"Suscrito: {id2str(listener.ice_getIdentity())}")
+        listener.ice_oneway().state_changed(self.render_id, self.get_status())
+
+    def unsubscribe(self, listener, current=None):
+        if listener:
+            self.topics.unsubscribe(RENDER_TOPIC, listener)
+
+    def publish_status(self):
+        try:
+            self.events.state_changed(self.render_id, self.get_status())
+        except Ice.Exception as e:
+            logger.warning(f"No se pudo publicar el estado: {e}")
+
+    def _on_track_exhausted(self, stream):
+        """Fin de pista (hilo del player): avanza, repite o se detiene."""
+        with self._lock:
+            if stream is not self._stream:
+                return  # Un stop() o un play() posterior ya la sustituyó
+            self._stream.close()
+            self._stream = None
+
+            # Los seguidores no avanzan solos: el líder arranca la siguiente pista
+            advance = None if self.leader else self._next_index()
+            # Si ninguna pista del recorrido da audio, repetir sería un bucle sin fin
+            self._empty_tracks = 0 if self._delivered else self._empty_tracks + 1
+            tracks = len(self.playlist.track_ids) if self.playlist else 1
+            if advance is not None and self._empty_tracks >= max(tracks, 1):
+                logger.warning("Las pistas terminan sin audio: no se repiten.")
+                advance = None
+            if advance is None:
+                logger.info("Fin de la reproducción.")
+                self.publish_status()
+                return
+
+            try:
+                if advance != self.index:
+                    self.index = advance
+                    self._load(self.playlist.track_ids[self.index])
+                logger.info(f"Continuando con: {self.current_track.title}")
+                if self.followers:
+                    self._group_play()
+                else:
+                    self._play()
+            except Ice.Exception as e:
+                logger.error(f"No se pudo continuar la reproducción: {e}")
+                self.publish_status()
+
+    def _on_stream_failed(self, stream, error):
+        """Stream interrumpido (hilo del player): se detiene sin avanzar."""
+        with self._lock:
+            if stream is not self._stream:
+                return
+            logger.error(f"Reproducción interrumpida: {error}")
+            self._stream.close()
+            self._stream = None
+            self.publish_status()
+
+    def _next_index(self):
+        """Siguiente posición tras agotar la pista, o None si hay que parar.
+
+        Con playlist, `repeat` la recorre en bucle; sin ella repite la pista.
+        """
+        if self.playlist and self.playlist.track_ids:
+            following = self.index + 1
+            if following < len(self.playlist.track_ids):
+                return following
+            return 0 if self.repeat else None
+        return self.index if self.repeat and self.current_track else None
          
     def get_current_track(self, current=None): return self.current_track
 
@@ -160,22 +818,58 @@ def main(ic, player_backend):
     properties = ic.getProperties()
     identity_str = properties.getPropertyWithDefault("Identity", "RenderGenerico")
     
+    # Varios hilos de dispatch: en un grupo sincronizado el líder atiende a los
+    # seguidores (reloj, read_shared) mientras prepara su propia reproducción
+    if not properties.getProperty("MediaRenderAdapter.ThreadPool.Size"):
+        properties.setProperty("MediaRenderAdapter.ThreadPool.Size", "4")
+
     adapter = ic.createObjectAdapter("MediaRenderAdapter")
     servant = MediaRenderI(player_backend)
     
     # Registramos el sirviente con el nombre específico que nos dio IceGrid
     proxy = adapter.add(servant, ic.stringToIdentity(identity_str))
+    servant.proxy = Spotifice.MediaRenderPrx.uncheckedCast(proxy)
+    servant.render_id = identity_str
+    # Configuración de los ProxyManager, uno por servidor vinculado
+    # (MediaRender.Timeout.*, MediaRender.Retries.*, ...)
+    servant.proxy_config = (adapter, properties)
+
+    # Calidad de stream: original, low, medium o high (ver transcoder.py)
+    quality = properties.getProperty("MediaRender.Quality")
+    if quality:
+        servant.quality = quality
+
+    # Caché local de audio (MediaRender.CacheSize en MiB, 0 la desactiva)
+    cache_size = properties.getPropertyAsIntWithDefault("MediaRender.CacheSize", 512)
+    if cache_size > 0:
+        cache_dir = properties.getPropertyWithDefault("MediaRender.CacheDir",
+                                                      "render-cache")
+        servant.cache = AudioCache(cache_dir, cache_size * 1024 * 1024)
+
+    # Credenciales opcionales para reanudar streams tras la caída de una réplica
+    username = properties.getProperty("MediaRender.Username")
+    if username:
+        servant.set_credentials(username, properties.getProperty("MediaRender.Password"))
     
     logger.info(f"MediaRender iniciado con identidad: '{identity_str}'")
     logger.info(f"Proxy del adaptador: {proxy}")
     
     adapter.activate()
+
+    # El adaptador ya responde (IceGrid resuelve el proxy enseguida); GStreamer
+    # se inicializa y precalienta en el hilo del player. El primer play() sólo
+    # espera si el precalentamiento no ha terminado. start() es idempotente:
+    # el hilo puede venir ya arrancado de un main anterior
+    player_backend.start()
+
+    # Conectar con IceStorm puede requerir RPCs: también tras la activación
+    servant.set_topics(create_topics(ic))
+
     ic.waitForShutdown()
 
 if __name__ == "__main__":
-    # Inicializar backend de audio (Real o Mock)
+    # Backend de audio (Real o Mock): se arranca en main, tras activar el adaptador
     player_backend = GstPlayer()
-    player_backend.start()
     
     try:
         with Ice.initialize(sys.argv) as communicator:
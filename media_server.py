@@ -6,11 +6,29 @@ from pathlib import Path
 import Ice
 import json
 from datetime import datetime, timezone
+from functools import partial
 import hashlib, secrets
+import threading
+import time
+import uuid
+
+from session_store import SessionPurger, create_store, sign_token, verify_token
+from transcoder import ORIGINAL, QUALITIES, TranscodeError, Transcoder
+from media_pack import MediaPack, covering, probe_duration_ms, segment
+from playlist_index import PlaylistIndex
+from catalog import TrackCatalog
+from blob_store import BlobStore
+from rate_limit import DelayQueue, RateLimiter
+from playlist_store import PlaylistLog, apply_entry, entry_for
+from events import CATALOG_TOPIC, LocalTopics, create_topics
+import catalog_sync
+import compact_catalog
+import reply_cache
+import stream_fastpath
 
 # Cargar la definición de la interfaz Slice
-Ice.loadSlice('-I{} spotifice_v2.ice'.format(Ice.getSliceDir()))
-import Spotifice
+from slice_loader import load_spotifice
+Spotifice = load_spotifice()  # Precompilado con `make slice` o, si no, desde el .ice
 
 logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(name)s: %(message)s')
 logger = logging.getLogger("MediaServer")
@@ -32,36 +50,108 @@ def _parse_created_at(v):
         except: pass
     return int(datetime.now(timezone.utc).timestamp()) # Default: ahora
 
+def _put_entry(playlist, created_at):
+    """Entrada de log que crea o reemplaza una playlist."""
+    return {"op": "put", "id": playlist.id, "track_ids": list(playlist.track_ids),
+            "meta": {"name": playlist.name, "description": playlist.description,
+                     "owner": playlist.owner, "created_at": created_at}}
+
 # --- Implementación de Sirvientes (Servants) ---
 
 class SecureStreamManagerI(Spotifice.SecureStreamManager):
     """Maneja la transmisión segura de ficheros para un usuario autenticado."""
-    def __init__(self, server_impl, username):
+    def __init__(self, server_impl, username, sid):
         self._server = server_impl
         self._username = username
+        self._sid = sid
         self._fh = None # File handle actual
+        self._track_id = Ice.Unset  # Pista del stream abierto
+        self._segments = []  # Tabla de CRC del original abierto (vacía en renditions)
+        self.fast_chunk = stream_fastpath.FastChunkI(self)
 
-    def open_stream(self, track_id, current=None):
-        """Abre un fichero de música para lectura."""
+    def open_stream(self, track_id, quality=Ice.Unset, current=None):
+        """Abre un fichero de música (o una rendition de menor bitrate) para lectura."""
         self.close_stream(current) # Cierra anterior si existe
         info = self._server.get_track_info(track_id)
-        path = self._server.media_dir / info.filename
         try:
             logger.info(f"Abriendo stream para: {info.filename}")
-            self._fh = open(path, "rb")
+            self._fh = self._server.open_media(info, quality)
+            original = quality is Ice.Unset or quality in ("", ORIGINAL)
+            self._segments = self._server.track_segments(track_id) if original else []
+            self._track_id = track_id
+        except Spotifice.Error:
+            raise
         except FileNotFoundError:
             raise Spotifice.IOError(item=track_id, reason="Fichero no encontrado en disco")
         except Exception as e:
             raise Spotifice.IOError(item=track_id, reason=f"Error de E/S: {e}")
 
+    def open_stream_at(self, track_id, offset, quality=Ice.Unset, current=None):
+        """Abre el fichero y se posiciona en un offset (reanudación tras failover)."""
+        if offset < 0:
+            raise Spotifice.IOError(item=track_id, reason=f"Offset inválido: {offset}")
+        self.open_stream(track_id, quality, current)
+        self._fh.seek(offset)
+        logger.info(f"Stream reanudado en byte {offset}: {track_id}")
+
+    def streaming(self):
+        return self._fh is not None
+
+    def stream(self):
+        """Handle del fichero abierto, o None."""
+        return self._fh
+
+    def track_id(self):
+        """Pista del stream abierto (`item` de los StreamError), o Ice.Unset."""
+        return self._track_id
+
+    def throttled(self, nbytes, read):
+        """Ejecuta `read` con los límites de caudal de esta sesión (ver throttle)."""
+        return self._server.throttle(self._sid, self._username, nbytes, read)
+
     def get_audio_chunk(self, chunk_size, current=None):
-        """Lee un trozo del fichero abierto."""
-        if not self._fh: raise Spotifice.StreamError("No hay stream abierto")
+        """Lee un trozo del fichero abierto (al ritmo que permitan los límites)."""
+        if not self._fh:
+            raise Spotifice.StreamError(reason="No hay stream abierto")
+        size = stream_fastpath.chunk_size(chunk_size)  # Lo elige el cliente: acotado
+        return self.throttled(size, lambda: self._read_chunk(size))
+
+    def _read_chunk(self, chunk_size):
+        if not self._fh:
+            raise Spotifice.StreamError(reason="Stream cerrado")
         try:
             data = self._fh.read(chunk_size)
             return bytearray(data or b"") # Devuelve array vacío al final
         except Exception as e:
-             raise Spotifice.StreamError(f"Error leyendo chunk: {e}")
+             raise Spotifice.StreamError(item=self._track_id,
+                                         reason=f"Error leyendo chunk: {e}")
+
+    def read_checked(self, offset, max_size, current=None):
+        """Lee segmentos completos, desde el que contiene `offset`, con sus CRC.
+        Sólo cuentan para los límites los bytes servidos: al final, ninguno."""
+        if not self._fh:
+            raise Spotifice.StreamError(reason="No hay stream abierto")
+        if not self._segments:  # Rendition sin tabla: se lee antes de cobrar
+            chunk = self._read_segments(offset, max_size, [])
+            return self.throttled(len(chunk.data), lambda: chunk) if chunk.data else chunk
+        segments = covering(self._segments, offset, max_size)
+        if not segments:  # Fin de pista
+            return Spotifice.CheckedChunk(offset=offset, data=b"", segments=[])
+        size = sum(s[1] for s in segments)
+        return self.throttled(size, lambda: self._read_segments(offset, size, segments))
+
+    def _read_segments(self, offset, size, segments):
+        if not self._fh:
+            raise Spotifice.StreamError(reason="Stream cerrado")
+        start = segments[0][0] if segments else offset
+        try:
+            self._fh.seek(start)
+            data = self._fh.read(size)
+        except Exception as e:
+            raise Spotifice.StreamError(item=self._track_id,
+                                        reason=f"Error leyendo chunk: {e}")
+        return Spotifice.CheckedChunk(offset=start, data=data,
+                                      segments=[Spotifice.Segment(*s) for s in segments])
 
     def close_stream(self, current=None):
         """Cierra el handle del fichero actual."""
@@ -73,18 +163,90 @@ class SecureStreamManagerI(Spotifice.SecureStreamManager):
     def close(self, current=None):
         """Cierra la sesión completa y elimina el sirviente."""
         self.close_stream(current)
-        self._server.remove_session(self._username)
+        self._server.remove_session(self._sid)
         logger.info(f"Sesión finalizada para usuario: {self._username}")
 
+class SessionLocator(Ice.ServantLocator):
+    """Resuelve las identidades 'session/<token>' en cualquier réplica.
+
+    El token va firmado con el secreto común, así que la réplica que recibe la
+    petición no necesita haber atendido el login: valida el token, comprueba en
+    el almacén que la sesión no se ha revocado y crea el sirviente local.
+    Con `fast_path`, get_audio_chunk lo despacha el Blobject de
+    stream_fastpath.py en lugar del esqueleto generado (desactivado por
+    defecto: ver bench_stream.py).
+    """
+    CATEGORY = "session"
+
+    def __init__(self, server_impl, fast_path=False):
+        self._server = server_impl
+        self._fast_path = fast_path
+
+    def locate(self, current):
+        session = self._server.lookup_session(current.id.name)
+        if session and self._fast_path and current.operation == stream_fastpath.OPERATION:
+            return session.fast_chunk, None
+        return session, None
+
+    def finished(self, current, servant, cookie): pass
+
+    def deactivate(self, category): pass
+
+
+class PlaylistReplicaI(Spotifice.CatalogEvents):
+    """Aplica en esta réplica los cambios de playlists hechos en las demás."""
+    def __init__(self, server_impl):
+        self._server = server_impl
+
+    def catalog_changed(self, server_id, version, current=None): pass
+
+    def playlist_changed(self, server_id, change, current=None):
+        if server_id == self._server.server_id:
+            return  # Cambio propio, ya aplicado
+        logger.info(f"Cambio de playlist recibido de {server_id}")
+        self._server.apply_playlist_change(json.loads(change), origin=server_id)
+
+
 class MediaServerI(Spotifice.MediaServer):
     """Implementación principal del servidor de medios."""
-    def __init__(self, media_dir, playlists_dir, users_file: Path):
+    SESSION_TTL = 12 * 3600  # segundos
+    MAX_BACKLOG = 2.0        # s de deuda del nodo: por encima no se admiten sesiones
+
+    def __init__(self, media_dir, playlists_dir, users_file: Path,
+                 session_store=None, session_secret=None, transcoder=None,
+                 packs_dir=None, playlist_log=None, blob_store=None,
+                 rate_limiter=None, max_streams=0):
         self.media_dir = Path(media_dir)
+        self.packs_dir = Path(packs_dir) if packs_dir else None
+        self.transcoder = transcoder
+        self.packs = {}       # {track_id: MediaPack}
+        self._segment_tables = {}  # {sha256: [(offset, longitud, crc32)]} sin BlobStore
+        self._digests = {}    # {track_id: (sello de fichero, sha256)} sin blob conocido
+        self.blob_store = blob_store  # BlobStore (o None): deduplica por contenido
+        self.blobs = {}       # {track_id: sha256}; varias pistas pueden compartir blob
+        self.server_id = ""
+        self.catalog_version = 0
+        self.events = LocalTopics().publisher(CATALOG_TOPIC, Spotifice.CatalogEventsPrx)
         self.playlists_dir = Path(playlists_dir)
-        self.tracks = {}      # {track_id: TrackInfo}
-        self._playlists = {}  # {playlist_id: Playlist}
-        self._sessions = {}   # {username: SecureStreamManagerI}
+        self.tracks = TrackCatalog()  # Columnas compactas; TrackInfo sólo al responder
+        self.playlist_index = PlaylistIndex(self.tracks)
+        self.playlist_log = playlist_log  # PlaylistLog con las ediciones (o None)
+        self.playlist_stamps = {}  # {playlist_id: [contador, origen]}: última edición
+        self._clock = 0            # Reloj de Lamport de las ediciones
+        self._playlist_lock = threading.Lock()
+        self._sessions = {}   # {sid: SecureStreamManagerI} (estado local de streams)
         self._users = {}      # {username: {salt, digest}}
+        self.adapter = None   # Adaptador donde viven las sesiones (lo fija main)
+        self.limiter = rate_limiter  # RateLimiter (o None: sin límites)
+        self.max_streams = max_streams  # Descriptores abiertos admitidos (0: sin límite)
+        self._delays = DelayQueue() if rate_limiter else None
+
+        self._store = session_store or create_store("memory")
+        if not session_secret:
+            logger.warning("Sin MediaServer.SessionSecret: las sesiones no serán "
+                           "válidas en otras réplicas.")
+            session_secret = secrets.token_hex(32)
+        self._secret = session_secret.encode("utf-8")
         
         self.load_media()
         self.load_playlists()
@@ -104,51 +266,376 @@ class MediaServerI(Spotifice.MediaServer):
              logger.warning(f"Fichero de usuarios {users_file.name} no encontrado.")
 
     def load_playlists(self):
-        self._playlists.clear()
+        for pid in self.playlist_index.playlist_ids():
+            self.playlist_index.remove_playlist(pid)
         self.playlists_dir.mkdir(parents=True, exist_ok=True)
         for f in sorted(self.playlists_dir.glob("*.playlist")):
             try:
                 data = json.loads(f.read_text(encoding="utf-8"))
-                # Filtrar IDs de pistas que no existen en la biblioteca
-                valid_ids = [tid for tid in data.get("track_ids", []) if tid in self.tracks]
-                
-                pl = Spotifice.Playlist(
-                    id=data["id"],
-                    name=data.get("name", "Sin nombre"),
-                    description=data.get("description", ""),
-                    owner=data.get("owner", "Sistema"),
-                    created_at=_parse_created_at(data.get("created_at")),
-                    track_ids=valid_ids
-                )
-                self._playlists[pl.id] = pl
+                # El índice filtra los IDs de pistas que no existen en la biblioteca
+                self.playlist_index.put_playlist(data["id"], {
+                    "name": data.get("name", "Sin nombre"),
+                    "description": data.get("description", ""),
+                    "owner": data.get("owner", "Sistema"),
+                    "created_at": _parse_created_at(data.get("created_at")),
+                }, data.get("track_ids", []))
             except Exception as e:
                 logger.warning(f"Saltando playlist corrupta '{f.name}': {e}")
-        logger.info(f"Cargadas {len(self._playlists)} playlists disponibles.")
+        self.playlist_stamps.clear()
+        if self.playlist_log:  # Ediciones sobre los ficheros
+            self.playlist_log.replay(self.playlist_index, self.playlist_stamps)
+        self._clock = max((c for c, _ in self.playlist_stamps.values()), default=0)
+        logger.info(f"Cargadas {len(self.playlist_index)} playlists disponibles.")
+        self.catalog_changed()
 
     def load_media(self):
-        self.tracks.clear()
-        if not self.media_dir.exists():
+        for track_id in list(self.tracks):
+            self.remove_track(track_id)
+        if self.media_dir.exists():
+            files = sorted(f for f in self.media_dir.iterdir()
+                           if f.is_file() and f.suffix.lower() == ".mp3")
+            self._add_files(files)
+            logger.info(
+                f"Indexadas {len(self.tracks)} pistas de audio en {self.media_dir}.")
+        else:
              logger.warning(f"Directorio de medios {self.media_dir} no existe.")
-             return
-        for f in sorted(self.media_dir.iterdir()):
-            if f.is_file() and f.suffix.lower() == ".mp3":
-                # Usamos el nombre del fichero como ID y título base
-                self.tracks[f.name] = Spotifice.TrackInfo(id=f.name, title=f.stem, filename=f.name)
-        logger.info(f"Indexadas {len(self.tracks)} pistas de audio en {self.media_dir}.")
+        self.load_packs()
+
+    def _add_files(self, files):
+        """Da de alta ficheros del directorio de medios, hasheándolos en paralelo."""
+        blobs = self.blob_store.index(files) if self.blob_store else {}
+        for f in files:
+            self.add_track(f.name, f.stem, probe_duration_ms(f), f.stat().st_size,
+                           blobs.get(f))
+        if blobs:
+            distinct = len(set(blobs.values()))
+            logger.info(f"{len(blobs)} ficheros en {distinct} blobs distintos.")
+
+    def add_track(self, track_id, title, duration_ms, byte_size, blob=None):
+        """Alta (o actualización) incremental de una pista en el catálogo."""
+        # Usamos el nombre del fichero como ID y título base
+        self.playlist_index.set_track(track_id, duration_ms, byte_size, title)
+        self._digests.pop(track_id, None)
+        if blob:
+            self.blobs[track_id] = blob
+        else:
+            self.blobs.pop(track_id, None)
+
+    def remove_track(self, track_id):
+        """Baja incremental de una pista; sus playlists dejan de incluirla."""
+        self.packs.pop(track_id, None)
+        self._digests.pop(track_id, None)
+        self.blobs.pop(track_id, None)
+        self.playlist_index.remove_track(track_id)
+
+    def install_track(self, path, blob=None):
+        """Da de alta un fichero recibido de otra réplica (sustituye al del pack)."""
+        path = Path(path)
+        self.packs.pop(path.name, None)
+        if blob and self.blob_store:
+            self.blob_store.add(path, blob)
+            self.blob_store.save()
+        self.add_track(path.name, path.stem, probe_duration_ms(path), path.stat().st_size,
+                       blob)
+        self.catalog_changed()
+
+    def track_path(self, track_id):
+        """Fichero que contiene el audio original de una pista."""
+        info = self.get_track_info(track_id)
+        if track_id in self.packs:
+            return self.packs[track_id].path
+        return self.media_dir / info.filename
+
+    def rescan_media(self):
+        """Aplica sólo las altas y bajas de ficheros en el directorio de medios."""
+        on_disk = {f.name: f for f in self.media_dir.glob("*") if f.is_file()
+                   and f.suffix.lower() == ".mp3"} if self.media_dir.exists() else {}
+        removed = [t for t in list(self.tracks)
+                   if t not in on_disk and t not in self.packs]
+        added = [f for name, f in on_disk.items() if name not in self.tracks]
+        for track_id in removed:
+            self.remove_track(track_id)
+        self._add_files(added)
+        if removed or added:
+            logger.info(
+                f"Biblioteca actualizada: +{len(added)} / -{len(removed)} pistas.")
+            self.catalog_changed()
+
+    def load_packs(self):
+        """Indexa las pistas de los packs pre-troceados (ver media_pack.py)."""
+        self.packs.clear()  # Los packs previos se liberan al cerrar sus streams
+        if not self.packs_dir or not self.packs_dir.exists():
+            return
+        for f in sorted(self.packs_dir.glob("*.spkpack")):
+            try:
+                pack = MediaPack(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Saltando pack corrupto '{f.name}': {e}")
+                continue
+            for track_id, entry in pack.tracks.items():
+                self.packs[track_id] = pack
+                if track_id not in self.tracks:
+                    self.add_track(track_id, Path(track_id).stem, entry["duration_ms"],
+                                   entry["size"], entry.get("sha256"))
+        logger.info(f"Servidas desde packs {len(self.packs)} pistas.")
+        self.catalog_changed()
+
+    def catalog_changed(self):
+        """Incrementa la versión del catálogo y la publica a los suscriptores."""
+        self.catalog_version += 1
+        try:
+            self.events.catalog_changed(self.server_id, self.catalog_version)
+        except Ice.Exception as e:
+            logger.warning(f"No se pudo publicar el cambio de catálogo: {e}")
+
+    def open_media(self, info, quality):
+        """Devuelve un objeto tipo fichero (read/seek/close) con el audio a servir."""
+        original = quality is Ice.Unset or quality in ("", ORIGINAL)
+        if original and info.id in self.packs:
+            return self.packs[info.id].open(info.id)
+        return open(self.resolve_media_path(info, quality), "rb")
+
+    def resolve_media_path(self, info, quality):
+        """Ruta a servir para una calidad. Si la rendition aún no existe se
+        encola su codificación y se lanza RenditionPending: el cliente decide
+        si abre el original (y lo cachea como tal) o espera. Si la codificación
+        falló, IOError: reintentarla no serviría de nada."""
+        if quality is Ice.Unset or quality in ("", ORIGINAL):
+            return self.media_dir / info.filename
+        if quality not in QUALITIES:
+            raise Spotifice.IOError(
+                item=info.id, reason=f"Calidad desconocida: {quality}")
+        # Una pista que sólo está en un pack se codifica leyendo del pack
+        pack = self.packs.get(info.id)
+        source = partial(pack.open, info.id) if pack else None
+        path = None
+        if self.transcoder:
+            try:
+                path = self.transcoder.get(info.filename, quality, source)
+            except TranscodeError as e:
+                raise Spotifice.IOError(
+                    item=info.id, reason=f"Rendition '{quality}' imposible: {e}")
+        if not path:
+            raise Spotifice.RenditionPending(
+                item=info.id, reason=f"Rendition '{quality}' no disponible aún")
+        return path
 
     # --- Implementación de interfaces Slice ---
 
-    def get_all_tracks(self, current=None): return list(self.tracks.values())
+    def _track_info(self, track_id):
+        """Construye el TrackInfo de una pista (sólo en la frontera Ice)."""
+        return Spotifice.TrackInfo(id=track_id, title=self.tracks.title(track_id),
+                                   filename=track_id)
+
+    def get_all_tracks(self, current=None):
+        return [self._track_info(t) for t in self.tracks]
     
     def get_track_info(self, track_id, current=None): 
         if track_id not in self.tracks: raise Spotifice.TrackError(track_id, "Pista no encontrada")
-        return self.tracks[track_id]
+        return self._track_info(track_id)
         
-    def get_all_playlists(self, current=None): return list(self._playlists.values())
+    def get_track_digest(self, track_id, current=None):
+        """SHA-256 del audio original, que es también el id de su blob. Sin
+        blob conocido se calcula y se recalcula sólo si el fichero cambia."""
+        info = self.get_track_info(track_id)
+        if track_id in self.blobs:
+            return self.blobs[track_id]
+        path = self.track_path(track_id)
+        try:
+            st = path.stat()
+        except OSError as e:
+            raise Spotifice.IOError(item=track_id, reason=f"Error de E/S: {e}")
+
+        stamp = (st.st_size, st.st_mtime_ns)
+        cached = self._digests.get(track_id)
+        if cached and cached[0] == stamp:
+            return cached[1]
+
+        digest = hashlib.sha256()
+        with self.open_media(info, ORIGINAL) as fh:
+            while block := fh.read(1 << 20):
+                digest.update(block)
+        self._digests[track_id] = (stamp, digest.hexdigest())
+        return self._digests[track_id][1]
+
+    def track_segments(self, track_id):
+        """Tabla [(offset, longitud, crc32)] del audio original de una pista."""
+        if track_id in self.packs:
+            entry = self.packs[track_id].tracks[track_id]
+            return [(o, n, crc) for o, n, _, crc in entry["segments"]]
+        digest = self.get_track_digest(track_id)
+        segments = self.blob_store.segments(digest) if self.blob_store else None
+        if segments is None:
+            if digest not in self._segment_tables:
+                data = (self.media_dir / track_id).read_bytes()
+                self._segment_tables[digest] = [
+                    (o, n, crc) for o, n, _, crc in segment(data)]
+            segments = self._segment_tables[digest]
+        return segments
+
+    def get_track_segments(self, track_id, current=None):
+        try:
+            return [Spotifice.Segment(*s) for s in self.track_segments(track_id)]
+        except OSError as e:
+            raise Spotifice.IOError(item=track_id, reason=f"Error de E/S: {e}")
+
+    def get_compact_catalog(self, current=None):
+        """Pistas y playlists con cada cadena una sola vez (ver compact_catalog.py)."""
+        index = self.playlist_index
+        strings, tracks, playlists = compact_catalog.encode(
+            ((tid, self.tracks.title(tid), tid) for tid in self.tracks),
+            ((pid, index.meta(pid), index.track_ids(pid))
+             for pid in index.playlist_ids()))
+        return Spotifice.CompactCatalog(
+            version=self.catalog_version, strings=strings,
+            tracks=[Spotifice.TrackRef(*t) for t in tracks],
+            playlists=[Spotifice.PlaylistRef(*p) for p in playlists])
+
+    def _playlist(self, playlist_id):
+        """Construye el struct Slice de una playlist (sólo en la frontera Ice)."""
+        index = self.playlist_index
+        return Spotifice.Playlist(id=playlist_id, track_ids=index.track_ids(playlist_id),
+                                  **index.meta(playlist_id))
+
+    def get_all_playlists(self, current=None):
+        return [self._playlist(pid) for pid in self.playlist_index.playlist_ids()]
     
     def get_playlist(self, playlist_id, current=None):
-        if playlist_id not in self._playlists: raise Spotifice.PlaylistError(playlist_id, "Playlist no encontrada")
-        return self._playlists[playlist_id]
+        if playlist_id not in self.playlist_index:
+            raise Spotifice.PlaylistError(playlist_id, "Playlist no encontrada")
+        return self._playlist(playlist_id)
+
+    def get_playlists_with_track(self, track_id, current=None):
+        if track_id not in self.tracks:
+            raise Spotifice.TrackError(track_id, "Pista no encontrada")
+        with_track = self.playlist_index.playlists_with_track(track_id)
+        return [self._playlist(pid) for pid in with_track]
+
+    def get_playlist_summary(self, playlist_id, current=None):
+        if playlist_id not in self.playlist_index:
+            raise Spotifice.PlaylistError(playlist_id, "Playlist no encontrada")
+        duration, size, count = self.playlist_index.summary(playlist_id)
+        return Spotifice.PlaylistSummary(id=playlist_id, duration_ms=duration,
+                                         byte_size=size, track_count=count)
+
+    def _check_tracks(self, track_ids):
+        for tid in track_ids:
+            if tid not in self.tracks:
+                raise Spotifice.TrackError(tid, "Pista no encontrada")
+
+    def _require_playlist(self, playlist_id):
+        if playlist_id not in self.playlist_index:
+            raise Spotifice.PlaylistError(playlist_id, "Playlist no encontrada")
+
+    def create_playlist(self, playlist, current=None):
+        if not playlist.id:
+            raise Spotifice.PlaylistError(playlist.id, "Id de playlist vacío")
+        self._check_tracks(playlist.track_ids)
+
+        def change():
+            if playlist.id in self.playlist_index:
+                raise Spotifice.PlaylistError(playlist.id, "La playlist ya existe")
+            return _put_entry(playlist, playlist.created_at or int(time.time()))
+        self._local_change(change)
+
+    def update_playlist(self, playlist, current=None):
+        self._check_tracks(playlist.track_ids)
+
+        def change():
+            self._require_playlist(playlist.id)
+            created_at = self.playlist_index.meta(playlist.id)["created_at"]
+            return _put_entry(playlist, created_at)
+        self._local_change(change)
+
+    def append_tracks(self, playlist_id, track_ids, current=None):
+        self._check_tracks(track_ids)
+
+        def change():
+            # Sólo lo añadido: en el log y en la réplica cuesta lo que el cambio
+            self._require_playlist(playlist_id)
+            base = self.playlist_stamps.get(playlist_id)
+            return {"op": "append", "id": playlist_id, "track_ids": list(track_ids),
+                    "base": list(base) if base else None}
+        self._local_change(change)
+
+    def delete_playlist(self, playlist_id, current=None):
+        def change():
+            self._require_playlist(playlist_id)
+            return {"op": "delete", "id": playlist_id}
+        self._local_change(change)
+
+    def _local_change(self, change):
+        """Construye con `change()`, sella y aplica una edición local sin soltar
+        el lock: dos ediciones concurrentes nunca parten del mismo estado."""
+        with self._playlist_lock:
+            entry = change()
+            self._clock += 1
+            entry["stamp"] = [self._clock, self.server_id]
+            self._apply_locked(entry)
+        self._announce(entry)
+
+    def apply_playlist_change(self, entry, origin=None):
+        """Aplica y persiste un cambio de playlist recibido de otra réplica. Los
+        cambios más antiguos que el estado actual (según su sello) se descartan."""
+        with self._playlist_lock:
+            if not self._apply_locked(entry):
+                return False
+        self._announce(entry, origin)
+        return True
+
+    def _apply_locked(self, entry):
+        if not apply_entry(self.playlist_index, entry, self.playlist_stamps):
+            return False
+        self._clock = max(self._clock, entry["stamp"][0])
+        if self.playlist_log:
+            self.playlist_log.append(entry, self.playlist_index, self.playlist_stamps)
+        return True
+
+    def _announce(self, entry, origin=None):
+        """Tras aplicar un cambio: si es local, lo propaga al resto de réplicas
+        por el topic de catálogo."""
+        if origin is None:
+            try:
+                self.events.playlist_changed(self.server_id, json.dumps(entry))
+            except Ice.Exception as e:
+                logger.warning(f"No se pudo propagar el cambio de playlist: {e}")
+        logger.info(f"Playlist {entry['id']}: {entry['op']}")
+        self.catalog_changed()
+
+    def playlist_changes(self, playlist_ids):
+        """Entradas con el estado actual (o lápida) de las playlists pedidas."""
+        with self._playlist_lock:
+            return [entry_for(self.playlist_index, self.playlist_stamps, pid)
+                    for pid in playlist_ids]
+
+    def throttle(self, sid, username, nbytes, read):
+        """Ejecuta `read` respetando los límites de caudal. Sin espera devuelve su
+        resultado; si hay que esperar, un Ice.Future que se completa más tarde,
+        sin retener un hilo de dispatch."""
+        if not self.limiter:
+            return read()
+        tier = "premium" if self._users.get(username, {}).get("is_premium") else "free"
+        delay = self.limiter.reserve(sid, username, tier, nbytes)
+        if delay <= 0:
+            return read()
+
+        future = Ice.Future()
+        def complete():
+            try:
+                future.set_result(read())
+            except Exception as e:
+                future.set_exception(e)
+        self._delays.schedule(delay, complete)
+        return future
+
+    def admission_check(self):
+        """Motivo para rechazar sesiones nuevas, o None si hay capacidad."""
+        streams = sum(1 for s in list(self._sessions.values()) if s.streaming())
+        if self.max_streams and streams >= self.max_streams:
+            return f"Nodo sin descriptores libres ({streams} streams abiertos)"
+        if self.limiter and self.limiter.node_backlog() > self.MAX_BACKLOG:
+            return "Ancho de banda del nodo agotado"
+        return None
 
     def authenticate(self, media_render, username, password, current=None):
         if not media_render: raise Spotifice.BadReference("Render cliente inválido (None)")
@@ -162,20 +649,81 @@ class MediaServerI(Spotifice.MediaServer):
         if not _verify_password(password, u["salt"], u["digest"]):
              logger.warning(f"Contraseña incorrecta para: {username}")
              raise Spotifice.AuthError("Credenciales inválidas", username)
+
+        # Control de admisión: los oyentes actuales conservan su latencia; el
+        # cliente reintenta y el grupo de réplicas le asigna otro nodo
+        busy = self.admission_check()
+        if busy:
+            logger.warning(f"Sesión rechazada para {username}: {busy}")
+            raise Spotifice.BusyError(item=username, reason=busy)
         
-        # Crear sesión segura
-        servant = SecureStreamManagerI(self, username)
-        # Registrar con UUID para que sea único por sesión
-        proxy = current.adapter.addWithUUID(servant)
-        self._sessions[username] = servant
+        # Crear sesión segura en el almacén compartido
+        sid = uuid.uuid4().hex
+        expires = time.time() + self.SESSION_TTL
+        self._store.put(sid, {"user": username, "expires": expires})
+        token = sign_token(self._secret, {"sid": sid, "user": username, "exp": expires})
+
+        # Con ReplicaGroupId (IceGrid) el proxy es indirecto al grupo de réplicas
+        adapter = self.adapter or current.adapter
+        identity = Ice.Identity(name=token, category=SessionLocator.CATEGORY)
+        proxy = adapter.createProxy(identity)
         logger.info(f"Autenticación exitosa para usuario: {username}. Sesión creada.")
         return Spotifice.SecureStreamManagerPrx.uncheckedCast(proxy)
 
-    def remove_session(self, username):
-         self._sessions.pop(username, None)
+    def lookup_session(self, token):
+        """Devuelve el sirviente local de una sesión válida, o None si no lo es."""
+        payload = verify_token(self._secret, token)
+        if not payload:
+            return None
+
+        sid = payload["sid"]
+        if sid not in self._sessions:
+            if not self._store.get(sid):
+                return None  # Sesión cerrada o revocada
+            self._sessions[sid] = SecureStreamManagerI(self, payload["user"], sid)
+        return self._sessions[sid]
+
+    def remove_session(self, sid):
+        self._sessions.pop(sid, None)
+        if self.limiter:
+            self.limiter.forget(sid)
+        self._store.delete(sid)
+
+    def purge_sessions(self, now=None):
+        """Purga el almacén y suelta los sirvientes de sesiones que ya no existen."""
+        self._store.purge_expired(now)
+        for sid, session in list(self._sessions.items()):
+            if self._store.get(sid):
+                continue
+            session.close_stream()
+            self._sessions.pop(sid, None)
+            if self.limiter:
+                self.limiter.forget(sid)
 
 # --- Función Principal ---
 
+class MediaRescanner:
+    """Hilo que aplica periódicamente las altas y bajas del directorio de medios."""
+    def __init__(self, server_impl, interval):
+        self._server = server_impl
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            try:
+                self._server.rescan_media()
+            except Exception as e:
+                logger.warning(f"No se pudo revisar el directorio de medios: {e}")
+
+
 def main(ic):
     props = ic.getProperties()
     server_id = props.getPropertyWithDefault("ServerID", "UnknownServer")
@@ -185,19 +733,99 @@ def main(ic):
     media_path = props.getPropertyWithDefault('MediaServer.Content', 'media')
     playlists_path = props.getPropertyWithDefault('MediaServer.Playlists', 'playlists')
     users_path = props.getPropertyWithDefault("MediaServer.UsersFile", "users.json")
-    
-    servant = MediaServerI(Path(media_path), Path(playlists_path), Path(users_path))
+    store = create_store(
+        props.getPropertyWithDefault("MediaServer.SessionStore", "memory"))
+    secret = props.getProperty("MediaServer.SessionSecret")
+
+    transcoder = Transcoder(
+        media_path,
+        props.getPropertyWithDefault("MediaServer.Renditions", "renditions"),
+        props.getPropertyAsIntWithDefault("MediaServer.TranscodeWorkers", 2))
+
+    packs_path = props.getPropertyWithDefault("MediaServer.Packs", "packs")
+    # Un log por réplica: cada una guarda su copia de las ediciones
+    playlist_log = PlaylistLog(props.getPropertyWithDefault(
+        "MediaServer.PlaylistLog", f"{playlists_path}/{server_id}.log"))
+
+    # Mismo sistema de ficheros que media/ para que los blobs sean reflinks
+    blob_store = BlobStore(props.getPropertyWithDefault("MediaServer.Blobs", "blobs"),
+                           props.getPropertyAsInt("MediaServer.HashWorkers") or None)
+
+    # Límites de caudal en KiB/s (0 desactiva el nivel)
+    def kib(name, default):
+        return props.getPropertyAsIntWithDefault(
+            f"MediaServer.RateLimit.{name}", default) * 1024
+
+    limiter = RateLimiter(kib("Session", 512),
+                          {"free": kib("Free", 128), "premium": kib("Premium", 512)},
+                          kib("Node", 16384))
+    max_streams = props.getPropertyAsIntWithDefault("MediaServer.MaxStreams", 512)
+
+    servant = MediaServerI(Path(media_path), Path(playlists_path), Path(users_path),
+                           store, secret, transcoder, packs_path, playlist_log,
+                           blob_store, limiter, max_streams)
     
     adapter = ic.createObjectAdapter("MediaServerAdapter")
+    servant.adapter = adapter
+    servant.server_id = server_id
+    topics = create_topics(ic)
+    servant.events = topics.publisher(CATALOG_TOPIC, Spotifice.CatalogEventsPrx)
+    servant.catalog_changed()
+    fast_path = props.getPropertyAsIntWithDefault("MediaServer.StreamFastPath", 0) > 0
+    adapter.addServantLocator(SessionLocator(servant, fast_path), SessionLocator.CATEGORY)
+
+    # Proxy directo: uno indirecto apuntaría al grupo de réplicas, no a ésta
+    replica_id = Ice.Identity(name=str(uuid.uuid4()), category="replica")
+    adapter.add(PlaylistReplicaI(servant), replica_id)
+    try:
+        topics.subscribe(CATALOG_TOPIC, adapter.createDirectProxy(replica_id))
+    except Ice.Exception as e:
+        logger.warning(f"Sin eventos de catálogo ({e}): las ediciones no se propagarán")
     
     # IMPORTANTE PARA REPLICA GROUP:
     # Registramos el sirviente con la identidad fija "MediaServer".
     # IceGrid usará esto para el balanceo de carga entre nodos.
-    adapter.add(servant, ic.stringToIdentity("MediaServer"))
+    # Delante va la caché de respuestas codificadas del catálogo (reply_cache.py)
+    reply_cache.install(ic, adapter, servant, ic.stringToIdentity("MediaServer"),
+                        lambda: servant.catalog_version)
     
+    # Sincronización de catálogo con el resto de réplicas de MediaServerRep,
+    # restringida a quien conoce el secreto común de las réplicas
+    syncer = None
+    replica_secret = props.getProperty("MediaServer.ReplicaSecret") or secret
+    if replica_secret:
+        replica_secret = replica_secret.encode("utf-8")
+        adapter.add(catalog_sync.CatalogSyncI(servant, replica_secret),
+                    ic.stringToIdentity(catalog_sync.IDENTITY))
+        interval = props.getPropertyAsIntWithDefault("MediaServer.SyncInterval", 60)
+        if interval > 0 and ic.getDefaultLocator():
+            syncer = catalog_sync.CatalogSyncer(
+                servant, lambda: catalog_sync.find_replicas(ic), interval, replica_secret)
+            syncer.start()
+    else:
+        logger.warning("Sin MediaServer.ReplicaSecret ni SessionSecret: el catálogo "
+                       "no se sincroniza con otras réplicas.")
+
+    purger = SessionPurger(servant.purge_sessions, props.getPropertyAsIntWithDefault(
+        "MediaServer.SessionPurgeInterval", 600))
+    purger.start()
+    # Altas y bajas de ficheros en media/ sin reiniciar (0 lo desactiva)
+    rescanner = None
+    rescan_interval = props.getPropertyAsIntWithDefault("MediaServer.RescanInterval", 60)
+    if rescan_interval > 0:
+        rescanner = MediaRescanner(servant, rescan_interval)
+        rescanner.start()
+
     adapter.activate()
     logger.info("MediaServerAdapter activo y esperando peticiones.")
     ic.waitForShutdown()
+    purger.stop()
+    if rescanner:
+        rescanner.stop()
+    if syncer:
+        syncer.stop()
+    transcoder.shutdown()
+    playlist_log.close()
     logger.info("Apagando servidor.")
 
 if __name__ == "__main__":
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+"""Índice de playlists con búsquedas inversas pista→playlists.
+
+Mantiene, para cada playlist, la duración total, el tamaño en bytes y el
+número de pistas disponibles, y se actualiza de forma incremental cuando
+aparecen o desaparecen pistas o playlists, sin recorrer toda la biblioteca.
+Las playlists guardan todos sus ids (también los de pistas que aún no existen),
+de modo que una pista que aparece más tarde se incorpora sola. Los ids se
+guardan como arrays de slots del TrackCatalog, que también aporta la duración
+y el tamaño de cada pista.
+"""
+
+from array import array
+from collections import Counter
+
+from catalog import TrackCatalog
+
+
+class PlaylistIndex:
+    def __init__(self, catalog=None):
+        self.catalog = catalog if catalog is not None else TrackCatalog()
+        self._meta = {}       # {playlist_id: dict con name, owner, ...}
+        self._ids = {}        # {playlist_id: array de slots} tal como se definieron
+        # {slot: playlist_id si aparece una vez, o {playlist_id: apariciones}}
+        self._by_track = {}
+        self._totals = {}     # {playlist_id: [duration_ms, byte_size, track_count]}
+        self._views = {}      # {playlist_id: [track_id disponibles]} (caché)
+
+    # --- Pistas ---
+    def set_track(self, track_id, duration_ms, byte_size, title=None):
+        """Añade o actualiza una pista disponible."""
+        if track_id in self.catalog:
+            self.remove_track(track_id)
+        slot = self.catalog.add(track_id, title, duration_ms, byte_size)
+        self._apply(slot, +1)
+
+    def remove_track(self, track_id):
+        slot = self.catalog.find(track_id)
+        if slot is None or not self.catalog.available(slot):
+            return
+        self._apply(slot, -1)
+        self.catalog.remove(track_id)
+
+    def _refs(self, slot):
+        refs = self._by_track.get(slot, {})
+        return {refs: 1} if isinstance(refs, str) else refs
+
+    def _add_ref(self, slot, playlist_id, times):
+        # El caso habitual (una pista en una sola playlist) no necesita un dict
+        refs = self._by_track.get(slot)
+        if refs is None and times == 1:
+            self._by_track[slot] = playlist_id
+            return
+        refs = self._by_track[slot] = self._refs(slot)
+        refs[playlist_id] = times
+
+    def _remove_ref(self, slot, playlist_id):
+        refs = self._by_track[slot]
+        if isinstance(refs, str) or len(refs) == 1:
+            del self._by_track[slot]
+        else:
+            del refs[playlist_id]
+
+    def _apply(self, slot, sign):
+        duration, size = self.catalog.duration_ms(slot), self.catalog.byte_size(slot)
+        for pid, times in self._refs(slot).items():
+            totals = self._totals[pid]
+            totals[0] += sign * duration * times
+            totals[1] += sign * size * times
+            totals[2] += sign * times
+            self._views.pop(pid, None)
+
+    # --- Playlists ---
+    def put_playlist(self, playlist_id, meta, track_ids):
+        """Crea o reemplaza una playlist."""
+        self.remove_playlist(playlist_id)
+        slots = array("l", (self.catalog.slot(tid) for tid in track_ids))
+        self._meta[playlist_id] = dict(meta)
+        self._ids[playlist_id] = slots
+        totals = self._totals[playlist_id] = [0, 0, 0]
+        for slot, times in Counter(slots).items():
+            self._add_ref(slot, playlist_id, times)
+            if self.catalog.available(slot):
+                totals[0] += self.catalog.duration_ms(slot) * times
+                totals[1] += self.catalog.byte_size(slot) * times
+                totals[2] += times
+
+    def remove_playlist(self, playlist_id):
+        if playlist_id not in self._ids:
+            return
+        for slot in set(self._ids[playlist_id]):
+            self._remove_ref(slot, playlist_id)
+        for table in (self._meta, self._ids, self._totals, self._views):
+            table.pop(playlist_id, None)
+
+    # --- Consultas ---
+    def __contains__(self, playlist_id):
+        return playlist_id in self._ids
+
+    def __len__(self):
+        return len(self._ids)
+
+    def playlist_ids(self):
+        return list(self._ids)
+
+    def meta(self, playlist_id):
+        return self._meta[playlist_id]
+
+    def raw_track_ids(self, playlist_id):
+        """Ids tal como se definieron, incluidas pistas no disponibles."""
+        return [self.catalog.track_id(slot) for slot in self._ids[playlist_id]]
+
+    def track_ids(self, playlist_id):
+        """Ids de las pistas disponibles, en orden."""
+        if playlist_id not in self._views:
+            self._views[playlist_id] = [self.catalog.track_id(slot)
+                                        for slot in self._ids[playlist_id]
+                                        if self.catalog.available(slot)]
+        return self._views[playlist_id]
+
+    def playlists_with_track(self, track_id):
+        slot = self.catalog.find(track_id)
+        return list(self._refs(slot)) if slot is not None else []
+
+    def summary(self, playlist_id):
+        """(duration_ms, byte_size, track_count) de las pistas disponibles."""
+        return tuple(self._totals[playlist_id])
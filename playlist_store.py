@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+
+"""Almacenamiento duradero de cambios de playlists en un log de sólo-añadir.
+
+Cada cambio es una línea JSON escrita con fsync, así que una escritura cuesta
+lo que ocupa el cambio. Al arrancar se aplica la instantánea y después el log;
+una última línea truncada por una caída se descarta. Periódicamente el log se
+compacta en una instantánea nueva (escrita de forma atómica).
+
+Operaciones: put (crear/reemplazar), append (añadir pistas) y delete. Las
+entradas replicadas llevan un sello [contador, origen] (reloj de Lamport): por
+playlist gana el sello mayor, así que las réplicas convergen sea cual sea el
+orden de llegada. Los borrados se conservan como lápidas en los sellos. Un
+append lleva además el sello del estado que extiende (`base`): una réplica con
+otro estado lo descarta y la sincronización de catálogo le trae el completo.
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+
+logger = logging.getLogger("PlaylistStore")
+
+
+def apply_entry(index, entry, stamps=None):
+    """Aplica una entrada del log sobre un PlaylistIndex.
+
+    Con `stamps` ({playlist_id: [contador, origen]}) se descartan las entradas
+    más antiguas que el estado actual. Devuelve si la entrada se aplicó.
+    """
+    op, pid = entry["op"], entry["id"]
+    if stamps is not None and "stamp" in entry:
+        if pid in stamps and stamps[pid] >= entry["stamp"]:
+            return False
+        if op == "append" and stamps.get(pid) != entry.get("base"):
+            return False
+        stamps[pid] = list(entry["stamp"])
+    if op == "put":
+        index.put_playlist(pid, entry["meta"], entry["track_ids"])
+    elif op == "append" and pid in index:
+        index.put_playlist(pid, index.meta(pid),
+                           index.raw_track_ids(pid) + entry["track_ids"])
+    elif op == "delete":
+        index.remove_playlist(pid)
+    return True
+
+
+def entry_for(index, stamps, playlist_id):
+    """Entrada que reproduce el estado actual de una playlist (o su lápida)."""
+    entry = {"op": "delete", "id": playlist_id}
+    if playlist_id in index:
+        entry = {"op": "put", "id": playlist_id, "meta": index.meta(playlist_id),
+                 "track_ids": index.raw_track_ids(playlist_id)}
+    if playlist_id in stamps:
+        entry["stamp"] = stamps[playlist_id]
+    return entry
+
+
+class PlaylistLog:
+    COMPACT_EVERY = 1000  # Entradas en el log antes de compactar
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.snapshot_path = self.path.with_suffix(".snapshot")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._entries = 0
+        self._fh = None
+
+    def replay(self, index, stamps=None):
+        """Reconstruye el estado (instantánea + log) y abre el log para añadir."""
+        self.close()
+        applied, self._entries = 0, 0
+        for source in (self.snapshot_path, self.path):
+            for entry in self._read(source):
+                apply_entry(index, entry, stamps)
+                applied += 1
+                if source == self.path:
+                    self._entries += 1
+        self._fh = open(self.path, "a", encoding="utf-8")
+        logger.info(f"Aplicados {applied} cambios de playlists desde {self.path.name}")
+        return applied
+
+    @staticmethod
+    def _read(path):
+        if not path.exists():
+            return
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"Entrada incompleta descartada en {path.name}")
+                    return
+
+    def append(self, entry, index=None, stamps=None):
+        """Persiste una entrada; con `index` compacta cuando toca."""
+        self._fh.write(json.dumps(entry, sort_keys=True) + "\n")
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self._entries += 1
+        if index is not None and self._entries >= self.COMPACT_EVERY:
+            self.compact(index, stamps)
+
+    def compact(self, index, stamps=None):
+        """Escribe el estado completo (y las lápidas) como instantánea y vacía el log."""
+        stamps = stamps or {}
+        tmp = self.snapshot_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for pid in sorted(set(index.playlist_ids()) | set(stamps)):
+                f.write(json.dumps(entry_for(index, stamps, pid), sort_keys=True) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        tmp.replace(self.snapshot_path)
+
+        self._fh.close()
+        self._fh = open(self.path, "w", encoding="utf-8")
+        self._entries = 0
+        logger.info(f"Log de playlists compactado ({len(index)} playlists)")
+
+    def close(self):
+        if self._fh:
+            self._fh.close()
+            self._fh = None
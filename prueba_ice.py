@@ -4,10 +4,10 @@ import Ice
 
 # Cargar la interfaz
 try:
-    Ice.loadSlice('-I{} spotifice_v2.ice'.format(Ice.getSliceDir()))
-    import Spotifice
-except ImportError:
-    print("[FATAL] No se pudo cargar el fichero Slice 'spotifice_v2.ice'.")
+    from slice_loader import load_spotifice
+    Spotifice = load_spotifice()
+except (ImportError, RuntimeError):
+    print("[FATAL] No se pudo cargar el fichero Slice 'spotifice_v3.ice'.")
     sys.exit(1)
 
 def test_replica_group(communicator):
@@ -55,6 +55,24 @@ def test_specific_renders(communicator):
     print(f"\nResultado Renders: {success_count}/{len(renders_to_test)} operativos.")
     return success_count == len(renders_to_test)
 
+def test_render_group(communicator):
+    print("\n[TEST 3] Probando control en lote con 'RenderGroup'...")
+    try:
+        group = Spotifice.RenderGroupPrx.checkedCast(
+            communicator.stringToProxy("RenderGroup"))
+        if not group:
+            print("❌ [ERROR] Proxy inválido para 'RenderGroup'.")
+            return False
+
+        # Una sola llamada para todos los renders
+        results = group.stop(["mediaRender1", "mediaRender2"])
+        for r in results:
+            print(f"   {'✅ [OK]' if r.ok else '❌ [ERROR]'} {r.render_id} {r.error}")
+        return all(r.ok for r in results)
+    except Ice.Exception as e:
+        print(f"❌ [ERROR] Falló el control en lote: {e}")
+        return False
+
 def main():
     # Usamos locator.config para que el cliente sepa dónde está el Registry
     try:
@@ -63,9 +81,10 @@ def main():
             
             group_ok = test_replica_group(communicator)
             renders_ok = test_specific_renders(communicator)
+            batch_ok = test_render_group(communicator)
 
             print("\n--- RESUMEN FINAL ---")
-            if group_ok and renders_ok:
+            if group_ok and renders_ok and batch_ok:
                 print("✅✅✅  NIVEL INTERMEDIO COMPLETADO CORRECTAMENTE  ✅✅✅")
                 print("La infraestructura cumple con todos los requisitos detectados.")
             else:
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+"""Limitación de caudal por sesión, por usuario y por nodo.
+
+Cada nivel es un token bucket en bytes. Una lectura reserva sus bytes en todos
+los buckets que le afectan y espera lo que indique el más restrictivo: el saldo
+puede quedar en negativo (deuda), de modo que una lectura grande no se bloquea
+para siempre y las siguientes pagan el exceso. La espera no ocupa un hilo de
+dispatch: la respuesta se completa más tarde desde el DelayQueue.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+
+class TokenBucket:
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = rate      # bytes/s
+        self.burst = burst    # bytes acumulables como máximo
+        self._clock = clock
+        self._tokens = burst
+        self._stamp = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def reserve(self, n):
+        """Descuenta `n` bytes y devuelve los segundos a esperar antes de servirlos."""
+        self._refill()
+        self._tokens -= n
+        return max(0.0, -self._tokens / self.rate)
+
+    def backlog(self):
+        """Segundos de deuda acumulada (0 si hay saldo)."""
+        self._refill()
+        return max(0.0, -self._tokens / self.rate)
+
+
+class RateLimiter:
+    """Buckets por sesión, por usuario (según su nivel) y uno para el nodo.
+
+    Las tasas son bytes/s; 0 desactiva el nivel correspondiente. La ráfaga
+    permitida equivale a BURST_SECS segundos de caudal.
+    """
+    BURST_SECS = 2.0
+
+    def __init__(self, session_rate, user_rates, node_rate, clock=time.monotonic):
+        self.session_rate = session_rate
+        self.user_rates = user_rates  # {nivel: bytes/s}: {"free": ..., "premium": ...}
+        self._clock = clock
+        self._node = self._bucket(node_rate)
+        self._sessions = {}  # {sid: TokenBucket}
+        self._users = {}     # {username: TokenBucket}
+        self._lock = threading.Lock()
+
+    def _bucket(self, rate):
+        if rate <= 0:
+            return None
+        return TokenBucket(rate, rate * self.BURST_SECS, self._clock)
+
+    def reserve(self, sid, username, tier, n):
+        """Reserva `n` bytes para una lectura; devuelve la espera necesaria."""
+        with self._lock:
+            if sid not in self._sessions:
+                self._sessions[sid] = self._bucket(self.session_rate)
+            if username not in self._users:
+                self._users[username] = self._bucket(self.user_rates.get(tier, 0))
+            buckets = (self._sessions[sid], self._users[username], self._node)
+            return max((b.reserve(n) for b in buckets if b), default=0.0)
+
+    def node_backlog(self):
+        """Segundos de deuda del nodo: mide cuánto está saturado el ancho de banda."""
+        with self._lock:
+            return self._node.backlog() if self._node else 0.0
+
+    def forget(self, sid):
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+
+class DelayQueue:
+    """Un único hilo que ejecuta tareas diferidas (en lugar de un Timer por tarea)."""
+    def __init__(self):
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def schedule(self, delay, fn):
+        with self._cond:
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._seq), fn))
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+                    self._cond.wait(timeout)
+                _, _, fn = heapq.heappop(self._heap)
+            fn()
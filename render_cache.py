@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+"""Caché persistente de audio en el render, acotada en tamaño y con política LRU.
+
+Cada entrada se identifica por una clave y el digest de contenido que publica el
+servidor (get_track_digest), que hace de ETag: si la pista cambia en el
+servidor, el digest cambia y la entrada antigua deja de usarse. El render y el
+relay usan como clave el propio digest (el blob), así que las pistas con el
+mismo contenido ocupan una sola entrada.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from transcoder import ORIGINAL
+
+logger = logging.getLogger("RenderCache")
+
+
+def cache_key(digest, quality):
+    """Clave de una pista: el digest, con la calidad servida si no es el original."""
+    if not isinstance(quality, str) or quality in ("", ORIGINAL):
+        return digest
+    return f"{digest}@{quality}"
+
+
+class CacheWriter:
+    """Escritura de una entrada: sólo se publica al llamar a commit()."""
+    def __init__(self, cache, name):
+        self._cache = cache
+        self._name = name
+        self._tmp = cache.cache_dir / (name + ".part")
+        self._fh = open(self._tmp, "wb")
+        self._size = 0
+
+    @property
+    def path(self):
+        """Fichero temporal; se puede leer mientras se escribe."""
+        return self._tmp
+
+    def write(self, data):
+        self._fh.write(data)
+        self._size += len(data)
+
+    def flush(self):
+        self._fh.flush()
+
+    def commit(self):
+        self._fh.close()
+        self._cache._publish(self._name, self._tmp, self._size)
+
+    def abort(self):
+        self._fh.close()
+        self._tmp.unlink(missing_ok=True)
+
+
+class LocalStream:
+    """Lectura de una pista cacheada con la misma interfaz que el stream remoto."""
+    def __init__(self, path):
+        self._fh = open(path, "rb")
+
+    def open(self): pass
+
+    def read(self, size):
+        return self._fh.read(size)
+
+    def close(self):
+        self._fh.close()
+
+
+class AudioCache:
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # {nombre: tamaño}, de menos a más reciente
+        self._lock = threading.Lock()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._scan()
+
+    @staticmethod
+    def _prefix(key):
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+    def _name(self, key, digest):
+        return f"{self._prefix(key)}-{digest}"
+
+    def _scan(self):
+        for tmp in self.cache_dir.glob("*.part"):
+            tmp.unlink(missing_ok=True)
+        files = sorted((f for f in self.cache_dir.iterdir() if f.is_file()),
+                       key=lambda f: f.stat().st_mtime)
+        for f in files:
+            self._entries[f.name] = f.stat().st_size
+        logger.info(f"Caché de audio: {len(self._entries)} pistas, "
+                    f"{self.size() // 1024} KiB en {self.cache_dir}")
+
+    def size(self):
+        return sum(self._entries.values())
+
+    def get(self, key, digest):
+        """Ruta de la pista si está en caché con ese digest (y la marca como usada)."""
+        name = self._name(key, digest)
+        with self._lock:
+            if name not in self._entries:
+                return None
+            self._entries.move_to_end(name)
+        path = self.cache_dir / name
+        os.utime(path)  # Persistir el orden LRU entre reinicios
+        return path
+
+    def writer(self, key, digest) -> CacheWriter:
+        return CacheWriter(self, self._name(key, digest))
+
+    def _publish(self, name, tmp, size):
+        if size > self.max_bytes:
+            tmp.unlink(missing_ok=True)
+            return
+        tmp.replace(self.cache_dir / name)
+        with self._lock:
+            # Las claves son digests: una versión anterior de la pista es otra
+            # entrada, que nadie vuelve a pedir y sale por LRU
+            self._entries[name] = size
+            self._entries.move_to_end(name)
+            while self.size() > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, name):
+        self._entries.pop(name, None)
+        (self.cache_dir / name).unlink(missing_ok=True)
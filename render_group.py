@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+import logging
+import sys
+
+import Ice
+
+# Cargar Slice
+from slice_loader import load_spotifice
+
+Spotifice = load_spotifice()  # Precompilado con `make slice` o, si no, desde el .ice
+
+logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(name)s: %(message)s')
+logger = logging.getLogger("RenderGroup")
+
+
+def _error_text(e):
+    if isinstance(e, Spotifice.Error):
+        return f"{type(e).__name__}: {e.reason}"
+    return f"{type(e).__name__}: {e}"
+
+
+def _first_error(*rounds):
+    """Un RenderResult por render: el primero que falló de cada ronda, o el último."""
+    results = []
+    for attempts in zip(*rounds):
+        results.append(next((r for r in attempts if not r.ok), attempts[-1]))
+    return results
+
+
+class RenderGroupI(Spotifice.RenderGroup):
+    """Controla varios renders en una sola llamada.
+
+    Cada operación se reparte en paralelo con AMI y se recogen todos los
+    resultados, de modo que el tiempo total es el del render más lento y no la
+    suma de todos.
+    """
+    TIMEOUT = 10  # segundos por render
+
+    def __init__(self, communicator):
+        self._ic = communicator
+        self._proxies = {}  # {render_id: MediaRenderPrx}
+
+    def _render(self, render_id):
+        if render_id not in self._proxies:
+            proxy = self._ic.stringToProxy(render_id)
+            self._proxies[render_id] = Spotifice.MediaRenderPrx.uncheckedCast(proxy)
+        return self._proxies[render_id]
+
+    def _fan_out(self, render_ids, invoke):
+        """Lanza `invoke(proxy)` (que devuelve un futuro) en todos los renders."""
+        futures = {}
+        results = {}
+        for render_id in render_ids:
+            try:
+                futures[render_id] = invoke(self._render(render_id))
+            except Ice.Exception as e:  # Proxy mal formado, etc.
+                results[render_id] = _error_text(e)
+
+        for render_id, future in futures.items():
+            try:
+                future.result(self.TIMEOUT)
+                results[render_id] = ""
+            except Ice.Exception as e:
+                results[render_id] = _error_text(e)
+            except Exception as e:  # Timeout del futuro
+                results[render_id] = f"{type(e).__name__}: {e}"
+
+        failed = [r for r in render_ids if results[r]]
+        if failed:
+            logger.warning(f"Fallo en {len(failed)}/{len(render_ids)} renders: {failed}")
+        return [Spotifice.RenderResult(render_id=r, ok=not results[r], error=results[r])
+                for r in render_ids]
+
+    def load_playlist(self, render_ids, playlist_id, current=None):
+        logger.info(f"Cargando playlist '{playlist_id}' en {len(render_ids)} renders")
+        return self._fan_out(render_ids, lambda r: r.load_playlistAsync(playlist_id))
+
+    def play(self, render_ids, synced, current=None):
+        logger.info(f"Reproduciendo en {len(render_ids)} renders (sync={synced})")
+        if synced and render_ids:
+            return self._synced_play(render_ids)
+        # Sin sync cada render va por su cuenta, aunque antes estuviera en un grupo
+        left = self._dissolve(render_ids)
+        return _first_error(left, self._fan_out(render_ids, lambda r: r.playAsync()))
+
+    def _synced_play(self, render_ids):
+        """El primer render hace de líder: comparte su reloj y su stream con el
+        resto, y arranca a todos en el mismo instante del reloj del grupo."""
+        leader_id, followers = render_ids[0], render_ids[1:]
+        leader = self._render(leader_id)
+        results = {r.render_id: r for r in
+                   self._fan_out(followers, lambda r: r.join_sync_groupAsync(leader))}
+        results.update({r.render_id: r for r in
+                        self._fan_out([leader_id], lambda r: r.playAsync())})
+        return [results[r] for r in render_ids]
+
+    def stop(self, render_ids, current=None):
+        logger.info(f"Deteniendo {len(render_ids)} renders")
+        stopped = self._fan_out(render_ids, lambda r: r.stopAsync())
+        return _first_error(stopped, self._dissolve(render_ids))
+
+    def _dissolve(self, render_ids):
+        """Saca a los renders de su grupo; un líder libera a sus seguidores."""
+        return self._fan_out(render_ids, lambda r: r.leave_sync_groupAsync())
+
+
+def main(ic):
+    adapter = ic.createObjectAdapter("RenderGroupAdapter")
+    identity = ic.getProperties().getPropertyWithDefault("Identity", "RenderGroup")
+    proxy = adapter.add(RenderGroupI(ic), ic.stringToIdentity(identity))
+    logger.info(f"RenderGroup activo: {proxy}")
+    adapter.activate()
+    ic.waitForShutdown()
+
+
+if __name__ == "__main__":
+    with Ice.initialize(sys.argv) as communicator:
+        main(communicator)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+"""Proxies y conexiones del render hacia el MediaServer.
+
+Al vincularse, ProxyManager resuelve la sesión una vez (con la caché del
+localizador ajustada) y se conecta en ese momento, no en el primer play(). A
+partir de ahí hay tres niveles:
+
+  1. Proxies fijos a la conexión de la sesión, con heartbeats: catálogo y
+     audio la comparten. El adaptador del render queda asociado a ella
+     (bidireccional), así que el otro extremo puede llamar al render por la
+     misma conexión aunque no pueda abrirle una nueva (NAT).
+  2. El endpoint de la réplica que atendió la sesión: si la conexión se cae,
+     se vuelve a conectar al mismo nodo sin pasar por el localizador.
+  3. Los proxies originales, que sólo usa el failover (ResumableStream)
+     cuando esa réplica ya no responde.
+
+Cada operación tiene su timeout de invocación y su número de reintentos
+(sólo las idempotentes), configurables con MediaRender.Timeout.<operación>
+(ms) y MediaRender.Retries.<operación>.
+"""
+
+import logging
+import threading
+import time
+
+import Ice
+
+from slice_loader import load_spotifice
+from wire import uncompressed
+
+Spotifice = load_spotifice()  # Precompilado con `make slice` o, si no, desde el .ice
+
+logger = logging.getLogger("MediaRender")
+
+RETRYABLE = (Ice.TimeoutException, Ice.SocketException, Ice.CloseConnectionException)
+
+
+class ManagedProxy:
+    """Envoltorio de un proxy: las operaciones pasan por ProxyManager.invoke."""
+    def __init__(self, manager, target):
+        self._manager = manager
+        self._target = target
+
+    def __getattr__(self, name):
+        if name.startswith("ice_"):
+            return getattr(self._manager.proxy(self._target), name)
+        return lambda *args: self._manager.invoke(self._target, name, *args)
+
+
+class ProxyManager:
+    LOCATOR_CACHE_TIMEOUT = 120  # s: la réplica resuelta se reutiliza sin consultar
+    ACM_TIMEOUT = 30             # s; con heartbeats la conexión no se cierra sola
+    DEFAULT_TIMEOUT = 5000       # ms
+    TIMEOUTS = {                 # ms, por operación
+        "get_track_info": 2000, "get_playlist": 2000,
+        "get_audio_chunk": 3000, "read_checked": 3000,
+        "open_stream": 10000, "open_stream_at": 10000,
+        "get_track_digest": 30000,  # Puede hashear el fichero entero
+    }
+    RETRIES = {                  # Sólo operaciones idempotentes
+        "get_track_info": 2, "get_playlist": 2, "get_track_digest": 1,
+        "get_track_segments": 1, "read_checked": 1, "close_stream": 1,
+    }
+    RETRY_BACKOFF = 0.2          # s, creciente con cada intento
+
+    def __init__(self, adapter=None, properties=None):
+        self.adapter = adapter   # Adaptador del render: se asocia a la conexión
+        self.origin = None       # (servidor, sesión) tal como llegaron
+        self.locator_cache_timeout = self.LOCATOR_CACHE_TIMEOUT
+        self.acm_timeout = self.ACM_TIMEOUT
+        self.timeouts = dict(self.TIMEOUTS)
+        self.retries = dict(self.RETRIES)
+        self._pinned = None      # {destino: proxy directo al endpoint de la réplica}
+        self._fixed = {}         # {destino: proxy fijo a la conexión}
+        self._views = {}         # {(destino, operación): proxy con su timeout}
+        self._lock = threading.Lock()
+        if properties:
+            self.configure(properties)
+
+    def configure(self, properties):
+        self.locator_cache_timeout = properties.getPropertyAsIntWithDefault(
+            "MediaRender.LocatorCacheTimeout", self.locator_cache_timeout)
+        self.acm_timeout = properties.getPropertyAsIntWithDefault(
+            "MediaRender.ACMTimeout", self.acm_timeout)
+        for prefix, table in (("MediaRender.Timeout.", self.timeouts),
+                              ("MediaRender.Retries.", self.retries)):
+            for key, value in properties.getPropertiesForPrefix(prefix).items():
+                table[key[len(prefix):]] = int(value)
+
+    # --- Vinculación ---
+    def bind(self, server, session):
+        """Resuelve y conecta ahora la sesión y fija ambos proxies a su conexión."""
+        self.origin = (server, session)
+        server = server.ice_locatorCacheTimeout(self.locator_cache_timeout)
+        session = session.ice_locatorCacheTimeout(self.locator_cache_timeout)
+        try:
+            conn = session.ice_getConnection()
+        except Ice.Exception as e:
+            logger.warning(f"Sin conexión con la sesión ({e}): proxies sin fijar")
+            self._set(None, {"server": server, "session": session})
+            return
+        endpoint = [conn.getEndpoint()]
+        self._set(conn, {"server": server.ice_endpoints(endpoint),
+                         "session": session.ice_endpoints(endpoint)})
+
+    def unbind(self):
+        with self._lock:
+            self.origin = None
+            self._pinned = None
+            self._fixed = {}
+            self._views = {}
+
+    def _set(self, conn, pinned):
+        if conn:
+            if self.adapter:
+                conn.setAdapter(self.adapter)
+            conn.setACM(self.acm_timeout, Ice.Unset, Ice.ACMHeartbeat.HeartbeatAlways)
+            fixed = {target: proxy.ice_fixed(conn) for target, proxy in pinned.items()}
+        else:
+            fixed = dict(pinned)
+        fixed["session"] = uncompressed(fixed["session"])  # MP3: comprimir no reduce nada
+        with self._lock:
+            self._pinned = pinned
+            self._fixed = fixed
+            self._views = {}
+
+    def reconnect(self):
+        """Nueva conexión con la misma réplica (por su endpoint, sin localizador)."""
+        pinned = self._pinned
+        if not pinned:
+            raise Ice.ConnectionLostException()
+        self._set(pinned["session"].ice_getConnection(), pinned)
+        logger.info("Reconectado con la réplica de la sesión.")
+
+    # --- Invocaciones ---
+    @property
+    def bound(self):
+        return bool(self._fixed)
+
+    def proxy(self, target, operation=None):
+        """Proxy fijo de `target` ("server" o "session"), con el timeout de
+        `operation`. Sin vincular (o tras unbind) lanza BadReference."""
+        with self._lock:
+            view = self._views.get((target, operation))
+            if view is None:
+                view = self._fixed.get(target)
+                if view is None:
+                    raise Spotifice.BadReference(reason="No hay MediaServer vinculado")
+                if operation:
+                    timeout = self.timeouts.get(operation, self.DEFAULT_TIMEOUT)
+                    view = view.ice_invocationTimeout(timeout)
+                self._views[(target, operation)] = view
+            return view
+
+    def invoke(self, target, operation, *args):
+        retries = self.retries.get(operation, 0)
+        for attempt in range(retries + 1):
+            try:
+                return getattr(self.proxy(target, operation), operation)(*args)
+            except RETRYABLE as e:
+                if attempt == retries:
+                    raise
+                logger.warning(
+                    f"{operation} falló ({e}); reintento {attempt + 1}/{retries}")
+                time.sleep(self.RETRY_BACKOFF * (attempt + 1))
+                try:
+                    self.reconnect()
+                except Ice.Exception:
+                    pass  # El siguiente intento fallará y, tras el último, el failover
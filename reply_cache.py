@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+"""Caché de respuestas ya codificadas para las operaciones de catálogo.
+
+ReplyCacheI es un Blobject que ocupa la identidad pública del MediaServer y
+reenvía cada petición, sin decodificarla, al sirviente real registrado en un
+adaptador colocado (sin endpoints) con una identidad privada: si compartiese la
+pública, la búsqueda colocada podría devolver la propia caché. Las respuestas
+de las operaciones de lectura del catálogo se guardan tal como salen del
+sirviente, codificadas, y mientras no cambie la versión del catálogo una
+petición repetida cuesta una búsqueda en un dict y la copia del buffer. Si
+muchos controladores piden lo mismo a la vez (p. ej. tras un despliegue) sólo
+el primero llega al sirviente.
+"""
+
+import threading
+
+import Ice
+
+BACKEND_ADAPTER = "MediaServerBackend"
+BACKEND_CATEGORY = "backend"  # Identidad del sirviente real: backend/<nombre>
+
+CACHED_OPERATIONS = frozenset({
+    "get_all_tracks", "get_track_info",
+    "get_all_playlists", "get_playlist",
+    "get_playlists_with_track", "get_playlist_summary",
+    "get_compact_catalog",
+})
+
+
+class ReplyCacheI(Ice.Blobject):
+    MAX_ENTRIES = 4096
+
+    def __init__(self, backend, version):
+        self._backend = backend    # Proxy colocado al sirviente real
+        self._version = version    # Función que devuelve la versión del catálogo
+        self._cached_version = None
+        self._replies = {}         # {(operación, parámetros codificados): respuesta}
+        self._pending = {}         # {clave: threading.Event} de peticiones en curso
+        self._lock = threading.Lock()
+
+    def ice_invoke(self, in_params, current):
+        if current.operation not in CACHED_OPERATIONS:
+            return self._forward(in_params, current)
+
+        key = (current.operation, bytes(in_params))
+        with self._lock:
+            version = self._version()
+            if version != self._cached_version:
+                self._replies.clear()
+                self._cached_version = version
+            reply = self._replies.get(key)
+            if reply is not None:
+                return True, reply
+            pending = self._pending.get(key)
+            leader = pending is None
+            if leader:
+                pending = self._pending[key] = threading.Event()
+
+        if not leader:
+            pending.wait()  # Otra petición igual está calculando la respuesta
+            with self._lock:
+                reply = self._replies.get(key)
+            if reply is not None:
+                return True, reply
+            return self._forward(in_params, current)
+
+        try:
+            ok, reply = self._forward(in_params, current)
+            with self._lock:
+                # Las respuestas de error (excepciones de usuario) no se guardan
+                if (ok and version == self._cached_version
+                        and len(self._replies) < self.MAX_ENTRIES):
+                    self._replies[key] = reply
+            return ok, reply
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+            pending.set()
+
+    def _forward(self, in_params, current):
+        return self._backend.ice_invoke(current.operation, current.mode, in_params,
+                                        current.ctx)
+
+
+def install(ic, adapter, servant, identity, version):
+    """Registra `servant` en un adaptador colocado y pone delante la caché con
+    la identidad pública. Devuelve el adaptador colocado."""
+    # Pool de hilos propio: el despacho colocado no puede esperar a un hilo
+    # del pool que está ocupado reenviándole la petición
+    props = ic.getProperties()
+    if not props.getProperty(f"{BACKEND_ADAPTER}.ThreadPool.Size"):
+        props.setProperty(f"{BACKEND_ADAPTER}.ThreadPool.Size", "4")
+    backend = ic.createObjectAdapter(BACKEND_ADAPTER)  # Sin endpoints: sólo colocado
+    private = Ice.Identity(name=identity.name, category=BACKEND_CATEGORY)
+    proxy = backend.add(servant, private)
+    backend.activate()
+    adapter.add(ReplyCacheI(proxy, version), identity)
+    return backend
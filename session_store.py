@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+
+"""Almacén de sesiones compartido entre réplicas de MediaServer.
+
+Las sesiones se identifican con tokens firmados (HMAC-SHA256) con un secreto
+común a todas las réplicas, de modo que cualquiera de ellas puede validar un
+token. El almacén guarda el registro de cada sesión para poder revocarla.
+"""
+
+import abc
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger("MediaServer")
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def sign_token(secret: bytes, payload: dict) -> str:
+    """Serializa y firma un payload: '<payload-b64>.<firma-b64>'."""
+    body = _b64encode(json.dumps(payload, sort_keys=True).encode("utf-8"))
+    mac = hmac.new(secret, body.encode("ascii"), hashlib.sha256).digest()
+    return f"{body}.{_b64encode(mac)}"
+
+
+def verify_token(secret: bytes, token: str, now=None):
+    """Devuelve el payload si la firma es válida y no ha caducado, o None."""
+    try:
+        body, mac = token.split(".")
+        expected = hmac.new(secret, body.encode("ascii"), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, _b64decode(mac)):
+            return None
+        payload = json.loads(_b64decode(body))
+    except (ValueError, TypeError):
+        return None
+
+    now = time.time() if now is None else now
+    if payload.get("exp", 0) < now:
+        return None
+    return payload
+
+
+class SessionStore(abc.ABC):
+    """Interfaz del almacén: registros {sid: dict} con campo 'expires'."""
+    @abc.abstractmethod
+    def put(self, sid, record): ...
+
+    @abc.abstractmethod
+    def get(self, sid): ...
+
+    @abc.abstractmethod
+    def delete(self, sid): ...
+
+    @abc.abstractmethod
+    def purge_expired(self, now=None): ...
+
+
+class MemorySessionStore(SessionStore):
+    """Almacén en memoria del proceso (una sola réplica o pruebas)."""
+    def __init__(self):
+        self._records = {}
+        self._lock = threading.Lock()
+
+    def put(self, sid, record):
+        with self._lock:
+            self._records[sid] = dict(record)
+
+    def get(self, sid):
+        with self._lock:
+            record = self._records.get(sid)
+            return dict(record) if record else None
+
+    def delete(self, sid):
+        with self._lock:
+            self._records.pop(sid, None)
+
+    def purge_expired(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            for sid in [s for s, r in self._records.items() if r["expires"] < now]:
+                del self._records[sid]
+
+
+class SqliteSessionStore(SessionStore):
+    """Almacén en un fichero SQLite compartido por las réplicas de un host.
+
+    Sólo sirve a réplicas que ven el mismo fichero local: SQLite no admite
+    bloqueos fiables sobre sistemas de ficheros de red. Réplicas en hosts
+    distintos necesitan un almacén replicado.
+    """
+    def __init__(self, path):
+        self._db = sqlite3.connect(str(path), check_same_thread=False, timeout=5)
+        self._lock = threading.Lock()
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " sid TEXT PRIMARY KEY, record TEXT NOT NULL, expires REAL NOT NULL)")
+
+    def put(self, sid, record):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)",
+                (sid, json.dumps(record), record["expires"]))
+
+    def get(self, sid):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT record FROM sessions WHERE sid = ?", (sid,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def delete(self, sid):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+
+    def purge_expired(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM sessions WHERE expires < ?", (now,))
+
+
+def create_store(spec: str) -> SessionStore:
+    """Crea un almacén a partir de 'memory' o 'sqlite:<ruta>'."""
+    kind, _, arg = spec.partition(":")
+    if kind == "memory":
+        return MemorySessionStore()
+    if kind == "sqlite" and arg:
+        return SqliteSessionStore(arg)
+    raise ValueError(f"Almacén de sesiones desconocido: '{spec}'")
+
+
+class SessionPurger:
+    """Hilo que llama periódicamente a `purge` (sesiones caducadas)."""
+    def __init__(self, purge, interval):
+        self._purge = purge
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            try:
+                self._purge()
+            except Exception as e:
+                logger.warning(f"No se pudieron purgar las sesiones: {e}")
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+"""Carga del módulo Spotifice.
+
+Usa el código generado por slice2py (`make slice`) si existe y está al día con
+el fichero .ice; en otro caso compila el Slice en tiempo de ejecución con
+Ice.loadSlice, que es bastante más lento en cada arranque de proceso.
+SPOTIFICE_RUNTIME_SLICE=1 fuerza la carga en tiempo de ejecución.
+
+`make slice` guarda junto al código generado el SHA-256 del .ice del que
+salió: se compara el contenido, no las fechas, que un checkout o la copia a
+distrib/ (IcePatch2) no conservan.
+"""
+
+import hashlib
+import importlib
+import os
+from pathlib import Path
+
+import Ice
+
+SLICE_FILE = Path(__file__).with_name("spotifice_v3.ice")
+GENERATED = Path(__file__).with_name(SLICE_FILE.stem + "_ice.py")
+STAMP = GENERATED.with_suffix(".sha256")  # Salida de `sha256sum spotifice_v3.ice`
+
+
+def _precompiled_is_fresh():
+    try:
+        if not GENERATED.exists():
+            return False
+        digest = hashlib.sha256(SLICE_FILE.read_bytes()).hexdigest()
+        return STAMP.read_text().split()[:1] == [digest]
+    except OSError:
+        return False
+
+
+def load_spotifice():
+    if not os.environ.get("SPOTIFICE_RUNTIME_SLICE") and _precompiled_is_fresh():
+        try:
+            return importlib.import_module("Spotifice")
+        except ImportError:
+            pass
+
+    Ice.loadSlice('-I{} {}'.format(Ice.getSliceDir(), SLICE_FILE))
+    return importlib.import_module("Spotifice")
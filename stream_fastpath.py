@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+"""Despacho de bajo nivel para get_audio_chunk.
+
+El esqueleto generado decodifica el parámetro y codifica la secuencia de bytes
+a través del mapeo genérico de Python (con copias intermedias). FastChunkI es
+un Blobject que lee el `int chunk_size` directamente de la encapsulación y
+escribe la respuesta a mano: cabecera de encapsulación, tamaño de la secuencia
+y los bytes leídos del fichero, que se leen directamente en el buffer de
+respuesta. En el cable es idéntico a SecureStreamManager::get_audio_chunk
+(encoding 1.1), excepciones StreamError incluidas. El tamaño lo elige el
+cliente, así que las dos variantes lo limitan a MAX_CHUNK (chunk_size).
+
+Medido con bench_stream.py (Ice 3.7.10, CPU por chunk, tres ejecuciones), el
+Blobject sólo empata o gana con chunks grandes: 4 KiB 12,5-16,5 µs frente a
+9,2-13,8 µs del esqueleto; 16 KiB 14,1-18,4 frente a 13,4-17,7; 64 KiB
+31,3-36,6 frente a 29,2-33,3; 256 KiB 73,8-100,2 frente a 79,3-100,6. Además
+el render lee con read_checked, no con get_audio_chunk, así que está
+desactivado por defecto (MediaServer.StreamFastPath=1 lo activa).
+"""
+
+import struct
+
+import Ice
+
+OPERATION = "get_audio_chunk"
+ENCODING = b"\x01\x01"  # Encoding 1.1
+MAX_CHUNK = 1 << 20     # Bytes máximos por chunk, pida lo que pida el cliente
+_HEADER = 6             # int32 tamaño + encoding
+_LAST_SLICE = 0x20
+_HAS_OPTIONALS = 0x04
+_ITEM_TAG = (1 << 3) | 5  # optional(1), formato VSize (string)
+_OPTIONALS_END = b"\xff"
+
+
+def chunk_size(requested):
+    """Bytes a leer (y a cobrar) para un chunk_size pedido: nunca más de
+    MAX_CHUNK; uno negativo (leer hasta el final) también se limita."""
+    return MAX_CHUNK if requested < 0 else min(requested, MAX_CHUNK)
+
+
+def _size(n):
+    """Tamaño compacto de Ice: 1 byte si < 255, si no 0xFF + int32."""
+    return bytes([n]) if n < 255 else b"\xff" + struct.pack("<i", n)
+
+
+def _string(s):
+    data = s.encode("utf-8")
+    return _size(len(data)) + data
+
+
+def _encapsulate(payload):
+    return struct.pack("<i", _HEADER + len(payload)) + ENCODING + payload
+
+
+def decode_int(in_params):
+    """Primer parámetro `int` de una encapsulación de entrada."""
+    return struct.unpack_from("<i", in_params, _HEADER)[0]
+
+
+def encode_user_exception(type_ids, reason, item=Ice.Unset):
+    """Excepción de usuario que deriva de ::Spotifice::Error, formato compacto.
+
+    `type_ids` va de la clase más derivada a ::Spotifice::Error, la única con
+    miembros: `reason` y, si se da, el opcional `item` (tras los requeridos).
+    """
+    payload = b""
+    for i, type_id in enumerate(type_ids):
+        last = i == len(type_ids) - 1
+        flags = _LAST_SLICE if last else 0
+        if last and item is not Ice.Unset:
+            flags |= _HAS_OPTIONALS
+        payload += bytes([flags]) + _string(type_id)
+        if last:
+            payload += _string(reason)
+            if item is not Ice.Unset:
+                payload += bytes([_ITEM_TAG]) + _string(item) + _OPTIONALS_END
+    return _encapsulate(payload)
+
+
+def read_reply(fh, size):
+    """Lee hasta `size` bytes de `fh` (ver chunk_size) en una respuesta
+    AudioChunk codificada."""
+    size = chunk_size(size)
+    prefix = _HEADER + 5  # Espacio para el tamaño largo de la secuencia
+    buf = bytearray(prefix + size)
+    view = memoryview(buf)
+    if hasattr(fh, "readinto"):
+        n = fh.readinto(view[prefix:]) or 0
+    else:
+        data = fh.read(size)
+        n = len(data)
+        view[prefix:prefix + n] = data
+
+    seq = _size(n)
+    start = prefix - len(seq) - _HEADER
+    view[start:start + _HEADER] = struct.pack("<i", _HEADER + len(seq) + n) + ENCODING
+    view[start + _HEADER:prefix] = seq
+    return bytes(view[start:prefix + n])
+
+
+class FastChunkI(Ice.Blobject):
+    """get_audio_chunk de una sesión (SecureStreamManagerI) sin el mapeo genérico."""
+    STREAM_ERROR = ("::Spotifice::StreamError", "::Spotifice::Error")
+
+    def __init__(self, session):
+        self._session = session
+
+    def ice_invoke(self, in_params, current):
+        if current.operation != OPERATION:
+            raise Ice.OperationNotExistException(current.id, current.facet,
+                                                 current.operation)
+        size = chunk_size(decode_int(in_params))
+        if not self._session.stream():
+            return self._error("No hay stream abierto")
+        return self._session.throttled(size, lambda: self._read(size))
+
+    def _read(self, size):
+        fh = self._session.stream()
+        if not fh:
+            return self._error("Stream cerrado")
+        try:
+            return True, read_reply(fh, size)
+        except Exception as e:
+            return self._error(f"Error leyendo chunk: {e}", self._session.track_id())
+
+    def _error(self, reason, item=Ice.Unset):
+        return False, encode_user_exception(self.STREAM_ERROR, reason, item)
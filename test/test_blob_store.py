@@ -0,0 +1,91 @@
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from unittest import TestCase, mock
+
+import blob_store
+from blob_store import BlobStore, analyse_file
+
+MEDIA = Path("test/media")
+
+
+class BlobStoreTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        self.media = self.dir / "media"
+        self.media.mkdir()
+        data = (MEDIA / "1s.mp3").read_bytes()
+        self.digest = hashlib.sha256(data).hexdigest()
+        for name in ("a.mp3", "b.mp3"):
+            (self.media / name).write_bytes(data)
+        (self.media / "c.mp3").write_bytes((MEDIA / "2s.mp3").read_bytes())
+        self.sut = BlobStore(self.dir / "blobs", workers=2)
+
+    def test_duplicates_map_to_one_blob(self):
+        digests = self.sut.index(sorted(self.media.iterdir()))
+        self.assertEqual(digests[self.media / "a.mp3"], self.digest)
+        self.assertEqual(digests[self.media / "b.mp3"], self.digest)
+        self.assertEqual(len(set(digests.values())), 2)
+        self.assertIn(self.digest, self.sut)
+
+    def test_editing_a_file_leaves_blob_and_duplicates_intact(self):
+        self.sut.index(sorted(self.media.iterdir()))
+        original = (MEDIA / "1s.mp3").read_bytes()
+        with open(self.media / "a.mp3", "r+b") as f:  # Edición in situ
+            f.write(b"\0" * 64)
+        self.assertFalse(os.path.samefile(self.media / "a.mp3", self.media / "b.mp3"))
+        self.assertEqual((self.media / "b.mp3").read_bytes(), original)
+        self.assertEqual(self.sut.source(self.digest).read_bytes(), original)
+
+    def test_known_hashes_survive_restart(self):
+        files = sorted(self.media.iterdir())
+        self.sut.index(files)
+        restarted = BlobStore(self.dir / "blobs")
+        self.assertEqual(restarted.hash_files(files), self.sut.hash_files(files))
+
+    def test_copy_to_existing_blob(self):
+        self.sut.index([self.media / "a.mp3"])
+        target = self.media / "nuevo.mp3"
+        self.sut.copy_to(self.digest, target)
+        self.assertEqual(target.read_bytes(), (MEDIA / "1s.mp3").read_bytes())
+        self.assertFalse(os.path.samefile(target, self.media / "a.mp3"))
+
+    def test_without_reflinks_files_are_only_indexed(self):
+        with mock.patch.object(blob_store, "reflink", return_value=False):
+            self.sut.index(sorted(self.media.iterdir()))
+        self.assertEqual(list(self.sut.root.glob("??/*")), [])
+        self.assertIn(self.digest, self.sut)
+        (self.media / "a.mp3").unlink()
+        target = self.media / "nuevo.mp3"
+        self.sut.copy_to(self.digest, target)
+        self.assertEqual(target.read_bytes(), (MEDIA / "1s.mp3").read_bytes())
+
+    def test_modified_file_no_longer_serves_its_blob(self):
+        with mock.patch.object(blob_store, "reflink", return_value=False):
+            self.sut.index([self.media / "a.mp3"])
+        with open(self.media / "a.mp3", "ab") as f:
+            f.write(b"\0")
+        self.assertNotIn(self.digest, self.sut)
+
+    def test_analyse_hashes_the_whole_file(self):
+        digest, segments = analyse_file(self.media / "a.mp3", chunk_size=1000)
+        self.assertEqual(digest, self.digest)
+        size = (MEDIA / "1s.mp3").stat().st_size
+        self.assertEqual(sum(n for _, n, _ in segments), size)
+        empty = self.media / "vacío.mp3"
+        empty.touch()
+        self.assertEqual(analyse_file(empty), (hashlib.sha256().hexdigest(), []))
+
+    def test_unused_blobs_are_collected(self):
+        files = sorted(self.media.iterdir())
+        digests = self.sut.index(files)
+        removed = digests[self.media / "c.mp3"]
+        (self.media / "c.mp3").unlink()
+        self.sut.index(files[:2])
+        self.assertNotIn(removed, self.sut)
+        self.assertIsNone(self.sut.segments(removed))
+        self.assertIn(self.digest, self.sut)
+        self.assertNotIn(str(self.media / "c.mp3"), self.sut._known)
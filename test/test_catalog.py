@@ -0,0 +1,35 @@
+from unittest import TestCase
+
+from catalog import TrackCatalog
+
+
+class TrackCatalogTests(TestCase):
+    def setUp(self):
+        self.sut = TrackCatalog()
+        self.sut.add("a.mp3", "a", 1000, 10)
+        self.sut.add("b.mp3", "Otro título", 2000, 20)
+
+    def test_lookup(self):
+        self.assertIn("a.mp3", self.sut)
+        self.assertEqual(len(self.sut), 2)
+        self.assertEqual(list(self.sut), ["a.mp3", "b.mp3"])
+        self.assertEqual(self.sut.title("a.mp3"), "a")
+        self.assertEqual(self.sut.title("b.mp3"), "Otro título")
+        slot = self.sut.find("b.mp3")
+        self.assertEqual(self.sut.duration_ms(slot), 2000)
+        self.assertEqual(self.sut.byte_size(slot), 20)
+
+    def test_slots_are_stable(self):
+        slot = self.sut.find("a.mp3")
+        self.sut.remove("a.mp3")
+        self.assertNotIn("a.mp3", self.sut)
+        self.assertEqual(len(self.sut), 1)
+        self.assertEqual(self.sut.slot("a.mp3"), slot)
+        self.assertEqual(self.sut.add("a.mp3", "a", 1000, 10), slot)
+        self.assertEqual(len(self.sut), 2)
+
+    def test_reserved_slot_is_not_available(self):
+        slot = self.sut.slot("futura.mp3")
+        self.assertFalse(self.sut.available(slot))
+        self.assertNotIn("futura.mp3", self.sut)
+        self.assertEqual(self.sut.track_id(slot), "futura.mp3")
@@ -0,0 +1,109 @@
+import hashlib
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import TestCase
+
+import Ice
+
+from catalog_sync import TOKEN_KEY, CatalogSyncer, CatalogSyncI, Spotifice, replica_token
+
+SECRET = b"replica-secret"
+
+
+class Peer:
+    """Réplica remota: sirve un manifiesto y el contenido de sus pistas."""
+    def __init__(self, files):
+        self.files = files
+        self.context = {}
+
+    def ice_context(self, context):
+        self.context = context
+        return self
+
+    def ice_compress(self, compress):
+        return self
+
+    def get_manifest(self):
+        tracks = [Spotifice.TrackDigest(id=name, digest=hashlib.sha256(data).hexdigest(),
+                                        size=len(data), modified=1)
+                  for name, data in self.files.items()]
+        return Spotifice.CatalogManifest(server_id="peer", version=1,
+                                         tracks=tracks, playlists=[])
+
+    def read_track(self, track_id, offset, size):
+        return self.files[track_id][offset:offset + size]
+
+
+class LocalServer:
+    def __init__(self, media_dir):
+        self.media_dir = media_dir
+        self.server_id = "local"
+        self.tracks = {}
+        self.playlist_stamps = {}
+        self.blob_store = None
+        self.installed = []
+
+    def install_track(self, path, blob=None):
+        self.installed.append(Path(path).name)
+
+
+class CatalogSyncerTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        self.media = self.dir / "media"
+        self.media.mkdir()
+        self.server = LocalServer(self.media)
+        self.sut = CatalogSyncer(self.server, lambda: [], 60, SECRET)
+
+    def test_missing_track_is_fetched(self):
+        peer = Peer({"a.mp3": b"audio" * 1000})
+        self.sut.sync_with(peer)
+        self.assertEqual((self.media / "a.mp3").read_bytes(), b"audio" * 1000)
+        self.assertEqual(self.server.installed, ["a.mp3"])
+        self.assertEqual(peer.context, {TOKEN_KEY: replica_token(SECRET)})
+
+    def test_interrupted_fetch_resumes(self):
+        data = b"audio" * 1000
+        digest = hashlib.sha256(data).hexdigest()
+        staging = self.media / ".sync"
+        staging.mkdir()
+        (staging / f"a.mp3.{digest[:16]}.part").write_bytes(data[:100])
+        peer = Peer({"a.mp3": data})
+        reads = []
+        read_track = peer.read_track
+        peer.read_track = lambda *args: reads.append(args[1]) or read_track(*args)
+        self.sut.sync_with(peer)
+        self.assertEqual(reads[0], 100)
+        self.assertEqual((self.media / "a.mp3").read_bytes(), data)
+
+    def test_ids_outside_media_dir_are_rejected(self):
+        peer = Peer({"../evil.mp3": b"x", "sub/evil.mp3": b"x", "..": b"x",
+                     ".sync": b"x"})
+        self.sut.sync_with(peer)
+        self.assertEqual(self.server.installed, [])
+        self.assertFalse((self.dir / "evil.mp3").exists())
+        self.assertEqual(list(self.media.iterdir()), [])
+
+
+class ReplicaAuthTests(TestCase):
+    def setUp(self):
+        server = SimpleNamespace(server_id="local", tracks={}, playlist_stamps={},
+                                 playlist_index={}, catalog_version=3)
+        self.sut = CatalogSyncI(server, SECRET)
+
+    def test_replica_with_token_is_served(self):
+        current = SimpleNamespace(ctx={TOKEN_KEY: replica_token(SECRET)})
+        self.assertEqual(self.sut.get_manifest(current).version, 3)
+
+    def test_clients_without_token_see_no_object(self):
+        for ctx in ({}, {TOKEN_KEY: replica_token(b"other")}):
+            current = SimpleNamespace(ctx=ctx)
+            with self.assertRaises(Ice.ObjectNotExistException):
+                self.sut.get_manifest(current)
+            with self.assertRaises(Ice.ObjectNotExistException):
+                self.sut.read_track("a.mp3", 0, 1024, current)
+            with self.assertRaises(Ice.ObjectNotExistException):
+                self.sut.get_playlist_changes(["p1"], current)
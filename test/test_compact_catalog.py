@@ -0,0 +1,40 @@
+from types import SimpleNamespace
+from unittest import TestCase
+
+import compact_catalog
+from compact_catalog import DERIVED
+
+META = {"name": "Favoritas", "description": "", "owner": "ana", "created_at": 7}
+
+
+class CompactCatalogTests(TestCase):
+    def setUp(self):
+        self.tracks = [("a.mp3", "a", "a.mp3"), ("b.mp3", "Otro título", "b.mp3"),
+                       ("c.mp3", "c", "otro/c.mp3")]
+        self.playlists = [("pl1", META, ["b.mp3", "a.mp3", "b.mp3"]),
+                          ("pl2", dict(META, owner="Favoritas"), ["nueva.mp3"])]
+
+    def test_round_trip(self):
+        tracks, playlists = compact_catalog.decode(
+            *compact_catalog.encode(self.tracks, self.playlists))
+        self.assertEqual(tracks, self.tracks)
+        self.assertEqual([(p["id"], p["track_ids"]) for p in playlists],
+                         [(pid, ids) for pid, _, ids in self.playlists])
+        self.assertEqual(playlists[1]["owner"], "Favoritas")
+        self.assertEqual(playlists[0]["created_at"], 7)
+
+    def test_each_string_once(self):
+        strings, tracks, playlists = compact_catalog.encode(self.tracks, self.playlists)
+        self.assertEqual(len(strings), len(set(strings)))
+        self.assertEqual(tracks[0].title, DERIVED)
+        self.assertEqual(tracks[0].filename, DERIVED)
+        self.assertEqual(strings[tracks[1].title], "Otro título")
+        self.assertEqual(strings[tracks[2].filename], "otro/c.mp3")
+        # Ids de playlists y nombres repetidos apuntan a la misma cadena
+        self.assertEqual(playlists[0].track_ids[0], tracks[1].id)
+        self.assertEqual(playlists[1].owner, playlists[0].name)
+
+    def test_decode_accepts_slice_structs(self):
+        strings, tracks, playlists = compact_catalog.encode(self.tracks, [])
+        structs = [SimpleNamespace(**t._asdict()) for t in tracks]
+        self.assertEqual(compact_catalog.decode(strings, structs, [])[0], self.tracks)
@@ -0,0 +1,73 @@
+import queue
+
+import Ice
+
+from events import RENDER_TOPIC, LocalTopics, create_topics
+from media_render import MediaRenderI, Spotifice
+
+from .icetest import IceTestCase
+
+
+class Listener(Spotifice.RenderEvents):
+    def __init__(self):
+        self.events = queue.Queue()
+
+    def state_changed(self, render_id, status, current=None):
+        self.events.put((render_id, status.state))
+
+    def track_changed(self, render_id, track, current=None):
+        self.events.put((render_id, track.id))
+
+    def buffer_health(self, render_id, buffered_bytes, offset, current=None):
+        self.events.put((render_id, buffered_bytes))
+
+
+class StoppedPlayer:
+    def is_playing(self):
+        return False
+
+
+class LocalTopicsTests(IceTestCase):
+    def setUp(self):
+        self.ic = self.ice_initialize_with_props({})
+        self.addCleanup(self.ic.destroy)
+        self.adapter = self.ic.createObjectAdapterWithEndpoints(
+            "EventsTest", "tcp -h 127.0.0.1")
+        self.adapter.activate()
+        self.topics = LocalTopics()
+
+    def listen(self, name):
+        listener = Listener()
+        proxy = self.adapter.add(listener, Ice.stringToIdentity(name))
+        self.topics.subscribe(RENDER_TOPIC, proxy)
+        return listener, proxy
+
+    def test_render_events_reach_subscribers(self):
+        render = MediaRenderI(StoppedPlayer())
+        render.render_id = "render1"
+        render.set_topics(self.topics)
+        listeners = [self.listen("a")[0], self.listen("b")[0]]
+        render.publish_status()
+        for listener in listeners:
+            self.assertEqual(listener.events.get(timeout=2),
+                             ("render1", Spotifice.PlaybackState.STOPPED))
+
+    def test_unsubscribed_listener_gets_nothing(self):
+        listener, proxy = self.listen("a")
+        self.topics.unsubscribe(RENDER_TOPIC, proxy)
+        events = self.topics.publisher(RENDER_TOPIC, Spotifice.RenderEventsPrx)
+        events.buffer_health("render1", 1, 0)
+        self.assertEqual(self.topics.subscribers(RENDER_TOPIC), [])
+        self.assertTrue(listener.events.empty())
+
+    def test_unreachable_subscriber_is_dropped(self):
+        listener, _ = self.listen("a")
+        gone = self.ic.stringToProxy("gone:tcp -h 127.0.0.1 -p 1")
+        self.topics.subscribe(RENDER_TOPIC, gone)
+        events = self.topics.publisher(RENDER_TOPIC, Spotifice.RenderEventsPrx)
+        events.buffer_health("render1", 7, 0)
+        self.assertEqual(listener.events.get(timeout=2), ("render1", 7))
+        self.assertEqual([key for key, _ in self.topics.subscribers(RENDER_TOPIC)], ["a"])
+
+    def test_local_topics_without_icestorm(self):
+        self.assertIsInstance(create_topics(self.ic), LocalTopics)
@@ -0,0 +1,52 @@
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+from unittest import TestCase
+
+
+def run_isolated(code):
+    """Ejecuta `code` en un intérprete aparte: cada caso decide qué `gi` hay."""
+    return subprocess.run([sys.executable, "-c", textwrap.dedent(code)],
+                          capture_output=True, text=True, timeout=60,
+                          cwd=Path(__file__).resolve().parents[1])
+
+
+class WithoutGiTests(TestCase):
+    def test_render_falls_back_to_mock_player(self):
+        result = run_isolated("""
+            import sys
+            sys.modules["gi"] = None
+            import media_render
+            assert media_render.USING_MOCK
+            player = media_render.GstPlayer()
+            player.start()
+            player.configure(lambda size: b"")
+            assert player.confirm_play_starts()
+        """)
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+
+class BrokenGstreamerTests(TestCase):
+    def test_play_fails_but_thread_survives(self):
+        result = run_isolated("""
+            import sys, types
+            gi = types.ModuleType("gi")
+            def require_version(name, version):
+                raise ValueError(f"Namespace {name} not available")
+            gi.require_version = require_version
+            sys.modules["gi"] = gi
+
+            from gst_player import GstPlayer
+            player = GstPlayer()
+            player.TIMEOUT_SECS = 0.2
+            player.start()
+            player.configure(lambda size: b"")
+            assert not player.confirm_play_starts()
+            assert player.is_alive()
+            player.start()
+            assert player.stop()
+            player.shutdown()
+            assert not player.is_alive()
+        """)
+        self.assertEqual(result.returncode, 0, result.stderr)
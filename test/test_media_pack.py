@@ -0,0 +1,170 @@
+import tempfile
+import zlib
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import TestCase
+
+from media_pack import (
+    ChecksumError,
+    MediaPack,
+    build_pack,
+    covering,
+    duration_ms,
+    read_verified,
+    segment,
+)
+
+MEDIA = Path("test/media")
+TRACKS = [MEDIA / "1s.mp3", MEDIA / "2s.mp3", MEDIA / "4s.mp3"]
+
+
+class SegmentTests(TestCase):
+    def test_segments_cover_whole_file(self):
+        data = (MEDIA / "4s.mp3").read_bytes()
+        segs = segment(data, 4096)
+        self.assertEqual(segs[0][0], 0)
+        for (off, n, _, _), (next_off, _, _, _) in zip(segs, segs[1:]):
+            self.assertEqual(off + n, next_off)
+        self.assertEqual(segs[-1][0] + segs[-1][1], len(data))
+
+    def test_segments_are_frame_aligned(self):
+        data = (MEDIA / "4s.mp3").read_bytes()
+        for off, _, _, _ in segment(data, 4096)[1:]:
+            self.assertEqual(data[off], 0xFF)
+
+    def test_checksums_and_timestamps(self):
+        data = (MEDIA / "2s.mp3").read_bytes()
+        segs = segment(data, 4096)
+        for off, n, _, crc in segs:
+            self.assertEqual(zlib.crc32(data[off:off + n]), crc)
+        self.assertEqual([s[2] for s in segs], sorted(s[2] for s in segs))
+
+    def test_duration(self):
+        data = (MEDIA / "4s.mp3").read_bytes()
+        self.assertAlmostEqual(duration_ms(data), 4000, delta=200)
+
+    def test_empty_file(self):
+        self.assertEqual(segment(b""), [])
+
+
+class PackTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = Path(tmp.name) / "test.spkpack"
+        build_pack(TRACKS, self.path, segment_size=4096)
+        self.sut = MediaPack(self.path)
+        self.addCleanup(self.sut.close)
+
+    def test_tracks_indexed(self):
+        self.assertEqual(sorted(self.sut.tracks), ["1s.mp3", "2s.mp3", "4s.mp3"])
+
+    def test_read_track_contents(self):
+        for f in TRACKS:
+            stream = self.sut.open(f.name)
+            self.assertEqual(stream.read(), f.read_bytes())
+            stream.close()
+
+    def test_seek_and_chunked_read(self):
+        data = (MEDIA / "2s.mp3").read_bytes()
+        stream = self.sut.open("2s.mp3")
+        stream.seek(1000)
+        self.assertEqual(stream.read(500), data[1000:1500])
+        self.assertEqual(stream.read(10**6), data[1500:])
+        self.assertEqual(stream.read(10), b"")
+        stream.close()
+
+    def test_seek_time_lands_on_segment(self):
+        stream = self.sut.open("4s.mp3")
+        offset = stream.seek_time(2000)
+        starts = [s[0] for s in self.sut.tracks["4s.mp3"]["segments"]]
+        self.assertIn(offset, starts)
+        stream.close()
+
+    def test_verify(self):
+        self.assertTrue(self.sut.verify("1s.mp3"))
+
+    def test_not_a_pack(self):
+        with self.assertRaises(ValueError):
+            MediaPack(MEDIA / "1s.mp3")
+
+
+class DedupPackTests(TestCase):
+    def test_duplicates_share_data(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            copy = Path(tmp) / "copia.mp3"
+            copy.write_bytes((MEDIA / "2s.mp3").read_bytes())
+            single, double = Path(tmp) / "a.spkpack", Path(tmp) / "b.spkpack"
+            build_pack([MEDIA / "2s.mp3"], single, segment_size=4096)
+            entries = build_pack([MEDIA / "2s.mp3", copy], double, segment_size=4096)
+
+            self.assertEqual(entries["2s.mp3"]["offset"], entries["copia.mp3"]["offset"])
+            self.assertLess(double.stat().st_size - single.stat().st_size, 4096)
+            pack = MediaPack(double)
+            with pack.open("copia.mp3") as stream:
+                self.assertEqual(stream.read(), copy.read_bytes())
+            pack.close()
+
+
+class FakeSession:
+    """Sirve read_checked sobre unos datos; las primeras lecturas de un offset
+    pueden llegar corruptas."""
+    def __init__(self, data, corrupt=()):
+        self.data = data
+        self.segments = [SimpleNamespace(offset=o, size=n, crc=c)
+                         for o, n, _, c in segment(data, 4096)]
+        self.corrupt = list(corrupt)
+        self.calls = 0
+
+    def read_checked(self, offset, max_size):
+        self.calls += 1
+        table = [(s.offset, s.size, s.crc) for s in self.segments]
+        segs = covering(table, offset, max_size)
+        start = segs[0][0] if segs else offset
+        data = bytearray(self.data[start:start + sum(s[1] for s in segs)])
+        for off in {o for o in self.corrupt if start <= o < start + len(data)}:
+            data[off - start] ^= 0xFF
+            self.corrupt.remove(off)
+        segments = [SimpleNamespace(offset=o, size=n, crc=c) for o, n, c in segs]
+        return SimpleNamespace(offset=start, data=bytes(data), segments=segments)
+
+
+class VerifiedReadTests(TestCase):
+    def setUp(self):
+        self.data = (MEDIA / "4s.mp3").read_bytes()
+
+    def read_all(self, session):
+        out, offset = b"", 0
+        while True:
+            chunk, _ = read_verified(session, offset, 16 * 1024)
+            if not chunk:
+                return out
+            out += chunk
+            offset += len(chunk)
+
+    def test_clean_stream(self):
+        self.assertEqual(self.read_all(FakeSession(self.data)), self.data)
+
+    def test_only_bad_segment_is_refetched(self):
+        session = FakeSession(self.data, corrupt=[5000])
+        chunk, refetched = read_verified(session, 0, 16 * 1024)
+        self.assertEqual(refetched, 1)
+        self.assertEqual(chunk, self.data[:len(chunk)])
+        session = FakeSession(self.data, corrupt=[5000, 9000])
+        self.assertEqual(self.read_all(session), self.data)
+
+    def test_unaligned_offset(self):
+        chunk, _ = read_verified(FakeSession(self.data), 5000, 4096)
+        self.assertEqual(chunk, self.data[5000:5000 + len(chunk)])
+        self.assertTrue(chunk)
+
+    def test_end_of_track_resends_nothing(self):
+        table = [(s.offset, s.size, s.crc) for s in FakeSession(self.data).segments]
+        self.assertEqual(covering(table, len(self.data), 4096), [])
+        chunk, _ = read_verified(FakeSession(self.data), len(self.data), 4096)
+        self.assertEqual(chunk, b"")
+
+    def test_persistent_corruption_raises(self):
+        session = FakeSession(self.data, corrupt=[100] * 10)
+        with self.assertRaises(ChecksumError):
+            read_verified(session, 0, 4096)
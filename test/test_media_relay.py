@@ -0,0 +1,96 @@
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import TestCase
+
+from media_relay import FetchReader, MediaRelayI, Spotifice
+
+from .icetest import IceTestCase
+
+
+class Upstream:
+    """Servidor central: cuenta las llamadas y entrega sesiones de `session`."""
+    def __init__(self, session=None):
+        self.calls = 0
+        self.session = session
+
+    def ice_compress(self, compress):
+        return self
+
+    def get_track_info(self, track_id):
+        self.calls += 1
+        return track_id
+
+    def authenticate(self, render, username, password):
+        return self.session
+
+
+class UpstreamSession:
+    def __init__(self):
+        self.closed = False
+
+    def get_user_info(self):
+        return Spotifice.UserInfo(username="ana", fullname="Ana", is_premium=True)
+
+    def close(self):
+        self.closed = True
+
+
+class StalledFetch:
+    track_id = "a.mp3"
+    error = None
+    complete = False
+    size = 0
+
+    def __init__(self, path):
+        self.path = path
+
+    def wait_for(self, end, timeout=None):
+        return self.size
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        self.upstream = Upstream()
+        self.relay = MediaRelayI(self.upstream, None, None)
+
+    def test_cached_until_catalog_changes(self):
+        self.relay.get_track_info("a.mp3")
+        self.relay.get_track_info("a.mp3")
+        self.assertEqual(self.upstream.calls, 1)
+        self.relay.invalidate_catalog()
+        self.relay.get_track_info("a.mp3")
+        self.assertEqual(self.upstream.calls, 2)
+
+    def test_bounded(self):
+        self.relay.CATALOG_ENTRIES = 3
+        for i in range(10):
+            self.relay.get_track_info(f"{i}.mp3")
+        self.assertEqual(list(self.relay._catalog),
+                         [("get_track_info", f"{i}.mp3") for i in (7, 8, 9)])
+
+
+class FetchReaderTests(TestCase):
+    def test_stalled_upstream_times_out(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "a.part"
+            path.write_bytes(b"")
+            reader = FetchReader(StalledFetch(path))
+            self.addCleanup(reader.close)
+            with self.assertRaises(Spotifice.StreamError):
+                reader.read(1024)
+
+
+class AuthenticationTests(IceTestCase):
+    def test_session_keeps_user_info_not_upstream_session(self):
+        ic = self.ice_initialize_with_props({})
+        self.addCleanup(ic.destroy)
+        adapter = ic.createObjectAdapterWithEndpoints("RelayTest", "tcp -h 127.0.0.1")
+        upstream = UpstreamSession()
+        relay = MediaRelayI(Upstream(upstream), None, None)
+
+        current = SimpleNamespace(adapter=adapter)
+        proxy = relay.authenticate(None, "ana", "secret", current)
+        self.assertTrue(upstream.closed)
+        session = adapter.find(proxy.ice_getIdentity())
+        self.assertEqual(session.get_user_info().fullname, "Ana")
@@ -0,0 +1,43 @@
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from unittest import TestCase
+
+from media_server import MediaRescanner, MediaServerI
+
+MEDIA = Path("test/media")
+
+
+class RescanTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.media = Path(tmp.name) / "media"
+        self.media.mkdir()
+        shutil.copy(MEDIA / "1s.mp3", self.media)
+        self.server = MediaServerI(self.media, Path(tmp.name) / "playlists",
+                                   Path(tmp.name) / "users.json")
+        self.version = self.server.catalog_version
+
+    def test_added_and_removed_files_update_the_catalog(self):
+        shutil.copy(MEDIA / "2s.mp3", self.media)
+        (self.media / "1s.mp3").unlink()
+        self.server.rescan_media()
+        self.assertEqual(list(self.server.tracks), ["2s.mp3"])
+        self.assertEqual(self.server.catalog_version, self.version + 1)
+
+    def test_unchanged_directory_keeps_the_version(self):
+        self.server.rescan_media()
+        self.assertEqual(list(self.server.tracks), ["1s.mp3"])
+        self.assertEqual(self.server.catalog_version, self.version)
+
+    def test_rescanner_picks_up_new_files(self):
+        rescanner = MediaRescanner(self.server, 0.01)
+        rescanner.start()
+        self.addCleanup(rescanner.stop)
+        shutil.copy(MEDIA / "2s.mp3", self.media)
+        deadline = time.monotonic() + 5
+        while "2s.mp3" not in self.server.tracks and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertIn("2s.mp3", self.server.tracks)
@@ -0,0 +1,53 @@
+from unittest import TestCase
+
+from playlist_index import PlaylistIndex
+
+META = {"name": "pl", "description": "", "owner": "test", "created_at": 0}
+
+
+class PlaylistIndexTests(TestCase):
+    def setUp(self):
+        self.sut = PlaylistIndex()
+        self.sut.set_track("a", 1000, 10)
+        self.sut.set_track("b", 2000, 20)
+        self.sut.put_playlist("p1", META, ["a", "b", "missing"])
+        self.sut.put_playlist("p2", META, ["b", "b"])
+
+    def test_track_ids_skip_missing_tracks(self):
+        self.assertEqual(self.sut.track_ids("p1"), ["a", "b"])
+        self.assertEqual(self.sut.raw_track_ids("p1"), ["a", "b", "missing"])
+
+    def test_summary(self):
+        self.assertEqual(self.sut.summary("p1"), (3000, 30, 2))
+        self.assertEqual(self.sut.summary("p2"), (4000, 40, 2))
+
+    def test_reverse_lookup(self):
+        self.assertEqual(sorted(self.sut.playlists_with_track("b")), ["p1", "p2"])
+        self.assertEqual(self.sut.playlists_with_track("a"), ["p1"])
+        self.assertEqual(self.sut.playlists_with_track("zzz"), [])
+
+    def test_track_removed(self):
+        self.sut.remove_track("b")
+        self.assertEqual(self.sut.track_ids("p1"), ["a"])
+        self.assertEqual(self.sut.summary("p1"), (1000, 10, 1))
+        self.assertEqual(self.sut.summary("p2"), (0, 0, 0))
+
+    def test_track_appears_later(self):
+        self.sut.set_track("missing", 500, 5)
+        self.assertEqual(self.sut.track_ids("p1"), ["a", "b", "missing"])
+        self.assertEqual(self.sut.summary("p1"), (3500, 35, 3))
+
+    def test_track_updated(self):
+        self.sut.set_track("a", 1500, 15)
+        self.assertEqual(self.sut.summary("p1"), (3500, 35, 2))
+
+    def test_playlist_replaced(self):
+        self.sut.put_playlist("p1", META, ["a"])
+        self.assertEqual(self.sut.summary("p1"), (1000, 10, 1))
+        self.assertEqual(self.sut.playlists_with_track("b"), ["p2"])
+
+    def test_playlist_removed(self):
+        self.sut.remove_playlist("p2")
+        self.assertNotIn("p2", self.sut)
+        self.assertEqual(self.sut.playlists_with_track("b"), ["p1"])
+        self.assertEqual(len(self.sut), 1)
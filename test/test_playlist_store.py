@@ -0,0 +1,154 @@
+import json
+import tempfile
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import TestCase
+
+from media_server import MediaServerI
+from playlist_index import PlaylistIndex
+from playlist_store import PlaylistLog, apply_entry
+
+META = {"name": "pl", "description": "", "owner": "test", "created_at": 0}
+
+
+class PlaylistLogTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "edits.log"
+        self.index = PlaylistIndex()
+        self.sut = PlaylistLog(self.path)
+        self.sut.replay(self.index)
+
+    def tearDown(self):
+        self.sut.close()
+        self.tmp.cleanup()
+
+    def edit(self, entry):
+        apply_entry(self.index, entry)
+        self.sut.append(entry, self.index)
+
+    def reopen(self):
+        self.sut.close()
+        index = PlaylistIndex()
+        self.sut = PlaylistLog(self.path)
+        self.sut.replay(index)
+        return index
+
+    def test_replay_restores_edits(self):
+        self.edit({"op": "put", "id": "p1", "meta": META, "track_ids": ["a"]})
+        self.edit({"op": "append", "id": "p1", "track_ids": ["b", "c"]})
+        self.edit({"op": "put", "id": "p2", "meta": META, "track_ids": []})
+        self.edit({"op": "delete", "id": "p2"})
+
+        index = self.reopen()
+        self.assertEqual(index.playlist_ids(), ["p1"])
+        self.assertEqual(index.raw_track_ids("p1"), ["a", "b", "c"])
+        self.assertEqual(index.meta("p1"), META)
+
+    def test_truncated_tail_is_ignored(self):
+        self.edit({"op": "put", "id": "p1", "meta": META, "track_ids": ["a"]})
+        self.sut.close()
+        with open(self.path, "a") as f:
+            f.write('{"op": "append", "id": "p1", "tra')
+
+        index = self.reopen()
+        self.assertEqual(index.raw_track_ids("p1"), ["a"])
+
+    def test_compaction_keeps_state(self):
+        self.sut.COMPACT_EVERY = 3
+        for i in range(5):
+            self.edit({"op": "append" if i else "put", "id": "p1", "meta": META,
+                       "track_ids": [str(i)]})
+
+        self.assertEqual(len(self.path.read_text().splitlines()), 2)
+        index = self.reopen()
+        self.assertEqual(index.raw_track_ids("p1"), ["0", "1", "2", "3", "4"])
+
+
+class StampTests(TestCase):
+    def test_last_writer_wins_in_any_order(self):
+        old = {"op": "put", "id": "p1", "meta": META, "track_ids": ["a"],
+               "stamp": [1, "s1"]}
+        new = {"op": "put", "id": "p1", "meta": META, "track_ids": ["b"],
+               "stamp": [2, "s2"]}
+        for order in ([old, new], [new, old]):
+            index, stamps = PlaylistIndex(), {}
+            applied = [apply_entry(index, e, stamps) for e in order]
+            self.assertEqual(index.raw_track_ids("p1"), ["b"])
+            self.assertEqual(stamps["p1"], [2, "s2"])
+            self.assertEqual(applied, [True, order[0] is old])
+
+    def test_tombstone_survives_compaction(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            index, stamps = PlaylistIndex(), {}
+            log = PlaylistLog(Path(tmp) / "edits.log")
+            log.replay(index, stamps)
+            put = {"op": "put", "id": "p1", "meta": META, "track_ids": [],
+                   "stamp": [1, "s1"]}
+            for e in (put, {"op": "delete", "id": "p1", "stamp": [2, "s1"]}):
+                apply_entry(index, e, stamps)
+                log.append(e, index, stamps)
+            log.compact(index, stamps)
+            log.close()
+
+            index, stamps = PlaylistIndex(), {}
+            log = PlaylistLog(Path(tmp) / "edits.log")
+            log.replay(index, stamps)
+            log.close()
+            self.assertNotIn("p1", index)
+            stale = {"op": "put", "id": "p1", "meta": META, "track_ids": [],
+                     "stamp": [1, "s1"]}
+            self.assertFalse(apply_entry(index, stale, stamps))
+
+    def test_append_needs_the_state_it_extends(self):
+        index, stamps = PlaylistIndex(), {}
+        put = {"op": "put", "id": "p1", "meta": META, "track_ids": ["a"],
+               "stamp": [1, "s1"]}
+        apply_entry(index, put, stamps)
+        stale = {"op": "append", "id": "p1", "track_ids": ["x"],
+                 "base": [0, "s2"], "stamp": [2, "s2"]}
+        self.assertFalse(apply_entry(index, stale, stamps))
+        append = {"op": "append", "id": "p1", "track_ids": ["b"],
+                  "base": [1, "s1"], "stamp": [2, "s1"]}
+        self.assertTrue(apply_entry(index, append, stamps))
+        self.assertEqual(index.raw_track_ids("p1"), ["a", "b"])
+        self.assertEqual(stamps["p1"], [2, "s1"])
+
+
+class ServerEditTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        self.log_path = self.dir / "edits.log"
+        self.sut = self.server()
+        playlist = SimpleNamespace(id="p1", name="pl", description="", owner="test",
+                                   created_at=0, track_ids=[])
+        self.sut.create_playlist(playlist)
+
+    def server(self):
+        log = PlaylistLog(self.log_path)
+        self.addCleanup(log.close)
+        return MediaServerI(Path("test/media"), self.dir / "playlists",
+                            self.dir / "users.json", playlist_log=log)
+
+    def test_concurrent_appends_are_not_lost(self):
+        def append():
+            for _ in range(25):
+                self.sut.append_tracks("p1", ["1s.mp3"])
+        threads = [threading.Thread(target=append) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(self.sut.playlist_index.raw_track_ids("p1")), 200)
+        self.assertEqual(len(self.server().playlist_index.raw_track_ids("p1")), 200)
+
+    def test_append_logs_only_the_change(self):
+        self.sut.append_tracks("p1", ["1s.mp3", "2s.mp3"])
+        self.sut.append_tracks("p1", ["4s.mp3"])
+        entries = [json.loads(line) for line in self.log_path.read_text().splitlines()]
+        self.assertEqual([e["op"] for e in entries], ["put", "append", "append"])
+        self.assertEqual(entries[2]["track_ids"], ["4s.mp3"])
+        self.assertEqual(entries[2]["base"], entries[1]["stamp"])
@@ -0,0 +1,102 @@
+import io
+import threading
+from unittest import TestCase
+
+from media_pack import segment
+from media_server import SecureStreamManagerI
+from rate_limit import DelayQueue, RateLimiter, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TokenBucketTests(TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.sut = TokenBucket(rate=1000, burst=2000, clock=self.clock)
+
+    def test_burst_is_free(self):
+        self.assertEqual(self.sut.reserve(2000), 0)
+
+    def test_debt_paid_over_time(self):
+        self.sut.reserve(2000)
+        self.assertAlmostEqual(self.sut.reserve(500), 0.5)
+        self.clock.now = 0.5
+        self.assertEqual(self.sut.backlog(), 0)
+
+    def test_refill_capped_at_burst(self):
+        self.clock.now = 100
+        self.assertEqual(self.sut.reserve(2000), 0)
+        self.assertAlmostEqual(self.sut.reserve(1000), 1.0)
+
+
+class RateLimiterTests(TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.sut = RateLimiter(session_rate=1000,
+                               user_rates={"free": 500, "premium": 2000},
+                               node_rate=10000, clock=self.clock)
+
+    def test_tiers(self):
+        self.assertAlmostEqual(self.sut.reserve("s1", "ana", "free", 1500), 1.0)
+        self.assertAlmostEqual(self.sut.reserve("s2", "bea", "premium", 1500), 0)
+
+    def test_user_limit_spans_sessions(self):
+        self.sut.reserve("s1", "ana", "free", 1000)
+        self.assertAlmostEqual(self.sut.reserve("s2", "ana", "free", 500), 1.0)
+
+    def test_node_backlog(self):
+        for i in range(30):
+            self.sut.reserve(f"s{i}", f"u{i}", "premium", 1000)
+        self.assertAlmostEqual(self.sut.node_backlog(), 1.0)
+
+    def test_disabled_levels(self):
+        sut = RateLimiter(0, {}, 0, clock=self.clock)
+        self.assertEqual(sut.reserve("s", "u", "free", 10**9), 0)
+        self.assertEqual(sut.node_backlog(), 0)
+
+
+class DelayQueueTests(TestCase):
+    def test_runs_in_order(self):
+        done, order = threading.Event(), []
+        sut = DelayQueue()
+        sut.schedule(0.05, lambda: (order.append(2), done.set()))
+        sut.schedule(0.01, lambda: order.append(1))
+        self.assertTrue(done.wait(2))
+        self.assertEqual(order, [1, 2])
+
+
+class ChargingServer:
+    """Servidor sin límites reales: anota los bytes que cobraría cada lectura."""
+    def __init__(self):
+        self.charged = []
+
+    def throttle(self, sid, username, nbytes, read):
+        self.charged.append(nbytes)
+        return read()
+
+
+class SessionChargeTests(TestCase):
+    def setUp(self):
+        self.data = bytes(range(256)) * 64
+        self.server = ChargingServer()
+        self.sut = SecureStreamManagerI(self.server, "ana", "s1")
+        self.sut._fh = io.BytesIO(self.data)
+
+    def test_end_of_track_is_not_charged(self):
+        self.sut._segments = [(o, n, c) for o, n, _, c in segment(self.data, 4096)]
+        chunk = self.sut.read_checked(len(self.data), 4096)
+        self.assertEqual((chunk.data, chunk.segments), (b"", []))
+        self.assertEqual(self.server.charged, [])
+
+    def test_rendition_is_charged_for_bytes_read(self):
+        chunk = self.sut.read_checked(len(self.data) - 100, 4096)
+        self.assertEqual(len(chunk.data), 100)
+        self.assertEqual(self.server.charged, [100])
+        self.sut.read_checked(len(self.data), 4096)
+        self.assertEqual(self.server.charged, [100])
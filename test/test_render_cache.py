@@ -0,0 +1,68 @@
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from render_cache import AudioCache, LocalStream, cache_key
+
+
+class AudioCacheTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        self.sut = AudioCache(self.dir, max_bytes=1000)
+
+    def store(self, track_id, digest, data):
+        writer = self.sut.writer(track_id, digest)
+        writer.write(data)
+        writer.commit()
+
+    def test_miss(self):
+        self.assertIsNone(self.sut.get("a.mp3", "d1"))
+
+    def test_hit_after_commit(self):
+        self.store("a.mp3", "d1", b"x" * 100)
+        path = self.sut.get("a.mp3", "d1")
+        stream = LocalStream(path)
+        self.assertEqual(stream.read(1000), b"x" * 100)
+        stream.close()
+
+    def test_aborted_write_is_not_cached(self):
+        writer = self.sut.writer("a.mp3", "d1")
+        writer.write(b"partial")
+        writer.abort()
+        self.assertIsNone(self.sut.get("a.mp3", "d1"))
+        self.assertEqual(list(self.dir.iterdir()), [])
+
+    def test_stale_digest_is_not_served(self):
+        self.store("d1", "d1", b"x" * 100)
+        self.assertIsNone(self.sut.get("d2", "d2"))
+        self.store("d2", "d2", b"y" * 100)
+        self.assertEqual(self.sut.get("d2", "d2").read_bytes(), b"y" * 100)
+
+    def test_lru_eviction(self):
+        self.store("a.mp3", "d", b"a" * 400)
+        self.store("b.mp3", "d", b"b" * 400)
+        self.sut.get("a.mp3", "d")  # "b" pasa a ser la menos usada
+        self.store("c.mp3", "d", b"c" * 400)
+        self.assertIsNotNone(self.sut.get("a.mp3", "d"))
+        self.assertIsNone(self.sut.get("b.mp3", "d"))
+        self.assertLessEqual(self.sut.size(), 1000)
+
+    def test_oversized_entry_is_skipped(self):
+        self.store("big.mp3", "d", b"z" * 2000)
+        self.assertIsNone(self.sut.get("big.mp3", "d"))
+
+    def test_persistent_across_instances(self):
+        self.store("a.mp3", "d1", b"x" * 100)
+        reopened = AudioCache(self.dir, max_bytes=1000)
+        self.assertIsNotNone(reopened.get("a.mp3", "d1"))
+
+
+class CacheKeyTests(TestCase):
+    def test_original_is_keyed_by_digest(self):
+        for quality in (None, "", "original"):
+            self.assertEqual(cache_key("d1", quality), "d1")
+
+    def test_rendition_is_keyed_by_quality(self):
+        self.assertEqual(cache_key("d1", "low"), "d1@low")
@@ -0,0 +1,76 @@
+from unittest import TestCase
+
+import Ice
+
+from media_render import MediaRenderI
+from render_group import RenderGroupI, Spotifice
+
+from .icetest import IceTestCase
+
+
+class RecordingRender(Spotifice.MediaRender):
+    def __init__(self, calls, name):
+        self.calls = calls
+        self.name = name
+
+    def play(self, current=None):
+        self.calls.append((self.name, "play"))
+
+    def stop(self, current=None):
+        self.calls.append((self.name, "stop"))
+
+    def join_sync_group(self, leader, current=None):
+        self.calls.append((self.name, "join"))
+
+    def leave_sync_group(self, current=None):
+        self.calls.append((self.name, "leave"))
+
+
+class RenderGroupTests(IceTestCase):
+    def setUp(self):
+        ic = self.ice_initialize_with_props({})
+        self.addCleanup(ic.destroy)
+        adapter = ic.createObjectAdapterWithEndpoints("GroupTest", "tcp -h 127.0.0.1")
+        adapter.activate()
+        self.calls = []
+        self.ids = [str(adapter.add(RecordingRender(self.calls, name),
+                                    Ice.stringToIdentity(name))) for name in ("r1", "r2")]
+        self.group = RenderGroupI(ic)
+
+    def test_stop_dissolves_group(self):
+        results = self.group.stop(self.ids)
+        self.assertTrue(all(r.ok for r in results))
+        for name in ("r1", "r2"):
+            self.assertLess(self.calls.index((name, "stop")),
+                            self.calls.index((name, "leave")))
+
+    def test_unsynced_play_leaves_group_first(self):
+        self.group.play(self.ids, False)
+        for name in ("r1", "r2"):
+            self.assertLess(self.calls.index((name, "leave")),
+                            self.calls.index((name, "play")))
+
+    def test_failure_is_reported(self):
+        results = self.group.stop(self.ids + ["gone:tcp -h 127.0.0.1 -p 1"])
+        self.assertEqual([r.ok for r in results], [True, True, False])
+
+
+class Follower:
+    def __init__(self):
+        self.left = False
+
+    def ice_getIdentity(self):
+        return Ice.stringToIdentity("follower")
+
+    def leave_sync_groupAsync(self):
+        self.left = True
+
+
+class LeaderTests(TestCase):
+    def test_leader_releases_followers(self):
+        render = MediaRenderI(None)
+        follower = Follower()
+        render.add_follower(follower)
+        render.leave_sync_group()
+        self.assertTrue(follower.left)
+        self.assertEqual(render.followers, {})
@@ -0,0 +1,234 @@
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import TestCase
+
+import Ice
+
+from media_render import MediaRenderI, SharedTrack, Spotifice
+
+
+class FakePlayer:
+    """Player sin audio: `drain` lee la pista entera como el hilo de GStreamer."""
+    def __init__(self):
+        self.playing = False
+        self.configured = 0
+
+    def configure(self, read, exhausted, failed, base_time=None):
+        self.read, self.exhausted, self.failed = read, exhausted, failed
+        self.base_time = base_time
+        self.configured += 1
+
+    def confirm_play_starts(self):
+        self.playing = True
+        return True
+
+    def is_playing(self):
+        return self.playing
+
+    def stop(self):
+        self.playing = False
+        return True
+
+    def drain(self):
+        while self.read(4096):
+            pass
+        self.playing = False
+        self.exhausted()
+
+
+class FakeProxies:
+    origin = None
+
+    def __init__(self, data):
+        self.data = data
+        self.bound = True
+        self.calls = []
+
+    def unbind(self):
+        self.bound = False
+
+    def invoke(self, target, operation, *args):
+        if not self.bound:
+            raise Spotifice.BadReference(reason="No hay MediaServer vinculado")
+        self.calls.append(operation)
+        if operation == "read_checked":
+            data = self.data[args[0]:args[0] + args[1]]
+            return SimpleNamespace(offset=args[0], data=data, segments=[])
+
+
+class FakeServerPrx:
+    """Proxy sin servidor detrás: bind() lo deja sin fijar a una conexión."""
+    def __init__(self, name):
+        self.name = name
+
+    def ice_toString(self):
+        return self.name
+
+    def ice_getIdentity(self):
+        return Ice.stringToIdentity(self.name)
+
+    def ice_locatorCacheTimeout(self, timeout):
+        return self
+
+    def ice_getConnection(self):
+        raise Ice.ConnectionRefusedException()
+
+    def ice_compress(self, compress):
+        return self
+
+    def ice_invocationTimeout(self, timeout):
+        return self
+
+    def close_stream(self):
+        pass
+
+
+class Events:
+    def __init__(self, fail=False):
+        self.fail = fail
+
+    def track_changed(self, render_id, track):
+        if self.fail:
+            raise Ice.ConnectionRefusedException()
+
+    def state_changed(self, render_id, status):
+        pass
+
+    def buffer_health(self, *args):
+        pass
+
+
+class PlaybackTests(TestCase):
+    def setUp(self):
+        self.player = FakePlayer()
+        self.render = MediaRenderI(self.player)
+        self.render.events = Events()
+        self.render.current_track = SimpleNamespace(id="a.mp3", title="A")
+        self.addCleanup(self.render.stop)
+
+    def play(self, data):
+        self.render.proxies = FakeProxies(data)
+        self.render.play()
+
+    def test_exhausted_after_stop_does_not_restart(self):
+        self.render.repeat = True
+        self.play(b"audio")
+        exhausted = self.player.exhausted
+        self.render.stop()
+        exhausted()
+        self.assertEqual(self.player.configured, 1)
+        self.assertFalse(self.player.is_playing())
+
+    def test_repeat_restarts_track_with_audio(self):
+        self.render.repeat = True
+        self.play(b"audio")
+        self.player.drain()
+        self.assertEqual(self.player.configured, 2)
+        self.assertTrue(self.player.is_playing())
+
+    def test_repeat_stops_on_track_without_audio(self):
+        self.render.repeat = True
+        self.play(b"")
+        self.player.drain()
+        self.assertEqual(self.player.configured, 1)
+        self.assertFalse(self.player.is_playing())
+
+    def test_stream_failure_does_not_advance(self):
+        self.render.repeat = True
+        self.play(b"audio")
+        self.player.failed(Spotifice.StreamError(reason="caída"))
+        self.assertIsNone(self.render._stream)
+        self.assertEqual(self.player.configured, 1)
+
+    def test_track_changed_failure_does_not_abort_play(self):
+        self.render.events = Events(fail=True)
+        self.play(b"audio")
+        self.assertTrue(self.player.is_playing())
+
+    def test_synced_start_is_scheduled_not_slept(self):
+        self.render.clock_offset = 250
+        start_us = self.render.group_clock_us() + 5_000_000
+        began = time.monotonic()
+        self.render.proxies = FakeProxies(b"audio")
+        self.render.play_at(start_us)
+        self.assertLess(time.monotonic() - began, 1)
+        self.assertEqual(self.player.base_time, (start_us - 250) * 1000)
+
+
+class FederationTests(TestCase):
+    def setUp(self):
+        self.player = FakePlayer()
+        self.render = MediaRenderI(self.player)
+        self.render.events = Events()
+        self.render.current_track = SimpleNamespace(id="a.mp3", title="A")
+        self.first = FakeProxies(b"audio" * 100000)
+        self.second = FakeProxies(b"")
+        self.render.federation = {"s1": self.first, "s2": self.second}
+        self.render.proxies = self.first
+        self.render.repeat = True
+        self.render.play()
+        self.addCleanup(self.render.stop)
+
+    def assertStopped(self, proxies):
+        self.assertIsNone(self.render._stream)
+        self.assertFalse(self.player.is_playing())
+        self.assertIn("close_stream", proxies.calls)
+        self.player.exhausted()  # Aviso tardío del stream detenido: se ignora
+        self.assertEqual(self.player.configured, 1)
+
+    def test_removing_stream_server_stops_playback(self):
+        self.render.remove_media_server(FakeServerPrx("s1"))
+        self.assertStopped(self.first)
+        self.assertFalse(self.first.bound)
+        self.assertIs(self.render.proxies, self.second)
+
+    def test_removing_other_server_keeps_playing(self):
+        self.render.remove_media_server(FakeServerPrx("s2"))
+        self.assertIsNotNone(self.render._stream)
+        self.assertTrue(self.player.is_playing())
+        self.assertFalse(self.second.bound)
+        self.assertTrue(self.first.bound)
+
+    def test_rebinding_swaps_server_and_stops_playback(self):
+        self.render.bind_media_server(FakeServerPrx("s3"), FakeServerPrx("s3/session"))
+        self.assertStopped(self.first)
+        self.assertEqual(list(self.render.federation), ["s3"])
+        self.assertIs(self.render.proxies, self.render.federation["s3"])
+        self.assertTrue(self.render.proxies.bound)
+        self.assertFalse(self.first.bound or self.second.bound)
+
+    def test_unbinding_stops_playback(self):
+        self.render.unbind_media_server()
+        self.assertStopped(self.first)
+        self.assertFalse(self.render.proxies.bound)
+
+
+class SharedTrackTests(TestCase):
+    def test_keeps_a_bounded_window(self):
+        shared = SharedTrack("a.mp3")
+        chunk = bytes(range(256)) * 256
+        for _ in range(3 * SharedTrack.WINDOW // len(chunk)):
+            shared.write(chunk)
+        self.assertLessEqual(len(shared._data), SharedTrack.WINDOW)
+        end = 3 * SharedTrack.WINDOW
+        self.assertEqual(shared.read(end - 256, 256).result(), bytes(range(256)))
+        with self.assertRaises(Spotifice.StreamError):
+            shared.read(0, 256).result()
+
+    def test_pending_read_is_served_on_write(self):
+        shared = SharedTrack("a.mp3")
+        future = shared.read(0, 4)
+        self.assertFalse(future.done())
+        shared.write(b"abcdef")
+        self.assertEqual(future.result(), b"abcd")
+        shared.commit()
+        self.assertEqual(shared.read(6, 4).result(), b"")
+
+    def test_cached_track_is_read_from_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "a.mp3"
+            path.write_bytes(b"x" * (3 * SharedTrack.WINDOW))
+            shared = SharedTrack("a.mp3", path)
+            self.assertEqual(shared.read(0, 4).result(), b"xxxx")
@@ -0,0 +1,144 @@
+from unittest import TestCase
+
+import Ice
+
+from media_render import Spotifice
+from render_proxies import ProxyManager
+
+from .icetest import IceTestCase
+
+
+class Render(Spotifice.MediaRender):
+    def __init__(self):
+        self.pinged = 0
+
+    def ice_ping(self, current=None):
+        self.pinged += 1
+
+
+class CallbackSession(Spotifice.SecureStreamManager):
+    """Sesión que llama al render por la conexión de la propia petición."""
+    def get_user_info(self, current=None):
+        render = current.con.createProxy(Ice.stringToIdentity("render1"))
+        render.ice_ping()
+        return Spotifice.UserInfo(username="ana")
+
+
+class Server(Spotifice.MediaServer):
+    pass
+
+
+class BindTests(IceTestCase):
+    def setUp(self):
+        # Un hilo atiende get_user_info y otro la respuesta del render
+        server_ic = self.ice_initialize_with_props({"Ice.ThreadPool.Server.Size": "2"})
+        self.addCleanup(server_ic.destroy)
+        adapter = server_ic.createObjectAdapterWithEndpoints(
+            "ServerTest", "tcp -h 127.0.0.1")
+        adapter.activate()
+        server = adapter.add(Server(), Ice.stringToIdentity("MediaServer"))
+        session = adapter.add(CallbackSession(), Ice.stringToIdentity("session/s1"))
+
+        render_ic = self.ice_initialize_with_props(
+            {"Ice.Default.InvocationTimeout": "5000"})
+        self.addCleanup(render_ic.destroy)
+        render_adapter = render_ic.createObjectAdapter("")  # Sin endpoints: tras un NAT
+        self.render = Render()
+        render_adapter.add(self.render, Ice.stringToIdentity("render1"))
+        render_adapter.activate()
+
+        self.server = Spotifice.MediaServerPrx.uncheckedCast(
+            render_ic.stringToProxy(str(server)))
+        self.session = Spotifice.SecureStreamManagerPrx.uncheckedCast(
+            render_ic.stringToProxy(str(session)))
+        self.sut = ProxyManager(render_adapter)
+
+    def test_server_and_session_share_one_connection(self):
+        self.sut.bind(self.server, self.session)
+        self.assertTrue(self.sut.proxy("server").ice_isFixed())
+        self.assertEqual(self.sut.proxy("server").ice_getConnection().toString(),
+                         self.sut.proxy("session").ice_getConnection().toString())
+
+    def test_server_reaches_render_over_the_session_connection(self):
+        self.sut.bind(self.server, self.session)
+        self.assertEqual(self.sut.invoke("session", "get_user_info").username, "ana")
+        self.assertEqual(self.render.pinged, 1)
+
+
+class FakeServer:
+    """Proxy sin conexión: falla `failures` veces y registra los timeouts."""
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = 0
+        self.timeout = None
+
+    def ice_locatorCacheTimeout(self, timeout):
+        return self
+
+    def ice_getConnection(self):
+        raise Ice.ConnectionRefusedException()
+
+    def ice_invocationTimeout(self, timeout):
+        self.timeout = timeout
+        return self
+
+    def ice_compress(self, compress):
+        return self
+
+    def get_track_info(self, track_id):
+        return self._call(track_id)
+
+    def open_stream(self, track_id):
+        return self._call(track_id)
+
+    def _call(self, result):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise Ice.ConnectionLostException()
+        return result
+
+
+class ProxyManagerTests(TestCase):
+    def bind(self, server, properties=None):
+        self.sut = ProxyManager(properties=properties)
+        self.sut.RETRY_BACKOFF = 0
+        self.sut.bind(server, server)
+
+    def test_unbound_manager_raises_bad_reference(self):
+        sut = ProxyManager()
+        with self.assertRaises(Spotifice.BadReference):
+            sut.proxy("server")
+        with self.assertRaises(Spotifice.BadReference):
+            sut.invoke("server", "get_track_info", "a.mp3")
+
+    def test_unbind_drops_proxies(self):
+        self.bind(FakeServer())
+        self.assertTrue(self.sut.bound)
+        self.sut.proxy("server", "get_track_info")
+        self.sut.unbind()
+        self.assertFalse(self.sut.bound)
+        with self.assertRaises(Spotifice.BadReference):
+            self.sut.proxy("server", "get_track_info")
+
+    def test_timeout_per_operation(self):
+        server = FakeServer()
+        properties = Ice.createProperties()
+        properties.setProperty("MediaRender.Timeout.open_stream", "700")
+        self.bind(server, properties)
+        self.sut.proxy("server", "get_track_info")
+        self.assertEqual(server.timeout, ProxyManager.TIMEOUTS["get_track_info"])
+        self.sut.proxy("server", "open_stream")
+        self.assertEqual(server.timeout, 700)
+
+    def test_idempotent_operation_is_retried(self):
+        server = FakeServer(failures=2)
+        self.bind(server)
+        self.assertEqual(self.sut.invoke("server", "get_track_info", "a.mp3"), "a.mp3")
+        self.assertEqual(server.calls, 3)
+
+    def test_other_operations_are_not_retried(self):
+        server = FakeServer(failures=1)
+        self.bind(server)
+        with self.assertRaises(Ice.ConnectionLostException):
+            self.sut.invoke("server", "open_stream", "a.mp3")
+        self.assertEqual(server.calls, 1)
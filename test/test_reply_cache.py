@@ -0,0 +1,53 @@
+import json
+import tempfile
+from pathlib import Path
+
+import Ice
+
+import reply_cache
+from media_server import MediaServerI, SessionLocator, Spotifice
+
+from .icetest import IceTestCase
+
+USER = {"salt": "1239459d33341643", "digest": "e749c418e1ccbf65c090c5c7859647b8"}
+
+
+class ReplyCacheTests(IceTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        users = Path(tmp.name) / "users.json"
+        users.write_text(json.dumps({"user": USER}))
+        servant = MediaServerI(Path("test/media"), Path(tmp.name) / "playlists", users)
+
+        ic = self.ice_initialize_with_props({})
+        self.addCleanup(ic.destroy)
+        adapter = ic.createObjectAdapterWithEndpoints("CacheTest", "tcp -h 127.0.0.1")
+        servant.adapter = adapter
+        adapter.addServantLocator(SessionLocator(servant), SessionLocator.CATEGORY)
+        identity = Ice.stringToIdentity("MediaServer")
+        reply_cache.install(ic, adapter, servant, identity,
+                            lambda: servant.catalog_version)
+        adapter.activate()
+        self.cache = adapter.find(identity)
+
+        client = self.ice_initialize_with_props({"Ice.Default.InvocationTimeout": "5000"})
+        self.addCleanup(client.destroy)
+        proxy = client.stringToProxy(str(adapter.createProxy(identity)))
+        self.server = Spotifice.MediaServerPrx.uncheckedCast(proxy)
+        self.render = Spotifice.MediaRenderPrx.uncheckedCast(
+            client.stringToProxy("render1"))
+
+    def test_catalog_reply_is_cached(self):
+        ids = [t.id for t in self.server.get_all_tracks()]
+        self.assertIn("1s.mp3", ids)
+        self.assertEqual([t.id for t in self.server.get_all_tracks()], ids)
+        self.assertEqual(len(self.cache._replies), 1)
+
+    def test_authenticate_is_forwarded(self):
+        session = self.server.authenticate(self.render, "user", "secret")
+        self.assertEqual(session.ice_getIdentity().category, SessionLocator.CATEGORY)
+        session.ice_ping()
+        with self.assertRaises(Spotifice.AuthError):
+            self.server.authenticate(self.render, "user", "wrong")
+        self.assertEqual(self.cache._replies, {})
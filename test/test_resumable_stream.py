@@ -0,0 +1,236 @@
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import TestCase
+
+import Ice
+
+from media_render import ResumableStream, Spotifice
+from media_server import MediaServerI, SecureStreamManagerI
+from render_cache import AudioCache
+from render_proxies import ProxyManager
+
+
+class CountingServer:
+    def __init__(self):
+        self.opened = 0
+
+    def get_track_info(self, track_id):
+        return SimpleNamespace(filename=track_id)
+
+    def open_media(self, info, quality):
+        self.opened += 1
+        return open("test/media/4s.mp3", "rb")
+
+    def track_segments(self, track_id):
+        return []
+
+
+class FailingProxies:
+    """Sirve `data` en un read_checked y luego falla con `error`."""
+    def __init__(self, data, error):
+        self.data = data
+        self.error = error
+        self.origin = None
+
+    def invoke(self, target, operation, *args):
+        if operation == "read_checked":
+            if self.data is None:
+                raise self.error
+            data, self.data = self.data, None
+            return SimpleNamespace(offset=args[0], data=data, segments=[])
+        return None
+
+
+class PendingProxies:
+    """Servidor sin renditions: sólo abre el original, que ocupa `data`."""
+    def __init__(self, data, error=Spotifice.RenditionPending):
+        self.data = data
+        self.error = error
+        self.opened = []
+        self.origin = None
+
+    def invoke(self, target, operation, *args):
+        if operation == "open_stream":
+            self.opened.append(args[1])
+            if args[1] is not Ice.Unset:
+                raise self.error(item=args[0], reason="Sin rendition")
+        elif operation == "read_checked":
+            data = self.data[args[0]:args[0] + args[1]]
+            return SimpleNamespace(offset=args[0], data=data, segments=[])
+
+
+class Replica:
+    """Sesión en una réplica: sirve `data` hasta el byte `dies_at` y luego se
+    cae. Sin caché de localizador, resuelve a la réplica `next`."""
+    def __init__(self, data, dies_at=None, known=True):
+        self.data = data
+        self.dies_at = dies_at
+        self.known = known   # Falso: la sesión no existe en esta réplica
+        self.next = None
+        self.opened_at = []
+
+    def ice_locatorCacheTimeout(self, timeout):
+        return self.next if timeout == 0 and self.next else self
+
+    def ice_getConnection(self):
+        raise Ice.ConnectionRefusedException()
+
+    def ice_invocationTimeout(self, timeout):
+        return self
+
+    def ice_compress(self, compress):
+        return self
+
+    def open_stream(self, track_id, quality):
+        self.open_stream_at(track_id, 0, quality)
+
+    def open_stream_at(self, track_id, offset, quality):
+        if not self.known:
+            raise Ice.ObjectNotExistException()
+        self.opened_at.append(offset)
+
+    def read_checked(self, offset, max_size):
+        if self.dies_at is not None and offset >= self.dies_at:
+            raise Ice.ConnectionLostException()
+        data = self.data[offset:offset + max_size]
+        return SimpleNamespace(offset=offset, data=data, segments=[])
+
+    def close_stream(self):
+        pass
+
+
+class Authenticator(Replica):
+    """MediaServer: autentica de nuevo y devuelve la sesión `session`."""
+    def __init__(self, session):
+        super().__init__(b"")
+        self.session = session
+        self.logins = []
+
+    def authenticate(self, render, username, password):
+        self.logins.append(username)
+        return self.session
+
+
+class FailoverTests(TestCase):
+    DATA = bytes(range(256)) * 400
+
+    def open_stream(self, session, server):
+        proxies = ProxyManager()
+        proxies.RETRY_BACKOFF = 0
+        proxies.bind(server, session)
+        render = SimpleNamespace(proxies=proxies, quality=Ice.Unset, cache=None,
+                                 credentials=("user", "secret"), proxy="render1",
+                                 render_id="render", events=SimpleNamespace(
+                                     buffer_health=lambda *args: None))
+        stream = ResumableStream(render, "a.mp3")
+        stream.FAILOVER_BACKOFF = 0
+        stream.open()
+        self.addCleanup(stream.close)
+        return stream
+
+    def read_all(self, stream):
+        received = bytearray()
+        while chunk := stream.read(5000):
+            received += chunk
+        return bytes(received)
+
+    def test_session_resumes_on_another_replica(self):
+        first = Replica(self.DATA, dies_at=40000)
+        first.next = second = Replica(self.DATA)
+        stream = self.open_stream(first, Authenticator(None))
+        self.assertEqual(self.read_all(stream), self.DATA)
+        offset = 3 * ResumableStream.FETCH_SIZE  # Primera lectura que falla
+        self.assertEqual(second.opened_at, [offset])
+
+    def test_lost_session_is_reauthenticated(self):
+        first = Replica(self.DATA, dies_at=40000)
+        first.next = Replica(self.DATA, known=False)
+        third = Replica(self.DATA)
+        server = Authenticator(third)
+        stream = self.open_stream(first, server)
+        self.assertEqual(self.read_all(stream), self.DATA)
+        self.assertEqual(server.logins, ["user"])
+        self.assertEqual(third.opened_at, [3 * ResumableStream.FETCH_SIZE])
+
+
+class NoRenditions:
+    def get(self, filename, quality, source=None):
+        return None
+
+
+class ResumeOffsetTests(TestCase):
+    def test_negative_offset_opens_nothing(self):
+        server = CountingServer()
+        manager = SecureStreamManagerI(server, "user", "sid")
+        with self.assertRaises(Spotifice.IOError):
+            manager.open_stream_at("4s.mp3", -1)
+        self.assertEqual(server.opened, 0)
+        self.assertFalse(manager.streaming())
+
+
+class StreamErrorTests(TestCase):
+    def open_stream(self, data, error):
+        render = SimpleNamespace(proxies=FailingProxies(data, error), quality="",
+                                 render_id="render", events=SimpleNamespace(
+                                     buffer_health=lambda *args: None))
+        stream = ResumableStream(render, "4s.mp3")
+        stream.open()
+        self.addCleanup(stream.close)
+        return stream
+
+    def test_error_is_not_end_of_track(self):
+        error = Spotifice.IOError(item="4s.mp3", reason="disco")
+        stream = self.open_stream(b"abc", error)
+        self.assertEqual(stream.read(3), b"abc")
+        with self.assertRaises(Spotifice.StreamError):
+            stream.read(3)
+
+    def test_buffered_data_is_delivered_first(self):
+        stream = self.open_stream(b"abcdef", Spotifice.IOError(item="4s.mp3", reason="x"))
+        self.assertEqual(stream.read(4), b"abcd")
+        self.assertEqual(stream.read(4), b"ef")
+        with self.assertRaises(Spotifice.StreamError):
+            stream.read(4)
+
+
+class RenditionPendingTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+
+    def test_server_does_not_serve_original_as_rendition(self):
+        server = MediaServerI(self.dir / "media", self.dir / "playlists",
+                              self.dir / "users.json", transcoder=NoRenditions())
+        info = SimpleNamespace(id="a.mp3", filename="a.mp3")
+        with self.assertRaises(Spotifice.RenditionPending):
+            server.resolve_media_path(info, "low")
+        self.assertEqual(server.resolve_media_path(info, "original"),
+                         self.dir / "media" / "a.mp3")
+
+    def test_render_caches_original_under_its_own_key(self):
+        proxies = PendingProxies(b"audio")
+        cache = AudioCache(self.dir / "cache", 1000)
+        render = SimpleNamespace(proxies=proxies, quality="low", cache=cache,
+                                 render_id="render", events=SimpleNamespace(
+                                     buffer_health=lambda *args: None))
+        stream = ResumableStream(render, "a.mp3", digest="d1")
+        stream.open()
+        self.assertEqual(proxies.opened, ["low", Ice.Unset])
+        self.assertEqual(stream.read(10), b"audio")
+        self.assertEqual(stream.read(10), b"")
+        stream.close()
+        self.assertIsNotNone(cache.get("d1", "d1"))
+        self.assertIsNone(cache.get("d1@low", "d1"))
+
+    def test_failed_rendition_falls_back_to_original(self):
+        proxies = PendingProxies(b"audio", Spotifice.IOError)
+        render = SimpleNamespace(proxies=proxies, quality="low", cache=None,
+                                 render_id="render", events=SimpleNamespace(
+                                     buffer_health=lambda *args: None))
+        stream = ResumableStream(render, "a.mp3")
+        stream.open()
+        self.addCleanup(stream.close)
+        self.assertEqual(proxies.opened, ["low", Ice.Unset])
+        self.assertEqual(stream.read(10), b"audio")
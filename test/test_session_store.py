@@ -0,0 +1,101 @@
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import TestCase
+
+from session_store import (
+    MemorySessionStore,
+    SessionPurger,
+    SessionStore,
+    SqliteSessionStore,
+    create_store,
+    sign_token,
+    verify_token,
+)
+
+SECRET = b"test-secret"
+
+
+class TokenTests(TestCase):
+    def test_roundtrip(self):
+        payload = {"sid": "abc", "user": "user", "exp": time.time() + 60}
+        token = sign_token(SECRET, payload)
+        payload = verify_token(SECRET, token)
+        self.assertEqual(payload["sid"], "abc")
+        self.assertEqual(payload["user"], "user")
+
+    def test_wrong_secret(self):
+        token = sign_token(SECRET, {"sid": "abc", "exp": time.time() + 60})
+        self.assertIsNone(verify_token(b"other-secret", token))
+
+    def test_tampered_token(self):
+        token = sign_token(SECRET, {"sid": "abc", "exp": time.time() + 60})
+        other = sign_token(SECRET, {"sid": "xyz", "exp": time.time() + 60})
+        forged = other.split(".")[0] + "." + token.split(".")[1]
+        self.assertIsNone(verify_token(SECRET, forged))
+
+    def test_expired_token(self):
+        token = sign_token(SECRET, {"sid": "abc", "exp": time.time() - 1})
+        self.assertIsNone(verify_token(SECRET, token))
+
+    def test_garbage_token(self):
+        self.assertIsNone(verify_token(SECRET, "not-a-token"))
+
+
+class StoreTests:
+    def test_put_get_delete(self):
+        self.sut.put("s1", {"user": "user", "expires": time.time() + 60})
+        self.assertEqual(self.sut.get("s1")["user"], "user")
+        self.sut.delete("s1")
+        self.assertIsNone(self.sut.get("s1"))
+
+    def test_purge_expired(self):
+        self.sut.put("old", {"user": "a", "expires": time.time() - 1})
+        self.sut.put("new", {"user": "b", "expires": time.time() + 60})
+        self.sut.purge_expired()
+        self.assertIsNone(self.sut.get("old"))
+        self.assertIsNotNone(self.sut.get("new"))
+
+
+class MemoryStoreTests(StoreTests, TestCase):
+    def setUp(self):
+        self.sut = MemorySessionStore()
+
+
+class SqliteStoreTests(StoreTests, TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = Path(tmp.name) / "sessions.db"
+        self.sut = SqliteSessionStore(self.path)
+
+    def test_shared_between_instances(self):
+        self.sut.put("s1", {"user": "user", "expires": time.time() + 60})
+        replica = create_store(f"sqlite:{self.path}")
+        self.assertEqual(replica.get("s1")["user"], "user")
+
+    def test_unknown_store(self):
+        with self.assertRaises(ValueError):
+            create_store("redis:localhost")
+
+
+class PurgerTests(TestCase):
+    def test_store_interface_is_abstract(self):
+        with self.assertRaises(TypeError):
+            SessionStore()
+
+    def test_purges_periodically(self):
+        store = MemorySessionStore()
+        store.put("old", {"user": "a", "expires": time.time() - 1})
+        purged = threading.Event()
+
+        def purge():
+            store.purge_expired()
+            purged.set()
+
+        purger = SessionPurger(purge, 0.01)
+        purger.start()
+        self.addCleanup(purger.stop)
+        self.assertTrue(purged.wait(2))
+        self.assertIsNone(store.get("old"))
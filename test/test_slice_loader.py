@@ -0,0 +1,66 @@
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from unittest import TestCase, mock
+
+import slice_loader
+
+
+class SliceLoaderTests(TestCase):
+    def setUp(self):
+        slice_loader.load_spotifice()  # Ya cargado, como en cualquier servidor
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.slice = Path(tmp.name) / "spotifice_v3.ice"
+        self.generated = Path(tmp.name) / "spotifice_v3_ice.py"
+        self.stamp = Path(tmp.name) / "spotifice_v3_ice.sha256"
+        self.slice.write_text("module Spotifice {};")
+        for name, path in (("SLICE_FILE", self.slice), ("GENERATED", self.generated),
+                           ("STAMP", self.stamp)):
+            patcher = mock.patch.object(slice_loader, name, path)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def generate(self):
+        """Lo que hace `make slice`: código generado y SHA-256 del .ice."""
+        self.generated.write_text("")
+        digest = hashlib.sha256(self.slice.read_bytes()).hexdigest()
+        self.stamp.write_text(f"{digest}  spotifice_v3.ice\n")
+
+    def load(self, **env):
+        env.setdefault("SPOTIFICE_RUNTIME_SLICE", "")
+        load_slice = mock.patch.object(slice_loader.Ice, "loadSlice")
+        with mock.patch.dict(os.environ, env), load_slice as compiled:
+            module = slice_loader.load_spotifice()
+        self.assertTrue(hasattr(module, "MediaServerPrx"))
+        return compiled.called
+
+    def test_missing_generated_code_compiles_at_runtime(self):
+        self.assertFalse(slice_loader._precompiled_is_fresh())
+        self.assertTrue(self.load())
+
+    def test_fresh_generated_code_is_imported(self):
+        self.generate()
+        self.assertTrue(slice_loader._precompiled_is_fresh())
+        self.assertFalse(self.load())
+
+    def test_stale_generated_code_is_recompiled(self):
+        self.generate()
+        self.slice.write_text("module Spotifice { struct S {}; };")
+        self.assertFalse(slice_loader._precompiled_is_fresh())
+        self.assertTrue(self.load())
+
+    def test_dates_do_not_matter(self):
+        self.generate()
+        os.utime(self.generated, (1000, 1000))  # Más viejo que el .ice (checkout)
+        os.utime(self.slice, (2000, 2000))
+        self.assertTrue(slice_loader._precompiled_is_fresh())
+
+    def test_generated_code_without_stamp_is_recompiled(self):
+        self.generated.write_text("")
+        self.assertFalse(slice_loader._precompiled_is_fresh())
+
+    def test_runtime_slice_forced_by_environment(self):
+        self.generate()
+        self.assertTrue(self.load(SPOTIFICE_RUNTIME_SLICE="1"))
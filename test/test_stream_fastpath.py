@@ -0,0 +1,83 @@
+import io
+
+import Ice
+
+from media_server import SecureStreamManagerI, Spotifice
+from stream_fastpath import MAX_CHUNK, FastChunkI, read_reply
+
+from .icetest import IceTestCase
+
+
+class UnlimitedServer:
+    def throttle(self, sid, username, nbytes, read):
+        return read()
+
+
+class BrokenFile:
+    def read(self, size=-1):
+        raise OSError("disco dañado")
+
+    readinto = read
+
+    def close(self):
+        pass
+
+
+class FastChunkTests(IceTestCase):
+    """El Blobject responde lo mismo que el esqueleto generado."""
+
+    def setUp(self):
+        ic = self.ice_initialize_with_props({})
+        self.addCleanup(ic.destroy)
+        adapter = ic.createObjectAdapterWithEndpoints("FastPathTest", "tcp -h 127.0.0.1")
+        self.servant = SecureStreamManagerI(UnlimitedServer(), "user", "sid")
+        self.typed = Spotifice.SecureStreamManagerPrx.uncheckedCast(
+            adapter.add(self.servant, Ice.stringToIdentity("typed")))
+        self.fast = Spotifice.SecureStreamManagerPrx.uncheckedCast(
+            adapter.add(FastChunkI(self.servant), Ice.stringToIdentity("fast")))
+        adapter.activate()
+        self.addCleanup(self.servant.close_stream)
+
+    def replies(self, chunk_size, opener=lambda: open("test/media/4s.mp3", "rb")):
+        result = []
+        for proxy in (self.typed, self.fast):
+            self.servant._fh = opener()
+            result.append(proxy.ice_invoke("get_audio_chunk", Ice.OperationMode.Normal,
+                                           self.encode_int(chunk_size)))
+            self.servant.close_stream()
+        return result
+
+    @staticmethod
+    def encode_int(value):
+        param = value.to_bytes(4, "little", signed=True)
+        return (10).to_bytes(4, "little") + b"\x01\x01" + param
+
+    def test_same_reply_bytes(self):
+        for size in (0, 100, 254, 255, 4096, 10**7, -1):
+            typed, fast = self.replies(size)
+            self.assertEqual(typed, fast, size)
+
+    def test_same_stream_error_with_item(self):
+        self.servant._track_id = "4s.mp3"
+        typed, fast = self.replies(1024, BrokenFile)
+        self.assertFalse(typed[0])
+        self.assertEqual(typed, fast)
+        self.servant._fh = BrokenFile()
+        with self.assertRaises(Spotifice.StreamError) as cm:
+            self.fast.get_audio_chunk(1024)
+        self.assertEqual((cm.exception.item, cm.exception.reason),
+                         ("4s.mp3", "Error leyendo chunk: disco dañado"))
+
+    def test_client_cannot_choose_the_allocation(self):
+        reply = read_reply(io.BytesIO(b"x" * (2 * MAX_CHUNK)), 2**31 - 1)
+        self.assertLess(len(reply), MAX_CHUNK + 16)
+
+    def test_stream_error_without_open_stream(self):
+        with self.assertRaises(Spotifice.StreamError):
+            self.fast.get_audio_chunk(1024)
+
+    def test_decoded_by_typed_proxy(self):
+        self.servant._fh = open("test/media/4s.mp3", "rb")
+        data = self.fast.get_audio_chunk(1000)
+        with open("test/media/4s.mp3", "rb") as f:
+            self.assertEqual(data, f.read(1000))
@@ -0,0 +1,71 @@
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import wait
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import TestCase, mock
+
+import transcoder
+from media_pack import build_pack
+from media_server import MediaServerI, Spotifice
+from transcoder import Transcoder, command
+
+MEDIA = Path("test/media")
+
+
+class CommandTests(TestCase):
+    def test_paths_with_spaces_are_single_arguments(self):
+        cmd = command(Path("Mis temas/Still Alive.mp3"), Path("out dir/low.mp3"), 64)
+        self.assertIn("location=Mis temas/Still Alive.mp3", cmd)
+        self.assertIn("location=out dir/low.mp3", cmd)
+        self.assertIn("bitrate=64", cmd)
+        self.assertEqual(cmd[:2], ["gst-launch-1.0", "-q"])
+
+
+def copy_encode(src, dst, bitrate):
+    """Codificación simulada: la rendition es una copia del original."""
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copyfile(src, dst)
+
+
+def failing_encode(src, dst, bitrate):
+    raise subprocess.CalledProcessError(1, "gst-launch-1.0")
+
+
+class PackRenditionTests(TestCase):
+    """Pista que sólo está en un pack: fuera de media_dir."""
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        packs = self.dir / "packs"
+        packs.mkdir()
+        build_pack([MEDIA / "1s.mp3"], packs / "a.spkpack")
+        self.transcoder = Transcoder(self.dir / "media", self.dir / "renditions")
+        self.transcoder.enabled = True
+        self.addCleanup(self.transcoder.shutdown)
+        self.server = MediaServerI(self.dir / "media", self.dir / "playlists",
+                                   self.dir / "users.json", transcoder=self.transcoder,
+                                   packs_dir=packs)
+        self.server.load_packs()
+        self.info = SimpleNamespace(id="1s.mp3", filename="1s.mp3")
+
+    def request(self, encode):
+        with mock.patch.object(transcoder, "encode", encode):
+            with self.assertRaises(Spotifice.RenditionPending):
+                self.server.resolve_media_path(self.info, "low")
+            wait(list(self.transcoder._pending.values()))
+
+    def test_rendition_is_encoded_from_the_pack(self):
+        self.request(copy_encode)
+        path = self.server.resolve_media_path(self.info, "low")
+        self.assertEqual(path.read_bytes(), (MEDIA / "1s.mp3").read_bytes())
+        self.assertEqual(list(path.parent.iterdir()), [path])  # Sin temporales
+
+    def test_failed_encoding_is_permanent(self):
+        self.request(failing_encode)
+        with mock.patch.object(self.transcoder, "schedule") as schedule:
+            with self.assertRaises(Spotifice.IOError):
+                self.server.resolve_media_path(self.info, "low")
+        schedule.assert_not_called()
@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+from unittest import TestCase
+
+from wire import (
+    BULK_OPERATIONS,
+    CompressionPolicy,
+    estimate_size,
+    payload_size,
+    uncompressed,
+)
+
+
+class FakeProxy:
+    def __init__(self, reply, compress=None, calls=None):
+        self.reply = reply
+        self.compressed = compress
+        self.calls = calls if calls is not None else []
+
+    def ice_compress(self, value):
+        return FakeProxy(self.reply, value, self.calls)
+
+    def get_all_tracks(self):
+        self.calls.append(self.compressed)
+        return self.reply
+
+
+class CompressionPolicyTests(TestCase):
+    def test_bulk_operations_start_compressed(self):
+        policy = CompressionPolicy()
+        self.assertTrue(all(policy.compress(op) for op in BULK_OPERATIONS))
+        self.assertFalse(policy.compress("get_track_info"))
+
+    def test_threshold_on_last_reply_size(self):
+        proxy = FakeProxy(["x" * 10] * 10)
+        policy = CompressionPolicy(min_bytes=1000)
+        policy.call(proxy, "get_all_tracks")
+        policy.call(proxy, "get_all_tracks")
+        self.assertEqual(proxy.calls, [True, False])
+
+        proxy.reply = ["x" * 100] * 10
+        policy.call(proxy, "get_all_tracks")
+        policy.call(proxy, "get_all_tracks")
+        self.assertEqual(proxy.calls[2:], [False, True])
+
+    def test_payload_size(self):
+        self.assertEqual(payload_size(b"x" * 10), 11)
+        self.assertEqual(payload_size("x" * 300), 305)
+        self.assertEqual(payload_size(["ab", "cd"]), 7)
+        self.assertEqual(payload_size(SimpleNamespace(id="ab", n=1)), 1 + 3 + 8)
+
+    def test_estimate_size(self):
+        short = [SimpleNamespace(id="ab", tags=["x", "y"])] * 10
+        self.assertEqual(estimate_size(short), payload_size(short))
+        tracks = [SimpleNamespace(id=f"pista-{i:05d}", n=i) for i in range(100_000)]
+        self.assertEqual(estimate_size(tracks), payload_size(tracks))
+        ids = [f"Portal2-{i}-Want_You_Gone.mp3" for i in range(10_000)]
+        self.assertAlmostEqual(estimate_size(ids) / payload_size(ids), 1, delta=0.1)
+
+    def test_audio_never_compressed(self):
+        self.assertFalse(uncompressed(FakeProxy(b"")).compressed)
+        self.assertIsNone(uncompressed(None))
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 import sys, Ice, time
-Ice.loadSlice('-I{} spotifice_v2.ice'.format(Ice.getSliceDir()))
-import Spotifice
+from slice_loader import load_spotifice
+Spotifice = load_spotifice()  # Precompilado con `make slice` o, si no, desde el .ice
 
 def main():
     with Ice.initialize(["--Ice.Config=locator.config"]) as communicator:
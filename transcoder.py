@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+"""Generación y caché en disco de renditions de menor bitrate.
+
+Cada rendition se codifica lanzando un pipeline de GStreamer (gst-launch-1.0)
+en un proceso aparte; un pool limita cuántas codificaciones corren a la vez.
+Las pistas que sólo están en un pack se vuelcan antes a un fichero temporal.
+Se puede usar desde MediaServer (bajo demanda) o como trabajo por lotes:
+
+    ./transcoder.py media renditions [calidad ...]
+"""
+
+import logging
+import shutil
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+
+logger = logging.getLogger("Transcoder")
+
+# Calidad -> bitrate MP3 (kbps). "original" sirve el fichero tal cual.
+QUALITIES = {"low": 64, "medium": 128, "high": 192}
+ORIGINAL = "original"
+
+PIPELINE = ('filesrc location={src} ! decodebin ! audioconvert ! audioresample ! '
+            'lamemp3enc target=bitrate bitrate={bitrate} cbr=true ! '
+            'filesink location={dst}')
+
+
+class TranscodeError(Exception):
+    """La codificación de una rendition falló: no se vuelve a intentar."""
+
+
+def command(src, dst, bitrate):
+    """Argumentos de gst-launch: cada ruta es un solo argumento, aunque tenga espacios."""
+    return ["gst-launch-1.0", "-q"] + [
+        arg.format(src=src, dst=dst, bitrate=bitrate) for arg in PIPELINE.split()]
+
+
+def encode(src: Path, dst: Path, bitrate: int, timeout=600):
+    """Codifica `src` a MP3 CBR en `dst` (escritura atómica vía fichero temporal)."""
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dst.with_name(dst.name + ".part")
+    cmd = command(src, tmp, bitrate)
+    try:
+        subprocess.run(cmd, check=True, timeout=timeout,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        tmp.replace(dst)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+class Transcoder:
+    """Caché de renditions: {cache_dir}/{calidad}/{fichero}."""
+    def __init__(self, media_dir, cache_dir, workers=2):
+        self.media_dir = Path(media_dir)
+        self.cache_dir = Path(cache_dir)
+        self.enabled = shutil.which("gst-launch-1.0") is not None
+        self._pool = ThreadPoolExecutor(max_workers=workers,
+                                        thread_name_prefix="transcoder")
+        self._pending = {}  # {(fichero, calidad): Future}
+        self._failed = {}   # {(fichero, calidad): motivo}
+        self._lock = threading.Lock()
+        if not self.enabled:
+            logger.warning("gst-launch-1.0 no disponible: sólo se servirán originales.")
+
+    def rendition_path(self, filename, quality) -> Path:
+        return self.cache_dir / quality / filename
+
+    def get(self, filename, quality, source=None):
+        """Ruta de la rendition si ya está en caché; si no, la encola y devuelve
+        None. `source` abre el original si no está en media_dir (packs). Si la
+        codificación ya falló lanza TranscodeError."""
+        path = self.rendition_path(filename, quality)
+        if path.exists():
+            return path
+        with self._lock:
+            reason = self._failed.get((filename, quality))
+        if reason:
+            raise TranscodeError(reason)
+        self.schedule(filename, quality, source)
+        return None
+
+    def schedule(self, filename, quality, source=None):
+        if not self.enabled:
+            return None
+        key = (filename, quality)
+        with self._lock:
+            if key not in self._pending:
+                self._pending[key] = self._pool.submit(self._run, filename, quality,
+                                                       source)
+            return self._pending[key]
+
+    def _run(self, filename, quality, source=None):
+        src = self.media_dir / filename
+        dst = self.rendition_path(filename, quality)
+        staged = dst.with_name(dst.name + ".src") if source else None
+        try:
+            logger.info(f"Codificando {filename} a {QUALITIES[quality]} kbps...")
+            if staged:
+                # gst-launch lee de un fichero: el original se copia por trozos
+                staged.parent.mkdir(parents=True, exist_ok=True)
+                with source() as stream, open(staged, "wb") as out:
+                    shutil.copyfileobj(stream, out)
+                src = staged
+            encode(src, dst, QUALITIES[quality])
+            logger.info(f"Rendition '{quality}' lista: {filename}")
+        except (subprocess.SubprocessError, OSError) as e:
+            logger.error(f"Error codificando {filename} ({quality}): {e}")
+            with self._lock:
+                self._failed[(filename, quality)] = str(e)
+        finally:
+            if staged:
+                staged.unlink(missing_ok=True)
+            with self._lock:
+                self._pending.pop((filename, quality), None)
+
+    def encode_all(self, qualities=None):
+        """Pre-codifica toda la biblioteca (trabajo por lotes)."""
+        futures = [self.schedule(f.name, q)
+                   for f in sorted(self.media_dir.glob("*.mp3"))
+                   for q in (qualities or QUALITIES)
+                   if not self.rendition_path(f.name, q).exists()]
+        wait([f for f in futures if f])
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO,
+                        format='[%(levelname)s] %(name)s: %(message)s')
+    if len(sys.argv) < 3:
+        sys.exit("Usage: transcoder.py <media-dir> <renditions-dir> [quality ...]")
+
+    qualities = sys.argv[3:] or list(QUALITIES)
+    unknown = set(qualities) - set(QUALITIES)
+    if unknown:
+        sys.exit(f"Unknown qualities: {', '.join(sorted(unknown))}")
+
+    transcoder = Transcoder(sys.argv[1], sys.argv[2], workers=4)
+    transcoder.encode_all(qualities)
+    transcoder.shutdown()